@@ -1,11 +1,11 @@
-"""Clear the onshape-to-robot cache."""
+"""Clear the onshape-to-sim response cache."""
 import shutil
 
 from .onshape_api.client import Client
 
 
 def main():
-    """Clear the onshape-to-robot cache."""
+    """Clear the onshape-to-sim response cache."""
     cache_dir = Client.get_cache_path()
     print("Removing cache directory: {}".format(cache_dir))
     shutil.rmtree(cache_dir, ignore_errors=True)
@@ -0,0 +1,341 @@
+"""
+collision_geometry
+==================
+
+Simple collision geometry for the meshes of rigid bodies: a fitted primitive, or a few convex hulls
+"""
+from dataclasses import dataclass
+from typing import Optional
+import hashlib
+import heapq
+
+import numpy as np
+import numpy.typing as npt
+
+from onshape_to_sim.onshape_api.cache import ResponseCache
+from onshape_to_sim.onshape_api.mesh_conversion import read_obj, write_obj
+
+__all__ = [
+    "CollisionGenerator",
+    "CollisionShape",
+    "ShapeKinds",
+    "convex_decomposition",
+    "fit_primitive",
+    "mesh_volume",
+]
+
+
+@dataclass
+class ShapeKinds():
+    box: str = "box"
+    sphere: str = "sphere"
+    cylinder: str = "cylinder"
+    capsule: str = "capsule"
+    convex: str = "convex"
+
+
+@dataclass
+class CollisionShape():
+    """
+    A collision shape, placed in the frame of the mesh it stands for.
+
+    Cylinders and capsules lie along the z axis of their pose, as in SDF.
+
+    Attributes:
+        kind: one of ShapeKinds
+        pose: 4x4 transform of the shape in the frame of the mesh
+        size: the (x, y, z) size of a box, the (radius,) of a sphere, or the (radius, length) of a cylinder or capsule,
+            where the length of a capsule is that of its cylinder, without the caps
+        vertices: (V, 3) vertices of a convex hull, in the frame of the mesh
+        faces: (F, 3) indices of the vertices of each triangle of a convex hull, wound outwards
+    """
+    kind: str
+    pose: npt.NDArray
+    size: tuple = ()
+    vertices: Optional[npt.NDArray] = None
+    faces: Optional[npt.NDArray] = None
+
+    @property
+    def volume(self) -> float:
+        if self.kind == ShapeKinds.box:
+            return float(np.prod(self.size))
+        if self.kind == ShapeKinds.sphere:
+            return 4 / 3 * np.pi * self.size[0] ** 3
+        if self.kind == ShapeKinds.cylinder:
+            return np.pi * self.size[0] ** 2 * self.size[1]
+        if self.kind == ShapeKinds.capsule:
+            return np.pi * self.size[0] ** 2 * self.size[1] + 4 / 3 * np.pi * self.size[0] ** 3
+        return mesh_volume(self.vertices[self.faces])
+
+    def contains(self, points: npt.ArrayLike) -> npt.NDArray:
+        """Whether each of (N, 3) points, in the frame of the mesh, is inside the shape"""
+        points = np.asarray(points, dtype=float)
+        if self.kind == ShapeKinds.convex:
+            corners = self.vertices[self.faces].astype(float)
+            normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+            offsets = np.einsum("ij,ij->i", normals, corners[:, 0])
+            tolerance = 1e-9 * np.linalg.norm(normals, axis=1)
+            return np.all(points @ normals.T - offsets <= tolerance, axis=1)
+        local = (points - self.pose[:3, 3]) @ self.pose[:3, :3]
+        if self.kind == ShapeKinds.box:
+            return np.all(np.abs(local) <= np.asarray(self.size) / 2, axis=1)
+        if self.kind == ShapeKinds.sphere:
+            return np.linalg.norm(local, axis=1) <= self.size[0]
+        radius, length = self.size
+        radial = np.linalg.norm(local[:, :2], axis=1)
+        if self.kind == ShapeKinds.cylinder:
+            return (radial <= radius) & (np.abs(local[:, 2]) <= length / 2)
+        axial = np.maximum(np.abs(local[:, 2]) - length / 2, 0)
+        return np.hypot(radial, axial) <= radius
+
+    def write_obj(self, file_path: str) -> None:
+        """Writes the convex hull of the shape to an OBJ file"""
+        write_obj(file_path, self.vertices, self.faces)
+
+    def to_dict(self) -> dict:
+        return {
+            "kind": self.kind,
+            "pose": self.pose.tolist(),
+            "size": list(self.size),
+            "vertices": None if self.vertices is None else self.vertices.tolist(),
+            "faces": None if self.faces is None else self.faces.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, stored: dict) -> "CollisionShape":
+        return cls(
+            kind=stored["kind"],
+            pose=np.array(stored["pose"]),
+            size=tuple(stored["size"]),
+            vertices=None if stored["vertices"] is None else np.array(stored["vertices"], dtype=np.float32),
+            faces=None if stored["faces"] is None else np.array(stored["faces"], dtype=np.intp),
+        )
+
+
+def mesh_volume(triangles: npt.NDArray) -> float:
+    """The volume enclosed by a closed mesh, from the signed volumes of the tetrahedra its triangles make with the
+    origin"""
+    triangles = np.asarray(triangles, dtype=float)
+    return abs(float(np.einsum("ij,ij->", triangles[:, 0], np.cross(triangles[:, 1], triangles[:, 2])))) / 6
+
+
+def _principal_axes(points: npt.NDArray) -> tuple:
+    """The mean of points and their principal axes, as the columns of a rotation"""
+    mean = points.mean(axis=0)
+    _, axes = np.linalg.eigh(np.cov((points - mean).T))
+    # Largest spread first, and right handed
+    axes = axes[:, ::-1].copy()
+    if np.linalg.det(axes) < 0:
+        axes[:, 2] *= -1
+    return mean, axes
+
+
+def _pose(rotation: npt.NDArray, translation: npt.NDArray) -> npt.NDArray:
+    pose = np.eye(4)
+    pose[:3, :3] = rotation
+    pose[:3, 3] = translation
+    return pose
+
+
+def fit_primitive(triangles: npt.NDArray) -> CollisionShape:
+    """Fits the box, sphere, cylinder or capsule of least volume containing a mesh.
+
+    Shapes are aligned with the principal axes of the vertices of the mesh, and centered on their bounding box in
+    those axes. Cylinders and capsules are tried along each axis.
+
+    Args:
+        triangles: (N, 3, 3) vertices of each triangle of the mesh
+
+    Returns:
+        The shape of least volume
+    """
+    points = np.unique(np.asarray(triangles, dtype=float).reshape(-1, 3), axis=0)
+    mean, axes = _principal_axes(points)
+    local = (points - mean) @ axes
+    low, high = local.min(axis=0), local.max(axis=0)
+    center = (low + high) / 2
+    local -= center
+    world_center = mean + axes @ center
+
+    candidates = [
+        CollisionShape(ShapeKinds.box, _pose(axes, world_center), tuple((high - low).tolist())),
+        CollisionShape(ShapeKinds.sphere, _pose(axes, world_center), (float(np.linalg.norm(local, axis=1).max()),)),
+    ]
+    for axis in range(3):
+        # Columns permuted cyclically, so the z axis of the shape is this axis and the rotation stays right handed
+        rotation = axes[:, [(axis + 1) % 3, (axis + 2) % 3, axis]]
+        radial = np.linalg.norm(local[:, [(axis + 1) % 3, (axis + 2) % 3]], axis=1)
+        along = np.abs(local[:, axis])
+        radius = float(radial.max())
+        candidates.append(CollisionShape(
+            ShapeKinds.cylinder, _pose(rotation, world_center), (radius, float(2 * along.max()))
+        ))
+        # The caps hold the points near the ends, down to where they are a radius away from the axis
+        half_length = float(np.max(along - np.sqrt(np.maximum(radius ** 2 - radial ** 2, 0))))
+        candidates.append(CollisionShape(
+            ShapeKinds.capsule, _pose(rotation, world_center), (radius, 2 * max(half_length, 0.0))
+        ))
+    return min(candidates, key=lambda shape: shape.volume)
+
+
+def _hull(points: npt.NDArray):
+    """The convex hull of points, or None when they span no volume"""
+    from scipy.spatial import ConvexHull
+
+    if len(points) < 4:
+        return None
+    try:
+        return ConvexHull(points)
+    except (RuntimeError, ValueError):
+        # Qhull errors on flat or degenerate pieces
+        return None
+
+
+def _hull_shape(hull) -> CollisionShape:
+    """The convex shape of a scipy ConvexHull, with its triangles wound outwards"""
+    indices = np.full(len(hull.points), -1)
+    indices[hull.vertices] = np.arange(len(hull.vertices))
+    faces = indices[hull.simplices]
+    vertices = hull.points[hull.vertices].astype(np.float32)
+    corners = vertices[faces].astype(float)
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    inwards = np.einsum("ij,ij->i", normals, hull.equations[:, :3]) < 0
+    faces[inwards] = faces[inwards][:, ::-1]
+    return CollisionShape(ShapeKinds.convex, np.eye(4), vertices=vertices, faces=faces)
+
+
+def _best_split(triangles: npt.NDArray) -> Optional[tuple]:
+    """Splits triangles by a plane across one of their principal axes, where the hulls of the halves are smallest.
+
+    Planes at the quartiles of the centroids of the triangles along each axis are tried.
+
+    Returns:
+        The volume of the hulls of the halves, and the triangles and hull of each half, or None when no split leaves
+        two halves with volume
+    """
+    centroids = triangles.mean(axis=1)
+    mean, axes = _principal_axes(centroids)
+    along = (centroids - mean) @ axes
+    best = None
+    for axis in range(3):
+        for cut in np.unique(np.quantile(along[:, axis], [0.25, 0.5, 0.75])):
+            side = along[:, axis] <= cut
+            if side.all() or not side.any():
+                continue
+            halves = (triangles[side], triangles[~side])
+            hulls = [_hull(half.reshape(-1, 3)) for half in halves]
+            if hulls[0] is None or hulls[1] is None:
+                continue
+            volume = hulls[0].volume + hulls[1].volume
+            if best is None or volume < best[0]:
+                best = (volume, list(zip(halves, hulls)))
+    return best
+
+
+def convex_decomposition(triangles: npt.NDArray, max_hulls: int = 8, min_gain: float = 0.1) -> list:
+    """Approximates a mesh by a few convex hulls, splitting it where that shrinks its hulls the most.
+
+    Starting from the hull of the whole mesh, the piece whose best split (see _best_split) frees the most volume is
+    split in two, as long as that frees at least min_gain of the volume of its hull and there are fewer than
+    max_hulls pieces. Triangles go to the side of their centroid, so the hulls cover the whole mesh.
+
+    Args:
+        triangles: (N, 3, 3) vertices of each triangle of the mesh
+        max_hulls: the most hulls to approximate the mesh with
+        min_gain: the fraction of the volume of the hull of a piece a split must free
+
+    Returns:
+        The convex shapes of the hulls
+    """
+    triangles = np.asarray(triangles, dtype=float)
+    hull = _hull(triangles.reshape(-1, 3))
+    if hull is None:
+        return [fit_primitive(triangles)]
+    pieces = [(triangles, hull)]
+    # Splits worth making, most volume freed first, as (-volume freed, piece number, piece, its split halves)
+    splits = []
+    count = 0
+
+    def consider(piece: tuple) -> None:
+        nonlocal count
+        split = _best_split(piece[0])
+        if split is not None and piece[1].volume - split[0] >= min_gain * piece[1].volume:
+            heapq.heappush(splits, (split[0] - piece[1].volume, count, piece, split[1]))
+        count += 1
+
+    consider(pieces[0])
+    while splits and len(pieces) < max_hulls:
+        _, _, piece, halves = heapq.heappop(splits)
+        pieces = [other for other in pieces if other is not piece] + halves
+        for half in halves:
+            consider(half)
+    return [_hull_shape(hull) for _, hull in pieces]
+
+
+def _file_digest(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as fi:
+        for block in iter(lambda: fi.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class CollisionGenerator():
+    """
+    Generates the collision shapes of meshes, cached by the hash of the mesh files.
+
+    A mesh gets the primitive of least volume (see fit_primitive) when the mesh fills at least min_fill of it, and a
+    convex decomposition otherwise (see convex_decomposition). Parts repeated across a robot, or meshes unchanged
+    since the last run, are only processed once.
+
+    Attributes:
+        method: "auto" to choose by fill, "primitive" or "convex" to always use one
+        min_fill: the fraction of its primitive a mesh must fill for the primitive to be used
+        max_hulls: the most hulls of a convex decomposition
+        cache: where shapes are kept across runs, if anywhere
+        hits: number of meshes whose shapes were found in memory or in the cache
+        misses: number of meshes whose shapes were generated
+    """
+
+    def __init__(
+        self,
+        method: str = "auto",
+        min_fill: float = 0.6,
+        max_hulls: int = 8,
+        cache: Optional[ResponseCache] = None,
+        ):
+        if method not in ("auto", "primitive", "convex"):
+            raise ValueError(f"Unknown collision method {method}, expected auto, primitive or convex")
+        self.method = method
+        self.min_fill = min_fill
+        self.max_hulls = max_hulls
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+        self._shapes = {}
+
+    def generate(self, triangles: npt.NDArray) -> list:
+        """Generates the collision shapes of (N, 3, 3) triangles"""
+        if self.method != "convex":
+            primitive = fit_primitive(triangles)
+            if self.method == "primitive" or mesh_volume(triangles) >= self.min_fill * primitive.volume:
+                return [primitive]
+        return convex_decomposition(triangles, max_hulls=self.max_hulls)
+
+    def shapes_for_mesh(self, mesh_path: str) -> list:
+        """The collision shapes of an OBJ mesh, in the frame of the mesh"""
+        key = ("collision_geometry", _file_digest(mesh_path), self.method, self.min_fill, self.max_hulls)
+        if key not in self._shapes and self.cache is not None:
+            stored = self.cache.get_json(key)
+            if stored is not None:
+                self._shapes[key] = [CollisionShape.from_dict(shape) for shape in stored]
+        if key in self._shapes:
+            self.hits += 1
+            return self._shapes[key]
+        self.misses += 1
+        vertices, faces = read_obj(mesh_path)
+        shapes = self.generate(vertices[faces])
+        self._shapes[key] = shapes
+        if self.cache is not None:
+            self.cache.put_json(key, [shape.to_dict() for shape in shapes])
+        return shapes
@@ -138,13 +138,15 @@ if config['useScads']:
         print(Fore.BLUE + "go to: https://openscad.org/downloads.html " + Style.RESET_ALL)
         config['useScads'] = False
 
-# Checking that MeshLab is present
+# Checking that open3d, which simplifies meshes, is present
 if config['simplifySTLs']:
-    print(Style.BRIGHT + '* Checking MeshLab presence...' + Style.RESET_ALL)
-    if not os.path.exists('/usr/bin/meshlabserver') != 0:
-        print(Fore.RED + "No /usr/bin/meshlabserver, disabling STL simplification support" + Style.RESET_ALL)
-        print(Fore.BLUE + "TIP: consider installing meshlab:" + Style.RESET_ALL)
-        print(Fore.BLUE + "sudo apt-get install meshlab" + Style.RESET_ALL)
+    print(Style.BRIGHT + '* Checking open3d presence...' + Style.RESET_ALL)
+    try:
+        import open3d  # noqa: F401
+    except ImportError:
+        print(Fore.RED + "No open3d, disabling STL simplification support" + Style.RESET_ALL)
+        print(Fore.BLUE + "TIP: consider installing open3d:" + Style.RESET_ALL)
+        print(Fore.BLUE + "pip install open3d" + Style.RESET_ALL)
         config['simplifySTLs'] = False
 
 # Checking that versionId and workspaceId are not set on same time
@@ -8,4 +8,4 @@ Demonstrates usage of API keys for the Onshape REST API
 __copyright__ = 'Copyright (c) 2016 Onshape, Inc.'
 __license__ = 'All rights reserved.'
 __title__ = 'onshape_api'
-__all__ = ['onshape', 'client', 'utils']
+__all__ = ['onshape', 'client', 'assembly_diff', 'async_client', 'batching', 'cache', 'cassette', 'coalescing', 'download', 'mass_properties', 'mesh_conversion', 'metadata', 'node_index', 'path_index', 'polling', 'retry', 'session', 'tree_format', 'utils']
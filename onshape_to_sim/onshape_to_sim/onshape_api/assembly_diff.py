@@ -0,0 +1,149 @@
+"""
+assembly_diff
+=============
+
+Differences between two definitions of the same assembly, e.g. at two microversions
+"""
+from dataclasses import dataclass, field
+
+from onshape_to_sim.onshape_api.utils import (
+    APIAttributes,
+    CommonAttributes,
+    OccurrenceAttributes,
+    PartAttributes,
+)
+
+__all__ = [
+    "AssemblyDiff",
+    "diff_assembly_definitions",
+]
+
+
+@dataclass
+class AssemblyDiff():
+    """What changed between two assembly definitions.
+
+    Instances are identified by (element id of the assembly holding them, instance id), occurrences by their joined
+    path.
+
+    Attributes:
+        added_instances: instances only in the new definition
+        removed_instances: instances only in the old definition
+        retyped_instances: instances now referring to another element, part or type of element
+        renamed_instances: instances whose name changed. The names of nodes, links and meshes are all derived from
+            the instance names, with counters telling apart instances with the same name, so the tree is rebuilt
+        changed_instances: other instances whose data changed, e.g. their microversion or configuration
+        added_occurrences: occurrences only in the new definition
+        removed_occurrences: occurrences only in the old definition
+        moved_occurrences: occurrences whose transform or visibility changed
+        features_changed: whether any mate of the root or of a subassembly changed
+        configuration_changed: whether the configuration of the root assembly changed
+    """
+    added_instances: set = field(default_factory=set)
+    removed_instances: set = field(default_factory=set)
+    retyped_instances: set = field(default_factory=set)
+    renamed_instances: set = field(default_factory=set)
+    changed_instances: set = field(default_factory=set)
+    added_occurrences: set = field(default_factory=set)
+    removed_occurrences: set = field(default_factory=set)
+    moved_occurrences: set = field(default_factory=set)
+    features_changed: bool = False
+    configuration_changed: bool = False
+
+    @property
+    def structure_changed(self) -> bool:
+        """Whether the tree built from the new definition has other nodes than the old one"""
+        return bool(
+            self.added_instances
+            or self.removed_instances
+            or self.retyped_instances
+            or self.renamed_instances
+            or self.added_occurrences
+            or self.removed_occurrences
+            or self.configuration_changed
+        )
+
+    def __bool__(self) -> bool:
+        return self.structure_changed or bool(self.changed_instances or self.moved_occurrences or self.features_changed)
+
+
+def _instances(definition: dict) -> dict:
+    root = definition[APIAttributes.rootAssembly]
+    instances = {
+        (root[CommonAttributes.elementId], instance[CommonAttributes.idNum]): instance
+        for instance in root[APIAttributes.instances]
+    }
+    for subassembly in definition[APIAttributes.subassemblies]:
+        for instance in subassembly[APIAttributes.instances]:
+            instances[(subassembly[CommonAttributes.elementId], instance[CommonAttributes.idNum])] = instance
+    return instances
+
+
+def _occurrences(definition: dict) -> dict:
+    return {
+        "".join(occurrence[OccurrenceAttributes.path]): occurrence
+        for occurrence in definition[APIAttributes.rootAssembly][APIAttributes.occurrences]
+    }
+
+
+def _features(definition: dict) -> list:
+    features = [definition[APIAttributes.rootAssembly][APIAttributes.features]]
+    for subassembly in sorted(definition[APIAttributes.subassemblies], key=lambda sub: sub[CommonAttributes.elementId]):
+        features.append(subassembly[APIAttributes.features])
+    return features
+
+
+def _identity(instance: dict) -> tuple:
+    return (
+        instance.get(CommonAttributes.elementType),
+        instance.get(CommonAttributes.documentId),
+        instance.get(CommonAttributes.elementId),
+        instance.get(PartAttributes.partId),
+    )
+
+
+def diff_assembly_definitions(old: dict, new: dict) -> AssemblyDiff:
+    """Compares two definitions of an assembly, as returned by Client.assembly_definition.
+
+    Args:
+        old: the previous definition
+        new: the current definition
+
+    Returns:
+        The differences between the definitions
+    """
+    diff = AssemblyDiff()
+    old_instances = _instances(old)
+    new_instances = _instances(new)
+    diff.added_instances = new_instances.keys() - old_instances.keys()
+    diff.removed_instances = old_instances.keys() - new_instances.keys()
+    for key in old_instances.keys() & new_instances.keys():
+        old_instance = old_instances[key]
+        new_instance = new_instances[key]
+        if _identity(old_instance) != _identity(new_instance):
+            diff.retyped_instances.add(key)
+        elif old_instance.get(CommonAttributes.name) != new_instance.get(CommonAttributes.name):
+            diff.renamed_instances.add(key)
+        elif old_instance != new_instance:
+            diff.changed_instances.add(key)
+
+    old_occurrences = _occurrences(old)
+    new_occurrences = _occurrences(new)
+    diff.added_occurrences = new_occurrences.keys() - old_occurrences.keys()
+    diff.removed_occurrences = old_occurrences.keys() - new_occurrences.keys()
+    for key in old_occurrences.keys() & new_occurrences.keys():
+        old_occurrence = old_occurrences[key]
+        new_occurrence = new_occurrences[key]
+        if (
+            old_occurrence[CommonAttributes.transform] != new_occurrence[CommonAttributes.transform]
+            or old_occurrence.get(OccurrenceAttributes.hidden) != new_occurrence.get(OccurrenceAttributes.hidden)
+        ):
+            diff.moved_occurrences.add(key)
+
+    diff.features_changed = _features(old) != _features(new)
+    old_root = old[APIAttributes.rootAssembly]
+    new_root = new[APIAttributes.rootAssembly]
+    for attribute in (CommonAttributes.configuration, CommonAttributes.fullConfiguration):
+        if old_root.get(attribute) != new_root.get(attribute):
+            diff.configuration_changed = True
+    return diff
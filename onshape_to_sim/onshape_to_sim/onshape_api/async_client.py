@@ -0,0 +1,154 @@
+"""
+async_client
+============
+
+An asyncio interface over a thread pool running the blocking Onshape client, for fanning out many API calls at once.
+Requests are not sent with an async transport: each call in flight holds a worker thread
+"""
+from typing import Optional
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import functools
+
+from onshape_to_sim.onshape_api.client import Client
+from onshape_to_sim.onshape_api.polling import PollSchedule
+from onshape_to_sim.onshape_api.utils import API
+
+__all__ = [
+    "AsyncClient"
+]
+
+# Methods of Client that are exposed as coroutines on AsyncClient
+_ASYNC_METHODS = (
+    "rename_document",
+    "del_document",
+    "get_document",
+    "list_documents",
+    "download_document_external_data",
+    "part_export_stl",
+    "part_stl_pipeline",
+    "assembly_export_obj",
+    "assembly_export_stl",
+    "assembly_stl_pipeline",
+    "all_elements_in_document",
+    "element_metadata",
+    "all_parts_in_document",
+    "all_parts_in_element",
+    "all_part_metadata",
+    "part_metadata",
+    "part_mass_properties",
+    "part_studio_mass_properties",
+    "assembly_definition",
+    "assembly_mass_properties",
+    "translation_status_request",
+)
+
+
+def _make_async_method(name: str):
+    client_method = getattr(Client, name)
+
+    @functools.wraps(client_method)
+    async def method(self, *args, **kwargs):
+        return await self._call(name, *args, **kwargs)
+    return method
+
+
+class AsyncClient():
+    """
+    Thread-pool wrapper around Client with an asyncio interface: the same methods as Client, each returning a
+    coroutine.
+
+    It is not an async transport. Every call runs the blocking Client method with run_in_executor on a
+    ThreadPoolExecutor, so each call in flight holds one worker thread, and shares the pooled sessions of the client.
+    At most `max_concurrency` calls are in flight at once, which is also the number of threads; the rest wait on a
+    semaphore. Use it with asyncio.gather
+    to issue hundreds of calls without serializing on network latency:
+
+        async with AsyncClient(creds="config.json", max_concurrency=32) as client:
+            responses = await asyncio.gather(*(client.part_metadata(...) for part in parts))
+
+    Attributes:
+        max_concurrency: Maximum number of requests in flight
+    """
+
+    def __init__(
+        self,
+        stack: str = 'https://cad.onshape.com',
+        logging: bool = True,
+        creds: str = './config.json',
+        max_concurrency: int = 16,
+        client: Optional[Client] = None,
+        ):
+        """
+        Args:
+            stack: Base URL used to access the API
+            logging: Turn logging on or off
+            creds: Location of the config.json file holding the credentials
+            max_concurrency: Maximum number of requests in flight
+            client: An existing client to send the requests with. By default a new one is created with a
+                connection pool large enough for `max_concurrency` requests.
+        """
+        if max_concurrency < 1:
+            raise ValueError(f"Concurrency limit must be positive, got {max_concurrency}")
+        self.max_concurrency = max_concurrency
+        self._owns_client = client is None
+        if client is None:
+            client = Client(stack=stack, logging=logging, creds=creds, pool_size=max_concurrency)
+        self.client = client
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="onshape")
+        self._semaphore = None
+        self._loop = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Semaphores are bound to the event loop they are first used in
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._semaphore
+
+    async def _call(self, name: str, *args, **kwargs):
+        """Runs a Client method on a worker thread once a concurrency slot is free"""
+        async with self._get_semaphore():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, functools.partial(getattr(self.client, name), *args, **kwargs)
+            )
+
+    async def ping_async_export_call(
+        self,
+        tid: str,
+        configuration: str = API.default,
+        time_delay: Optional[float] = None,
+        ) -> dict:
+        """Waits for a translation without holding a worker thread. See Client.ping_async_export_call"""
+        schedule = None
+        if time_delay is not None:
+            schedule = PollSchedule.fixed(time_delay, deadline=self.client.poll_schedule.deadline)
+        return await asyncio.wrap_future(self.client.translation_poller.submit(tid, configuration, schedule))
+
+    async def wait_for_translations(self, tids: list, configuration: str = API.default) -> list:
+        """Waits for several translations at once, polling them all in the client's polling loop.
+
+        Returns:
+            The final status responses, in the order of the translation ids
+        """
+        return await asyncio.gather(*(self.ping_async_export_call(tid, configuration) for tid in tids))
+
+    async def aclose(self) -> None:
+        """Waits for running calls, then releases the worker threads and the client's sessions"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, functools.partial(self._executor.shutdown, wait=True))
+        if self._owns_client:
+            self.client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+
+for _name in _ASYNC_METHODS:
+    setattr(AsyncClient, _name, _make_async_method(_name))
+del _name
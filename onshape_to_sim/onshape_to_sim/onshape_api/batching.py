@@ -0,0 +1,120 @@
+"""
+batching
+========
+
+Fetching per-part information with one API call per element instead of one per instance
+"""
+from typing import Any, Iterable, Optional
+from concurrent.futures import ThreadPoolExecutor
+import abc
+import threading
+
+from onshape_to_sim.onshape_api.utils import PartAttributes, get_element_key
+
+__all__ = [
+    "ElementResolver"
+]
+
+
+class ElementResolver(abc.ABC):
+    """
+    Resolves information about part and assembly instances with one API call per element.
+
+    Several endpoints answer for every part of a part studio at once. Instances are grouped by the element they refer
+    to, (did, wvm, wvmid, eid, configuration), each group is fetched a single time and the response is fanned out to
+    its parts. Assemblies have one response per element as well, which is shared by all their instances. Responses
+    are memoized for the lifetime of the resolver, so use one resolver per tree build.
+
+    Call prefetch with all the instances first so the groups are fetched concurrently; get fetches any group still
+    missing on its own. Subclasses implement the calls to the API.
+
+    Attributes:
+        client: The client sending the requests
+        max_workers: Maximum number of elements fetched at once
+        num_requests: Number of API calls made so far
+    """
+
+    def __init__(self, client: Any, max_workers: int = 8):
+        """
+        Args:
+            client: The client sending the requests
+            max_workers: Maximum number of elements fetched at once
+        """
+        self.client = client
+        self.max_workers = max_workers
+        self.num_requests = 0
+        self._responses = {}
+        self._lock = threading.Lock()
+
+    @property
+    def responses(self) -> dict:
+        """The responses fetched so far, by element key. Store them to seed a later resolver with"""
+        return self._responses
+
+    def seed(self, responses: dict) -> None:
+        """Adds responses fetched earlier, e.g. by the resolver of a previous build.
+
+        Element keys include the version or microversion of the element, so responses of elements that changed since
+        are never used.
+        """
+        with self._lock:
+            self._responses.update(responses)
+
+    @abc.abstractmethod
+    def _request_element(self, key: tuple, is_part_studio: bool) -> Any:
+        """Requests the information of a whole element, whose key is (did, wvm, wvmid, eid, configuration)"""
+
+    @abc.abstractmethod
+    def _request_part(self, key: tuple, part_id: str) -> Any:
+        """Requests the information of a single part the element response left out"""
+
+    @abc.abstractmethod
+    def _part_from_response(self, response: Any, part_id: str) -> Optional[Any]:
+        """Picks the information of a part out of the response of its part studio, or None if it isn't there"""
+
+    def _fetch(self, key: tuple, is_part_studio: bool) -> Any:
+        response = self._request_element(key, is_part_studio)
+        with self._lock:
+            self.num_requests += 1
+            self._responses[key] = response
+        return response
+
+    def prefetch(self, element_dicts: Iterable[dict]) -> None:
+        """Fetches every element the instances refer to, one call per element.
+
+        Args:
+            element_dicts: the part and assembly instances that will be resolved
+        """
+        groups = {}
+        for element_dict in element_dicts:
+            key = get_element_key(element_dict)
+            if key not in self._responses:
+                groups[key] = PartAttributes.partId in element_dict
+        if len(groups) == 0:
+            return
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self._fetch, key, is_part_studio) for key, is_part_studio in groups.items()]
+        for future in futures:
+            future.result()
+
+    def get(self, element_dict: dict) -> Any:
+        """Returns the information of a part or assembly instance.
+
+        Args:
+            element_dict: the part or assembly instance
+        """
+        key = get_element_key(element_dict)
+        is_part = PartAttributes.partId in element_dict
+        response = self._responses.get(key)
+        if response is None:
+            response = self._fetch(key, is_part)
+        if not is_part:
+            return response
+        part_id = element_dict[PartAttributes.partId]
+        part_response = self._part_from_response(response, part_id)
+        if part_response is not None:
+            return part_response
+        part_response = self._request_part(key, part_id)
+        with self._lock:
+            self.num_requests += 1
+        return part_response
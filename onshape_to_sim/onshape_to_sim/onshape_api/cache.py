@@ -0,0 +1,210 @@
+"""
+cache
+=====
+
+Persistent on-disk cache for Onshape API responses of immutable document versions
+"""
+from typing import Any, Optional
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+__all__ = [
+    "ResponseCache"
+]
+
+# Seconds after which a temporary file is taken for the leftover of an interrupted write rather than one in progress
+_STALE_WRITE_AGE = 60 * 60
+
+
+def cache_key(
+    endpoint: str,
+    did: str,
+    wvm: str,
+    wvmid: str,
+    eid: Optional[str] = None,
+    part_id: Optional[str] = None,
+    configuration: Optional[str] = None,
+    ) -> tuple:
+    """Builds the key identifying a response in the cache.
+
+    Args:
+        endpoint: name of the API call, e.g. "part_mass_properties"
+        did: document id
+        wvm: the type of document we want to draw from (workspace, version, or microversion)
+        wvmid: workspace/version/microversion id
+        eid: element id
+        part_id: the id of the part
+        configuration: the configuration of the element
+    """
+    return (endpoint, did, wvm, wvmid, eid, part_id, configuration)
+
+
+class ResponseCache():
+    """
+    A content-addressed cache of API responses on disk, bounded in size with least-recently-used eviction.
+
+    Entries are named by the SHA-256 of their key and written to a temporary file that is renamed into place, so
+    readers (including other processes) never see a partial entry. Temporary files are only removed as leftovers of
+    interrupted writes once they are an hour old, since other processes may still be writing them. JSON responses and
+    binary files (meshes) are stored side by side. Only responses of versions and microversions should be stored:
+    workspaces change.
+
+    Attributes:
+        directory: Where the entries are stored
+        max_size: Size in bytes above which the least recently used entries are evicted
+    """
+
+    def __init__(self, directory: str, max_size: int = 2 * 1024 ** 3):
+        """
+        Args:
+            directory: Where the entries are stored. Created if it doesn't exist
+            max_size: Size in bytes above which the least recently used entries are evicted
+        """
+        self.directory = str(directory)
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        # Maps entry paths to [size, last use] so eviction doesn't need to walk the directory. Only filled in on the
+        # first write, since clients that only read from the cache never need it
+        self._entries = None
+        self._size = 0
+
+    @property
+    def size(self) -> int:
+        """Size in bytes of the entries"""
+        with self._lock:
+            self._scan()
+            return self._size
+
+    def _scan(self) -> None:
+        """Finds the size and last use of the entries on disk, once. The lock must be held"""
+        if self._entries is not None:
+            return
+        self._entries = {}
+        now = time.time()
+        for root, _, files in os.walk(self.directory):
+            for filename in files:
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                    if not filename.startswith("."):
+                        self._entries[path] = [stat.st_size, stat.st_mtime]
+                    elif now - stat.st_mtime > _STALE_WRITE_AGE:
+                        # Leftover of an interrupted write. Recent ones may still be written by another process
+                        os.remove(path)
+                except FileNotFoundError:
+                    # Renamed into place or evicted by another process meanwhile
+                    continue
+        self._size = sum(size for size, _ in self._entries.values())
+
+    def _path(self, key: tuple, suffix: str) -> str:
+        digest = hashlib.sha256(json.dumps(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest[2:] + suffix)
+
+    def _touch(self, path: str) -> None:
+        now = time.time()
+        try:
+            os.utime(path, (now, now))
+        except FileNotFoundError:
+            return
+        with self._lock:
+            if self._entries is not None and path in self._entries:
+                self._entries[path][1] = now
+
+    def _commit(self, path: str, write) -> None:
+        """Writes an entry through a temporary file renamed into place, then evicts if the cache is too large"""
+        with self._lock:
+            # Before writing, so the new entry's temporary file isn't taken for a leftover
+            self._scan()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".")
+        try:
+            with os.fdopen(fd, "wb") as fi:
+                write(fi)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        size = os.path.getsize(path)
+        with self._lock:
+            if path in self._entries:
+                self._size -= self._entries[path][0]
+            self._entries[path] = [size, time.time()]
+            self._size += size
+            self._evict()
+
+    def _evict(self) -> None:
+        if self._size <= self.max_size:
+            return
+        for path, (size, _) in sorted(self._entries.items(), key=lambda entry: entry[1][1]):
+            if self._size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            del self._entries[path]
+            self._size -= size
+
+    def get_json(self, key: tuple) -> Optional[Any]:
+        """Returns the JSON response stored under the key, or None if there is none"""
+        path = self._path(key, ".json")
+        try:
+            with open(path, "r", encoding="utf-8") as fi:
+                value = json.load(fi)
+        except (FileNotFoundError, ValueError):
+            return None
+        self._touch(path)
+        return value
+
+    def put_json(self, key: tuple, value: Any) -> None:
+        """Stores a JSON response under the key"""
+        data = json.dumps(value).encode("utf-8")
+        self._commit(self._path(key, ".json"), lambda fi: fi.write(data))
+
+    def get_file(self, key: tuple, destination: str) -> bool:
+        """Copies the file stored under the key to the destination.
+
+        Returns:
+            True if the file was in the cache
+        """
+        path = self._path(key, ".bin")
+        # Copied next to the destination then renamed, under a name of its own: destination.part is where
+        # download_to_file keeps downloads it can resume
+        directory, filename = os.path.split(os.path.abspath(destination))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{filename}.", suffix=".cached")
+        os.close(fd)
+        try:
+            shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, destination)
+        except FileNotFoundError:
+            return False
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._touch(path)
+        return True
+
+    def put_file(self, key: tuple, source: str) -> None:
+        """Stores a copy of the file under the key"""
+        def write(fi):
+            with open(source, "rb") as src:
+                shutil.copyfileobj(src, fi)
+        self._commit(self._path(key, ".bin"), write)
+
+    def __contains__(self, key: tuple) -> bool:
+        return os.path.exists(self._path(key, ".json")) or os.path.exists(self._path(key, ".bin"))
+
+    def clear(self) -> None:
+        """Removes every entry"""
+        with self._lock:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            os.makedirs(self.directory, exist_ok=True)
+            self._entries = {}
+            self._size = 0
@@ -0,0 +1,285 @@
+"""
+cassette
+========
+
+Recording sessions with the Onshape API to a cassette directory and replaying them without a network
+
+A transport sends the HTTP requests of an Onshape instance: the SessionPool by default, or one of the transports here.
+RecordingTransport sends requests through another transport and stores every response; ReplayTransport answers
+requests from what was stored, optionally with simulated latency and server throttling. Replays are deterministic:
+identical requests get the responses recorded for them in the order they were recorded.
+
+A cassette directory holds:
+    cassette.json: the format, any description of the session, and for each request the list of its responses
+        (status, headers, elapsed time and the hash of the body)
+    bodies/<sha256>.gz: the response bodies, compressed and stored once however many responses share them
+
+Requests are keyed by method, path, query and body, so a cassette recorded against one stack replays on any, and the
+signature headers, which change on every request, don't matter.
+"""
+from typing import Any, Optional
+from urllib.parse import parse_qsl, urlencode, urlparse
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+__all__ = [
+    "CassetteError",
+    "RecordingTransport",
+    "ReplayTransport",
+    "request_key",
+]
+
+FORMAT_NAME = "onshape_to_sim.cassette"
+FORMAT_VERSION = 1
+
+_INDEX = "cassette.json"
+_BODIES = "bodies"
+# Headers describing the connection or the encoding on the wire rather than the body, which is stored decoded
+_DROPPED_HEADERS = ("connection", "content-encoding", "content-length", "date", "set-cookie", "transfer-encoding")
+
+
+class CassetteError(LookupError):
+    """Raised when a cassette can't be read, or has no response recorded for a request being replayed."""
+
+
+def request_key(method: str, url: str, body: Any = None) -> str:
+    """Identifies a request in a cassette by its method, path, sorted query and the hash of its body"""
+    parsed = urlparse(url)
+    key = f"{method.upper()} {parsed.path}"
+    query = sorted(parse_qsl(parsed.query, keep_blank_values=True))
+    if len(query) > 0:
+        key += "?" + urlencode(query)
+    if body:
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        key += " " + hashlib.sha256(body).hexdigest()[:16]
+    return key
+
+
+def _read_index(directory: str) -> dict:
+    index_path = os.path.join(directory, _INDEX)
+    if not os.path.isfile(index_path):
+        raise CassetteError(f"{directory} holds no cassette")
+    with open(index_path, "r") as fi:
+        index = json.load(fi)
+    if index.get("format") != FORMAT_NAME:
+        raise CassetteError(f"{directory} holds data of another format: {index.get('format')}")
+    if index["version"] > FORMAT_VERSION:
+        raise CassetteError(
+            f"{directory} was recorded with format version {index['version']}, this version reads up to "
+            f"{FORMAT_VERSION}"
+        )
+    return index
+
+
+class RecordingTransport():
+    """
+    Sends requests through another transport and records their responses to a cassette.
+
+    Response bodies are read whole as they arrive, so the caller streams them from memory. Bodies are written as
+    soon as they are received; the index is written by save, which close calls. Recording into an existing cassette
+    adds to it.
+
+    Attributes:
+        directory: the cassette directory
+        transport: the transport the requests are sent through
+        description: free-form information about the session stored in the cassette, e.g. the document recorded
+    """
+
+    def __init__(self, directory: str, transport: Any, description: Optional[dict] = None):
+        """
+        Args:
+            directory: the cassette directory. Created if it doesn't exist
+            transport: the transport to send the requests through, e.g. a SessionPool
+            description: free-form information about the session stored in the cassette
+        """
+        self.directory = directory
+        self.transport = transport
+        os.makedirs(os.path.join(directory, _BODIES), exist_ok=True)
+        self._interactions = {}
+        self.description = {}
+        if os.path.isfile(os.path.join(directory, _INDEX)):
+            index = _read_index(directory)
+            self._interactions = index["interactions"]
+            self.description = index.get("description", {})
+        if description is not None:
+            self.description.update(description)
+        self._lock = threading.Lock()
+
+    def _store_body(self, body: bytes) -> str:
+        digest = hashlib.sha256(body).hexdigest()
+        path = os.path.join(self.directory, _BODIES, f"{digest}.gz")
+        if not os.path.exists(path):
+            # Written under another name and renamed, so concurrent requests never see a partial body
+            partial_path = f"{path}.{threading.get_ident()}.part"
+            with gzip.open(partial_path, "wb") as fi:
+                fi.write(body)
+            os.replace(partial_path, path)
+        return digest
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Sends a request through the wrapped transport and records the response. Takes the arguments of requests"""
+        start = time.monotonic()
+        response = self.transport.request(method, url, **kwargs)
+        body = response.content
+        elapsed = time.monotonic() - start
+        interaction = {
+            "status": response.status_code,
+            "headers": {
+                name: value for name, value in response.headers.items() if name.lower() not in _DROPPED_HEADERS
+            },
+            "elapsed": round(elapsed, 6),
+            "body": self._store_body(body) if len(body) > 0 else None,
+        }
+        key = request_key(method, url, kwargs.get("data"))
+        with self._lock:
+            self._interactions.setdefault(key, []).append(interaction)
+        return response
+
+    def save(self) -> None:
+        """Writes the index of the cassette"""
+        with self._lock:
+            index = {
+                "format": FORMAT_NAME,
+                "version": FORMAT_VERSION,
+                "description": self.description,
+                "interactions": self._interactions,
+            }
+            partial_path = os.path.join(self.directory, f"{_INDEX}.part")
+            with open(partial_path, "w") as fi:
+                json.dump(index, fi, indent=1)
+            os.replace(partial_path, os.path.join(self.directory, _INDEX))
+
+    def close(self) -> None:
+        """Saves the cassette and closes the wrapped transport"""
+        self.save()
+        self.transport.close()
+
+
+class ReplayTransport():
+    """
+    Answers requests with the responses recorded in a cassette, without a network.
+
+    Each request gets the next response recorded for it, and the last one once they are used up, e.g. for a
+    translation polled more often than when it was recorded. Requests that were never recorded raise a CassetteError.
+
+    Latency and throttling are simulated to benchmark against realistic conditions:
+        - every response is delayed by `latency` seconds, plus the time it took when recorded times
+          `recorded_latency_scale`. Concurrent requests wait concurrently, as they would on a server
+        - with a `rate_limit`, requests beyond `burst` in excess of that many per second are answered with 429 and a
+          Retry-After header, as the API does, so retries and client-side rate limiting are exercised
+
+    Replaying doesn't need credentials, since nothing checks the signatures.
+
+    Attributes:
+        directory: the cassette directory
+        description: the information stored with the cassette when it was recorded
+        latency: seconds added to every response
+        recorded_latency_scale: how much of the recorded time of each response is added to it
+        rate_limit: requests per second answered before throttling, or None to never throttle
+        burst: requests answered at once before throttling
+        num_requests: requests answered so far, including throttled ones
+        num_throttled: requests answered with 429
+    """
+    needs_credentials = False
+
+    def __init__(
+        self,
+        directory: str,
+        latency: float = 0.0,
+        recorded_latency_scale: float = 0.0,
+        rate_limit: Optional[float] = None,
+        burst: Optional[float] = None,
+        ):
+        """
+        Args:
+            directory: the cassette directory
+            latency: seconds added to every response
+            recorded_latency_scale: how much of the recorded time of each response is added to it, e.g. 1.0 to replay
+                at the speed it was recorded
+            rate_limit: requests per second answered before throttling, or None to never throttle
+            burst: requests answered at once before throttling. Defaults to one second worth of requests
+
+        Raises:
+            CassetteError: if the directory doesn't hold a cassette this version can read
+        """
+        self.directory = directory
+        index = _read_index(directory)
+        self.description = index.get("description", {})
+        self._interactions = index["interactions"]
+        self._positions = {}
+        self._bodies = {}
+        self.latency = latency
+        self.recorded_latency_scale = recorded_latency_scale
+        self.rate_limit = rate_limit
+        self.burst = burst if burst is not None else max(1.0, rate_limit or 0.0)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self.num_requests = 0
+        self.num_throttled = 0
+        self._lock = threading.Lock()
+
+    def _next_interaction(self, key: str) -> dict:
+        interactions = self._interactions.get(key)
+        if interactions is None:
+            raise CassetteError(f"No response recorded for {key}")
+        position = self._positions.get(key, 0)
+        self._positions[key] = position + 1
+        return interactions[min(position, len(interactions) - 1)]
+
+    def _throttle(self) -> Optional[float]:
+        """Takes a token of the simulated server, or returns how long to wait for one if there is none"""
+        if self.rate_limit is None:
+            return None
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate_limit)
+        self._last = now
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return None
+        return (1.0 - self._tokens) / self.rate_limit
+
+    def _body(self, digest: Optional[str]) -> bytes:
+        if digest is None:
+            return b""
+        body = self._bodies.get(digest)
+        if body is None:
+            with gzip.open(os.path.join(self.directory, _BODIES, f"{digest}.gz"), "rb") as fi:
+                body = fi.read()
+            self._bodies[digest] = body
+        return body
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Answers a request with its next recorded response. Takes the arguments of requests"""
+        key = request_key(method, url, kwargs.get("data"))
+        with self._lock:
+            self.num_requests += 1
+            retry_after = self._throttle()
+            if retry_after is not None:
+                self.num_throttled += 1
+                interaction = {"status": 429, "headers": {"Retry-After": f"{retry_after:.3f}"}, "elapsed": 0.0,
+                               "body": None}
+            else:
+                interaction = self._next_interaction(key)
+            body = self._body(interaction["body"])
+        delay = self.latency + self.recorded_latency_scale * interaction["elapsed"]
+        if delay > 0:
+            time.sleep(delay)
+        response = requests.Response()
+        response.status_code = interaction["status"]
+        response.headers = CaseInsensitiveDict(interaction["headers"])
+        response.url = url
+        response.reason = "Replayed"
+        response._content = body
+        response._content_consumed = True
+        return response
+
+    def close(self) -> None:
+        pass
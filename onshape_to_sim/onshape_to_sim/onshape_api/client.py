@@ -5,15 +5,24 @@ client
 Convenience functions for working with the Onshape API
 """
 
+from typing import Any, Callable, Optional
+import functools
+import inspect
 import json
 import os
 import random
 import requests
 import string
+import threading
 import time
 from pathlib import Path
 
+from onshape_to_sim.onshape_api.cache import ResponseCache, cache_key
+from onshape_to_sim.onshape_api.coalescing import RequestCoalescer, RequestStats
+from onshape_to_sim.onshape_api.download import download_to_file
 from onshape_to_sim.onshape_api.onshape import Onshape
+from onshape_to_sim.onshape_api.polling import PollSchedule, TranslationPoller
+from onshape_to_sim.onshape_api.retry import RetryPolicy, TokenBucket
 from onshape_to_sim.onshape_api.utils import (
     API,
     CommonAttributes,
@@ -102,6 +111,63 @@ def escape_url(s):
     return s.replace('/', '%2f').replace('+', '%2b')
 
 
+def _is_immutable(wvm: str) -> bool:
+    """Versions and microversions never change, unlike workspaces, so their responses can be cached"""
+    return wvm in (API.version, API.microversion)
+
+
+def _cached_json(method: Optional[Callable] = None, shared: bool = True) -> Callable:
+    """Caches the JSON returned by a Client method on disk when it reads a version or microversion.
+
+    The method must take did, wvm and wvmid arguments, and optionally eid, a part id and a configuration, which
+    together make up the cache key. Identical calls are also coalesced by the client (see RequestCoalescer): calls
+    made while one is in flight wait for its response, and responses of versions and microversions are kept in
+    memory for the lifetime of the client.
+
+    Args:
+        method: the Client method. Use @_cached_json(shared=False) to give arguments
+        shared: whether callers may share the response object. Responses that callers modify, such as assembly
+            definitions, which build_tree modifies, are only cached on disk, where each read is a new object
+    """
+    if method is None:
+        return functools.partial(_cached_json, shared=shared)
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        coalescer = self._coalescer if shared else None
+        if self._cache is None and coalescer is None:
+            return method(self, *args, **kwargs)
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        arguments = bound.arguments
+        is_immutable = _is_immutable(arguments["wvm"])
+        key = cache_key(
+            method.__name__,
+            did=arguments["did"],
+            wvm=arguments["wvm"],
+            wvmid=arguments["wvmid"],
+            eid=arguments.get("eid"),
+            part_id=arguments.get("partid", arguments.get("part_id")),
+            configuration=arguments.get("configuration"),
+        )
+
+        def fetch():
+            if self._cache is None or not is_immutable:
+                return method(self, *args, **kwargs)
+            response = self._cache.get_json(key)
+            if response is None:
+                response = method(self, *args, **kwargs)
+                self._cache.put_json(key, response)
+            return response
+
+        if coalescer is None:
+            return fetch()
+        # Workspaces change, so their responses are only shared between calls in flight at the same time
+        return coalescer.get(key, fetch, keep=is_immutable)
+    return wrapper
+
+
 class Client():
     """
     Defines methods for testing the Onshape API. Comes with several methods:
@@ -115,7 +181,22 @@ class Client():
         - logging (bool, default=True): Turn logging on or off
     """
 
-    def __init__(self, stack='https://cad.onshape.com', logging=True, creds='./config.json'):
+    def __init__(
+        self,
+        stack='https://cad.onshape.com',
+        logging=True,
+        creds='./config.json',
+        pool_size: int = 10,
+        keep_alive: bool = True,
+        retry_policy: Optional[RetryPolicy] = None,
+        rate_limiter: Optional[TokenBucket] = None,
+        use_cache: bool = True,
+        cache_path: Optional[str] = None,
+        cache_size: int = 2 * 1024 ** 3,
+        poll_schedule: Optional[PollSchedule] = None,
+        coalesce_requests: bool = True,
+        transport: Optional[Any] = None,
+        ):
         """
         Instantiates a new Onshape client.
 
@@ -123,10 +204,67 @@ class Client():
             stack: Base URL used to access the API
             logging: Turn logging on or off
             creds: Location of the config.json file holding the credentials
+            pool_size: Number of connections kept alive per host
+            keep_alive: Reuse connections between requests
+            retry_policy: How failed requests are retried
+            rate_limiter: Token bucket limiting the request rate of the client
+            use_cache: Keep responses for document versions and microversions on disk and reuse them
+            cache_path: Where the cache is stored. Defaults to Client.get_cache_path()
+            cache_size: Size of the cache in bytes above which the least recently used responses are evicted
+            poll_schedule: When to poll translations (exports) for their status
+            coalesce_requests: Share identical JSON requests: calls in flight are joined, and responses of versions
+                and microversions are kept in memory for the lifetime of the client
+            transport: Sends the HTTP requests. Defaults to pooled sessions; see cassette to record and replay
+                sessions
         """
         self._stack = stack
-        self._api = Onshape(stack=stack, logging=logging, creds=creds)
+        self._api = Onshape(
+            stack=stack,
+            logging=logging,
+            creds=creds,
+            pool_size=pool_size,
+            keep_alive=keep_alive,
+            retry_policy=retry_policy,
+            rate_limiter=rate_limiter,
+            transport=transport,
+        )
         self.useCollisionsConfigurations = True
+        self._cache = None
+        if use_cache:
+            self._cache = ResponseCache(cache_path or Client.get_cache_path(), max_size=cache_size)
+        self._coalescer = RequestCoalescer() if coalesce_requests else None
+        self.poll_schedule = poll_schedule if poll_schedule is not None else PollSchedule()
+        self._translation_poller = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_cache_path() -> str:
+        """Returns the default location of the response cache"""
+        return os.path.join(Path.home(), ".cache", "onshape-to-sim")
+
+    @property
+    def request_stats(self) -> RequestStats:
+        """How the JSON requests of the client were served: sent, reused from memory, or joined while in flight"""
+        if self._coalescer is None:
+            return RequestStats()
+        return self._coalescer.stats
+
+    def clear_responses(self) -> None:
+        """Forgets the responses kept in memory, e.g. before importing another assembly with the same client"""
+        if self._coalescer is not None:
+            self._coalescer.clear()
+
+    def close(self) -> None:
+        """Stops polling translations and closes the pooled HTTP sessions of the client"""
+        if self._translation_poller is not None:
+            self._translation_poller.close()
+        self._api.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     def rename_document(self, did, name):
         """
@@ -185,26 +323,52 @@ class Client():
         json_request = API.documents
         return self._api.request(API.get_request, json_request).json()
 
-    def ping_async_export_call(self, tid: str, configuration: str = API.default, time_delay: float = 30.0) -> dict:
+    @property
+    def translation_poller(self) -> TranslationPoller:
+        """The loop polling every translation this client waits on"""
+        with self._lock:
+            if self._translation_poller is None:
+                self._translation_poller = TranslationPoller(self.translation_status_request, self.poll_schedule)
+            return self._translation_poller
+
+    def ping_async_export_call(
+        self,
+        tid: str,
+        configuration: str = API.default,
+        time_delay: Optional[float] = None,
+        ) -> dict:
         """Waits for the export call to complete and returns its translation ID.
 
+        Polls adaptively following the client's poll schedule. Calls from several threads share one polling loop.
+
         Args:
-            api_url: The URL where the API is being called
-            time_delay: The amount of time we spend waiting
+            tid: translation id of the item being translated
+            configuration: the configuration of the translation
+            time_delay: If given, poll at this fixed interval in seconds instead
 
         Returns:
             The translation ID which can be used to download the .OBJ files
 
         Raises:
             AttributeError if API is not actively being translated or not done 
+            TimeoutError if the translation isn't done by the deadline of the poll schedule
+        """
+        schedule = None
+        if time_delay is not None:
+            schedule = PollSchedule.fixed(time_delay, deadline=self.poll_schedule.deadline)
+        return self.translation_poller.submit(tid, configuration, schedule).result()
+
+    def wait_for_translations(self, tids: list, configuration: str = API.default) -> list:
+        """Waits for several translations at once, polling them all in one loop.
+
+        Args:
+            tids: translation ids of the items being translated
+            configuration: the configuration of the translations
+
+        Returns:
+            The final status responses, in the order of the translation ids
         """
-        status_response = self.translation_status_request(tid=tid, configuration=configuration)
-        while (request_state := status_response[API.request_state]) != API.done:
-            if request_state != API.active:
-                raise AttributeError(f"Request state terminated with state {request_state}")
-            time.sleep(time_delay)
-            status_response = self.translation_status_request(tid=tid, configuration=configuration)
-        return status_response
+        return self.translation_poller.wait(tids, configuration)
     
     def download_document_external_data(
         self,
@@ -212,17 +376,23 @@ class Client():
         fid: str,
         filename: str,
         file_extension: str,
-        configuration: str = API.default
-        ) -> dict:
+        configuration: str = API.default,
+        checksum: Optional[str] = None,
+        ) -> str:
         """Downloads the external data associated with the document.
 
-        Most commonly used to get .objs and .stls stored in the document
+        Most commonly used to get .objs and .stls stored in the document. The data is streamed to disk and only
+        appears under the filename once complete.
 
         Args:
             did: document id
             fid: file ids associated with the external object
             filename: name of the file we want to store this as
             configuration: the configuration of the thing
+            checksum: expected SHA-256 hex digest of the file
+
+        Returns:
+            The SHA-256 hex digest of the downloaded file
         """
         json_request = join_api_url(
             API.documents,
@@ -231,15 +401,17 @@ class Client():
             API.external_data,
             fid
         )
-        response = self._api.request(
-            API.get_request,
-            json_request,
-            query={API.config: configuration}
-        )
         filename = check_and_append_extension(filename, file_extension)
-        with open(filename, "wb") as fi:
-            fi.write(response.content)
-        return response
+        return download_to_file(
+            lambda headers: self._api.request(
+                API.get_request,
+                json_request,
+                query={API.config: configuration},
+                headers=headers,
+            ),
+            filename,
+            checksum=checksum,
+        )
 
     def part_export_stl(
         self,
@@ -248,7 +420,8 @@ class Client():
         eid: str,
         part_id: str,
         wvm: str = API.workspace,
-        configuration: str = API.default
+        configuration: str = API.default,
+        headers: Optional[dict] = None,
         ) -> requests.Response:
         """
         Exports STL export from a part studio
@@ -259,6 +432,8 @@ class Client():
             wvmid: workspace/version/microversion id
             eid: element id
             part_id: the id of the part
+            configuration: the configuration of the part studio
+            headers: extra headers to send, e.g. a Range to resume a download
 
         Returns:
             Onshape response data with the STL exported inside the request.content
@@ -272,6 +447,8 @@ class Client():
         req_headers = {
             "Accept": "application/octet-stream"
         }
+        if headers is not None:
+            req_headers.update(headers)
         query = {"mode": "binary", "units": "meter", "configuration": configuration, "angleTolerance": 0.1}
         return self._api.request(API.get_request, json_request, headers=req_headers, query=query)
 
@@ -286,17 +463,27 @@ class Client():
         wvm: str = API.workspace,
         resolution: str = API.coarse,
         configuration: str = API.default,
+        checksum: Optional[str] = None,
         ) -> None:
-        resp = self.part_export_stl(
-            did = did,
-            wvm = wvm,
-            wvmid = wvmid,
-            eid = eid,
-            part_id = part_id
-        )
         filename = check_and_append_extension(filename, file_extension)
-        with open(filename, "wb") as fi:
-            fi.write(resp.content)
+        key = cache_key("part_stl", did, wvm, wvmid, eid, part_id, configuration)
+        if self._cache is not None and _is_immutable(wvm) and self._cache.get_file(key, filename):
+            return
+        download_to_file(
+            lambda headers: self.part_export_stl(
+                did = did,
+                wvm = wvm,
+                wvmid = wvmid,
+                eid = eid,
+                part_id = part_id,
+                configuration = configuration,
+                headers = headers,
+            ),
+            filename,
+            checksum=checksum,
+        )
+        if self._cache is not None and _is_immutable(wvm):
+            self._cache.put_file(key, filename)
 
     def assembly_export_obj(
         self,
@@ -387,6 +574,10 @@ class Client():
         resolution: str = API.coarse,
         configuration: str = API.default,
         ) -> None:
+        key = cache_key("assembly_stl", did, wvm, wvmid, eid, configuration=configuration)
+        use_cache = self._cache is not None and _is_immutable(wvm)
+        if use_cache and self._cache.get_file(key, check_and_append_extension(filename, API.stl)):
+            return
         resp = self.assembly_export_stl(
             did = did,
             wvm = wvm,
@@ -396,7 +587,6 @@ class Client():
         )
         try:
             url = resp[API.translation_id]
-            time.sleep(1.0)
             download_resp = self.ping_async_export_call(url)
             fid = download_resp[API.external_data_ids][0]
             resp = self.download_document_external_data(
@@ -405,9 +595,12 @@ class Client():
                 filename = filename,
                 file_extension = API.stl,
             )
+            if use_cache:
+                self._cache.put_file(key, check_and_append_extension(filename, API.stl))
         except KeyError:
             print(f"API call failed; return response {url}")
 
+    @_cached_json
     def all_elements_in_document(
         self,
         did: str,
@@ -427,6 +620,7 @@ class Client():
             json_request,
             ).json()
 
+    @_cached_json
     def element_metadata(
         self,
         did: str,
@@ -451,6 +645,7 @@ class Client():
             ).json()
         return response[CommonAttributes.properties]
 
+    @_cached_json
     def all_parts_in_document(
         self,
         did: str,
@@ -472,6 +667,7 @@ class Client():
             query={API.get_request: configuration}
             ).json()
 
+    @_cached_json
     def all_parts_in_element(
         self,
         did: str,
@@ -495,6 +691,7 @@ class Client():
             query={API.config: configuration}
             ).json()
 
+    @_cached_json
     def all_part_metadata(
         self,
         did: str,
@@ -521,6 +718,7 @@ class Client():
             query={API.config: configuration, API.computed_properties: True}
             ).json()
 
+    @_cached_json
     def part_metadata(
         self,
         did: str,
@@ -551,6 +749,7 @@ class Client():
             ).json()
         return response[CommonAttributes.properties]
 
+    @_cached_json
     def part_mass_properties(
         self, 
         did: str, 
@@ -581,6 +780,38 @@ class Client():
             query={API.config: configuration, API.mass_override: True}
             ).json()
 
+    @_cached_json
+    def part_studio_mass_properties(
+        self,
+        did: str,
+        wvmid: str,
+        eid: str,
+        configuration: str = API.default,
+        wvm: str = API.microversion,
+        ) -> dict:
+        """Retrieves the mass properties of every part in a part studio in a single call.
+
+        Args:
+            did: document id
+            wvm: the type of document we want to draw from (workspace, version, or microversion)
+            wvmid: workspace/version/microversion id
+            eid: element id
+            configuration: the configuration of the part studio
+
+        Returns:
+            The response, whose bodies map each part id to its mass properties
+        """
+        json_request = join_api_url(
+            add_d_wvm_e_ids(API.partstudios, did=did, wvm=wvm, wvmid=wvmid, eid=eid),
+            API.mass_properties
+        )
+        return self._api.request(
+            API.get_request,
+            json_request,
+            query={API.config: configuration, API.mass_as_group: False, API.mass_override: True}
+            ).json()
+
+    @_cached_json(shared=False)
     def assembly_definition(
         self,
         did: str,
@@ -611,6 +842,7 @@ class Client():
             query=query
             ).json()
 
+    @_cached_json
     def assembly_mass_properties(
         self,
         did: str,
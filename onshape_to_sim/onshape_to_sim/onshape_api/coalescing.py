@@ -0,0 +1,100 @@
+"""
+coalescing
+==========
+
+Sharing identical API requests: requests already in flight are joined, and completed responses are reused
+"""
+from typing import Any, Callable, Hashable
+from concurrent.futures import Future
+from dataclasses import dataclass
+import threading
+
+__all__ = [
+    "RequestCoalescer",
+    "RequestStats",
+]
+
+
+@dataclass
+class RequestStats():
+    """How identical requests were served.
+
+    Attributes:
+        hits: requests answered with a response kept from an earlier request
+        misses: requests sent to the API
+        coalesced: requests that waited for an identical request already in flight instead of sending their own
+    """
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+
+    @property
+    def requests(self) -> int:
+        return self.hits + self.misses + self.coalesced
+
+    def __str__(self) -> str:
+        return f"{self.requests} requests: {self.misses} sent, {self.hits} reused, {self.coalesced} coalesced"
+
+
+class RequestCoalescer():
+    """
+    Makes identical requests share a single call to the API.
+
+    The first request for a key runs its call; identical requests arriving while it is in flight wait on the same
+    future rather than calling again. Completed responses can be kept so later requests for the key are answered
+    without any call, for as long as the coalescer lives. Callers of the same key receive the same object, so
+    responses must not be modified. Failures are handed to every waiting request but never kept, so the next request
+    tries again.
+
+    Attributes:
+        stats: how requests were served so far
+    """
+
+    def __init__(self):
+        self.stats = RequestStats()
+        self._responses = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._responses)
+
+    def get(self, key: Hashable, fetch: Callable[[], Any], keep: bool = True) -> Any:
+        """Returns the response of a request, calling fetch only if no identical request can answer it.
+
+        Args:
+            key: identifies the request, e.g. its cache_key
+            fetch: sends the request and returns its response
+            keep: keep the response for later requests. Only keep responses that can't change, e.g. of versions
+        """
+        with self._lock:
+            if key in self._responses:
+                self.stats.hits += 1
+                return self._responses[key]
+            future = self._in_flight.get(key)
+            is_first = future is None
+            if is_first:
+                self.stats.misses += 1
+                future = self._in_flight[key] = Future()
+            else:
+                self.stats.coalesced += 1
+        if not is_first:
+            return future.result()
+        try:
+            response = fetch()
+        except BaseException as error:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(error)
+            raise
+        with self._lock:
+            del self._in_flight[key]
+            if keep:
+                self._responses[key] = response
+        future.set_result(response)
+        return response
+
+    def clear(self) -> None:
+        """Forgets the responses kept so far, e.g. to start a new import. Counters are kept"""
+        with self._lock:
+            self._responses.clear()
@@ -0,0 +1,144 @@
+"""
+download
+========
+
+Streams large API responses, such as meshes, straight to disk
+"""
+from typing import Callable, Optional
+import hashlib
+import os
+
+import requests
+
+from onshape_to_sim.onshape_api.retry import OnshapeAPIError
+
+__all__ = [
+    "ChecksumError",
+    "download_to_file",
+]
+
+
+class ChecksumError(ValueError):
+    """Raised when a downloaded file doesn't match its expected checksum."""
+
+
+def partial_path(filename: str) -> str:
+    """Where a download is written to until it is complete"""
+    return filename + ".part"
+
+
+def validator_path(filename: str) -> str:
+    """Where the ETag of a partial download is kept, to check that it can be resumed"""
+    return partial_path(filename) + ".etag"
+
+
+def _read_validator(filename: str) -> Optional[str]:
+    try:
+        with open(validator_path(filename), "r", encoding="utf-8") as fi:
+            return fi.read() or None
+    except FileNotFoundError:
+        return None
+
+
+def _write_validator(filename: str, etag: Optional[str]) -> None:
+    if etag is None:
+        _remove(validator_path(filename))
+        return
+    with open(validator_path(filename), "w", encoding="utf-8") as fi:
+        fi.write(etag)
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def download_to_file(
+    request: Callable[[dict], requests.Response],
+    filename: str,
+    chunk_size: int = 1024 * 1024,
+    checksum: Optional[str] = None,
+    hash_name: str = "sha256",
+    max_resumes: int = 3,
+    ) -> str:
+    """Streams a response to a file in chunks, so the whole file never sits in memory.
+
+    The data goes to `<filename>.part`, which is renamed to the filename once complete. If the connection drops,
+    the download resumes from the end of the partial file with a Range request. The ETag of the response is kept
+    next to the partial file and sent as If-Range, so the server only sends the rest if the resource hasn't changed
+    since, and the whole of it otherwise. That makes partial files left over from a previous run safe to resume too,
+    unless they have no ETag, in which case they are discarded. Servers that ignore the Range header get the file
+    rewritten from the start.
+
+    Args:
+        request: issues the GET request given extra headers to send, and returns the streamed response
+        filename: where to write the file
+        chunk_size: number of bytes read from the connection at a time
+        checksum: expected hex digest of the file. The file is discarded if it doesn't match
+        hash_name: the hashlib algorithm of the checksum
+        max_resumes: how many times a dropped download is resumed before giving up
+
+    Returns:
+        The hex digest of the downloaded file
+
+    Raises:
+        ChecksumError if the file doesn't match the checksum
+    """
+    part = partial_path(filename)
+    # Without an ETag, only what this call downloaded itself is known to be from the same resource
+    etag = _read_validator(filename)
+    if etag is None:
+        _remove(part)
+    resumes = 0
+    while True:
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        headers = {}
+        if offset > 0:
+            headers["Range"] = f"bytes={offset}-"
+            if etag is not None:
+                headers["If-Range"] = etag
+        try:
+            response = request(headers)
+        except OnshapeAPIError as ex:
+            if offset > 0 and ex.response is not None and ex.response.status_code == 416:
+                # The partial file doesn't fit the resource anymore
+                _remove(part)
+                continue
+            raise
+        hasher = hashlib.new(hash_name)
+        if response.status_code != 206:
+            etag = response.headers.get("ETag")
+            if etag is not None and etag.startswith("W/"):
+                # If-Range only accepts strong validators
+                etag = None
+            _write_validator(filename, etag)
+        if response.status_code == 206:
+            mode = "ab"
+            with open(part, "rb") as fi:
+                for chunk in iter(lambda: fi.read(chunk_size), b""):
+                    hasher.update(chunk)
+        else:
+            mode = "wb"
+        try:
+            with open(part, mode) as fi:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    fi.write(chunk)
+                    hasher.update(chunk)
+        except (requests.ConnectionError, requests.exceptions.ChunkedEncodingError):
+            if resumes >= max_resumes:
+                raise
+            resumes += 1
+            continue
+        finally:
+            response.close()
+        break
+
+    _remove(validator_path(filename))
+    digest = hasher.hexdigest()
+    if checksum is not None and digest != checksum.lower():
+        os.remove(part)
+        raise ChecksumError(f"{filename} has {hash_name} {digest}, expected {checksum}")
+    os.replace(part, filename)
+    return digest
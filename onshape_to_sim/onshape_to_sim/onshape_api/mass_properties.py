@@ -0,0 +1,42 @@
+"""
+mass_properties
+===============
+
+Batched retrieval of the mass properties of parts and assemblies
+"""
+from typing import Optional
+
+from onshape_to_sim.onshape_api.batching import ElementResolver
+from onshape_to_sim.onshape_api.utils import MassAttributes
+
+__all__ = [
+    "MassPropertiesResolver"
+]
+
+
+class MassPropertiesResolver(ElementResolver):
+    """
+    Resolves mass properties with one API call per element instead of one per part.
+
+    The mass properties endpoint of a part studio returns every body of the studio at once, so each part studio is
+    fetched a single time and each part gets its own body. Parts the studio response leaves out (e.g. when they
+    can't be computed as a group) are requested on their own.
+    """
+
+    def _request_element(self, key: tuple, is_part_studio: bool) -> dict:
+        did, wvm, wvmid, eid, configuration = key
+        if is_part_studio:
+            return self.client.part_studio_mass_properties(
+                did=did, wvmid=wvmid, eid=eid, configuration=configuration, wvm=wvm
+            )
+        return self.client.assembly_mass_properties(did=did, wvmid=wvmid, eid=eid, configuration=configuration, wvm=wvm)
+
+    def _request_part(self, key: tuple, part_id: str) -> dict:
+        did, wvm, wvmid, eid, configuration = key
+        response = self.client.part_mass_properties(
+            did=did, wvmid=wvmid, eid=eid, partid=part_id, configuration=configuration, wvm=wvm
+        )
+        return response[MassAttributes.bodies][part_id]
+
+    def _part_from_response(self, response: dict, part_id: str) -> Optional[dict]:
+        return response.get(MassAttributes.bodies, {}).get(part_id)
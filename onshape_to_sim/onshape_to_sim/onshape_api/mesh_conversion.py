@@ -0,0 +1,194 @@
+"""
+mesh_conversion
+===============
+
+Converting the STL meshes exported by Onshape to OBJ meshes, in process and with numpy
+"""
+from typing import Optional, Sequence
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+import numpy as np
+import numpy.typing as npt
+
+__all__ = [
+    "STL_COUNT_SIZE",
+    "STL_HEADER_SIZE",
+    "STL_TRIANGLE",
+    "convert_stls_to_objs",
+    "read_obj",
+    "read_stl_triangles",
+    "stl_to_obj",
+    "stl_triangle_count",
+    "weld_vertices",
+    "write_obj",
+]
+
+# A triangle of a binary STL: its normal, its three vertices and an attribute byte count, 50 bytes in all
+STL_TRIANGLE = np.dtype([
+    ("normal", "<f4", (3,)),
+    ("vertices", "<f4", (3, 3)),
+    ("attribute", "<u2"),
+])
+# A binary STL starts with an 80 byte header and a little-endian uint32 count of the triangles that follow
+STL_HEADER_SIZE = 80
+STL_COUNT_SIZE = 4
+# Rows formatted by a single % operation when writing OBJ files
+_WRITE_CHUNK = 65536
+
+
+def stl_triangle_count(file_path: str) -> Optional[int]:
+    """Reads the number of triangles of a binary STL from its header, without reading the triangles.
+
+    A file is binary if its size matches the triangle count after its header. ASCII files start with "solid", but so
+    do the headers of some binary files, so the size is checked instead.
+
+    Returns:
+        The number of triangles, or None for ASCII files, whose triangles can only be counted by parsing them
+    """
+    size = os.path.getsize(file_path)
+    if size < STL_HEADER_SIZE + STL_COUNT_SIZE:
+        return None
+    with open(file_path, "rb") as fi:
+        fi.seek(STL_HEADER_SIZE)
+        num_triangles = int(np.frombuffer(fi.read(STL_COUNT_SIZE), dtype="<u4")[0])
+    if size != STL_HEADER_SIZE + STL_COUNT_SIZE + num_triangles * STL_TRIANGLE.itemsize:
+        return None
+    return num_triangles
+
+
+def _read_ascii_stl(file_path: str) -> npt.NDArray:
+    with open(file_path, "r") as fi:
+        coordinates = [line.split()[1:4] for line in fi if line.lstrip().startswith("vertex")]
+    return np.array(coordinates, dtype=np.float32).reshape(-1, 3, 3)
+
+
+def read_stl_triangles(file_path: str) -> npt.NDArray:
+    """Reads the triangles of an STL file.
+
+    Binary files are read in one go into the STL_TRIANGLE layout; ASCII files are parsed line by line.
+
+    Returns:
+        A (N, 3, 3) float32 array of the vertices of each triangle
+    """
+    if stl_triangle_count(file_path) is None:
+        return _read_ascii_stl(file_path)
+    triangles = np.fromfile(file_path, dtype=STL_TRIANGLE, offset=STL_HEADER_SIZE + STL_COUNT_SIZE)
+    return triangles["vertices"]
+
+
+def weld_vertices(triangles: npt.NDArray) -> tuple:
+    """Merges the vertices shared by triangles, which STL files repeat for every triangle using them.
+
+    Vertices are merged when their coordinates are identical. This is np.unique over the rows of the vertices, but
+    sorts the bit patterns of the float32 coordinates as integers with lexsort, which is several times faster than
+    np.unique(axis=0). Triangles left with repeated vertices are dropped.
+
+    Args:
+        triangles: (N, 3, 3) float32 vertices of each triangle
+
+    Returns:
+        The (V, 3) unique vertices, in the order of their bit patterns, and the (F, 3) indices of the vertices of each
+        triangle
+    """
+    # Adding zero turns -0.0 into 0.0, which would otherwise be a different vertex
+    points = triangles.reshape(-1, 3).astype(np.float32) + np.float32(0.0)
+    if len(points) == 0:
+        return points, np.zeros((0, 3), dtype=np.intp)
+    keys = points.view(np.int32)
+    order = np.lexsort((keys[:, 2], keys[:, 1], keys[:, 0]))
+    sorted_keys = keys[order]
+    is_first = np.empty(len(points), dtype=bool)
+    is_first[0] = True
+    np.any(sorted_keys[1:] != sorted_keys[:-1], axis=1, out=is_first[1:])
+    inverse = np.empty(len(points), dtype=np.intp)
+    inverse[order] = np.cumsum(is_first) - 1
+    vertices = points[order[is_first]]
+    faces = inverse.reshape(-1, 3)
+    is_degenerate = (faces[:, 0] == faces[:, 1]) | (faces[:, 1] == faces[:, 2]) | (faces[:, 0] == faces[:, 2])
+    return vertices, faces[~is_degenerate]
+
+
+def write_obj(file_path: str, vertices: npt.NDArray, faces: npt.NDArray) -> None:
+    """Writes vertices and triangles to an OBJ file.
+
+    Rows are formatted in chunks by a single % operation each, rather than one write per row.
+
+    Args:
+        file_path: where to write the OBJ file
+        vertices: (V, 3) coordinates of the vertices
+        faces: (F, 3) 0-based indices of the vertices of each triangle
+    """
+    with open(file_path, "w") as fo:
+        # 9 significant digits round-trip float32 coordinates
+        for start in range(0, len(vertices), _WRITE_CHUNK):
+            chunk = vertices[start:start + _WRITE_CHUNK]
+            fo.write(("v %.9g %.9g %.9g\n" * len(chunk)) % tuple(chunk.ravel().tolist()))
+        for start in range(0, len(faces), _WRITE_CHUNK):
+            chunk = faces[start:start + _WRITE_CHUNK] + 1
+            fo.write(("f %d %d %d\n" * len(chunk)) % tuple(chunk.ravel().tolist()))
+
+
+def read_obj(file_path: str) -> tuple:
+    """Reads the vertices and faces of an OBJ file.
+
+    Faces of more than three vertices are split into fans of triangles. Texture and normal indices are ignored.
+
+    Returns:
+        The (V, 3) float32 coordinates of the vertices and the (F, 3) 0-based indices of the vertices of each triangle
+    """
+    vertices, faces = [], []
+    with open(file_path, "r") as fi:
+        for line in fi:
+            if line.startswith("v "):
+                vertices.append(line.split()[1:4])
+            elif line.startswith("f "):
+                # Indices are 1-based, or relative to the end when negative
+                polygon = [int(value.split("/")[0]) for value in line.split()[1:]]
+                polygon = [index - 1 if index > 0 else len(vertices) + index for index in polygon]
+                faces.extend([polygon[0], polygon[i], polygon[i + 1]] for i in range(1, len(polygon) - 1))
+    return np.array(vertices, dtype=np.float32).reshape(-1, 3), np.array(faces, dtype=np.intp).reshape(-1, 3)
+
+
+def stl_to_obj(stl_path: str, obj_path: str) -> tuple:
+    """Converts an STL file to an OBJ file with shared vertices.
+
+    Returns:
+        The number of vertices and triangles written
+    """
+    vertices, faces = weld_vertices(read_stl_triangles(stl_path))
+    write_obj(obj_path, vertices, faces)
+    return len(vertices), len(faces)
+
+
+def _stl_to_obj(paths: tuple) -> tuple:
+    return stl_to_obj(*paths)
+
+
+def convert_stls_to_objs(
+    stl_paths: Sequence[str],
+    obj_paths: Sequence[str],
+    max_workers: Optional[int] = None,
+    ) -> list:
+    """Converts STL files to OBJ files, several at once on a process pool.
+
+    Args:
+        stl_paths: the STL files to convert
+        obj_paths: where to write the OBJ file of each STL file
+        max_workers: number of processes converting files. Defaults to the number of CPUs; 1 converts in this
+            process
+
+    Returns:
+        The number of vertices and triangles written for each file, in order
+    """
+    if len(stl_paths) != len(obj_paths):
+        raise ValueError(f"Got {len(stl_paths)} STL files but {len(obj_paths)} OBJ paths")
+    jobs = list(zip(stl_paths, obj_paths))
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = min(max_workers, len(jobs))
+    # A pool costs more to start than converting a single file
+    if max_workers <= 1:
+        return [_stl_to_obj(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_stl_to_obj, jobs, chunksize=max(1, len(jobs) // (4 * max_workers))))
@@ -0,0 +1,44 @@
+"""
+metadata
+========
+
+Batched retrieval of the metadata properties of parts and assemblies
+"""
+from typing import Optional, Union
+
+from onshape_to_sim.onshape_api.batching import ElementResolver
+from onshape_to_sim.onshape_api.utils import CommonAttributes, PartAttributes
+
+__all__ = [
+    "MetadataResolver"
+]
+
+
+class MetadataResolver(ElementResolver):
+    """
+    Resolves metadata properties with one API call per element instead of one per instance.
+
+    The part metadata endpoint of an element lists the properties of all of its parts, so each part studio is
+    fetched a single time. Assemblies use the element metadata. Either way, each instance resolves to its list of
+    properties, as returned by Client.part_metadata and Client.element_metadata.
+    """
+
+    def _request_element(self, key: tuple, is_part_studio: bool) -> Union[dict, list]:
+        did, wvm, wvmid, eid, configuration = key
+        if is_part_studio:
+            response = self.client.all_part_metadata(did=did, wvmid=wvmid, eid=eid, configuration=configuration, wvm=wvm)
+            # Keyed by part id so each part is found directly
+            return {
+                item[PartAttributes.partId]: item[CommonAttributes.properties]
+                for item in response[CommonAttributes.items]
+            }
+        return self.client.element_metadata(did=did, wvmid=wvmid, eid=eid, configuration=configuration, wvm=wvm)
+
+    def _request_part(self, key: tuple, part_id: str) -> list:
+        did, wvm, wvmid, eid, configuration = key
+        return self.client.part_metadata(
+            did=did, wvmid=wvmid, eid=eid, partid=part_id, configuration=configuration, wvm=wvm
+        )
+
+    def _part_from_response(self, response: dict, part_id: str) -> Optional[list]:
+        return response.get(part_id)
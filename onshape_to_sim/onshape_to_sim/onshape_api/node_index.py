@@ -0,0 +1,135 @@
+"""
+node_index
+==========
+
+Lookups of the nodes of a tree by occurrence id, instance id, element id and name, without walking the tree
+"""
+from typing import Any, Iterable, Iterator, Optional, Sequence
+
+from onshape_to_sim.onshape_api.utils import CommonAttributes
+
+__all__ = [
+    "NodeIndex",
+    "ancestors",
+    "descendants",
+]
+
+
+def ancestors(node: Any) -> Iterator[Any]:
+    """Yields the parents of a node, from its parent up to the root"""
+    node = node.parent_node
+    while node is not None:
+        yield node
+        node = node.parent_node
+
+
+def descendants(node: Any) -> Iterator[Any]:
+    """Yields the nodes below a node, depth first and in the order of their children"""
+    stack = list(reversed(node.children))
+    while len(stack) > 0:
+        next_node = stack.pop()
+        yield next_node
+        stack.extend(reversed(next_node.children))
+
+
+def _element_id(element_dict: Optional[dict]) -> Optional[str]:
+    return None if element_dict is None else element_dict.get(CommonAttributes.elementId)
+
+
+class NodeIndex():
+    """Maps the keys of the nodes of a tree to the nodes.
+
+    Occurrence ids, names and link names (simplified names) identify a single node. Instance ids and element ids are
+    shared by every copy of a subassembly, so they map to all the nodes using them, in the order the nodes were added.
+    Should a tree hold duplicate unique keys, e.g. a tree converted from an older format, the first node keeps the key.
+
+    Trees keep their index up to date as nodes are added and as the element of a node is replaced; the other keys of
+    a node are set when it is created and don't change afterwards.
+    """
+
+    def __init__(self, nodes: Iterable[Any] = ()):
+        """
+        Args:
+            nodes: the nodes to index, in the order they were added to their tree
+        """
+        self._by_occurrence_id = {}
+        self._by_name = {}
+        self._by_link_name = {}
+        self._by_node_id = {}
+        self._by_element_id = {}
+        self._root = None
+        self._num_nodes = 0
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self) -> int:
+        return self._num_nodes
+
+    def add(self, node: Any) -> None:
+        """Indexes a node under its keys"""
+        if self._root is None:
+            self._root = node
+        self._by_occurrence_id.setdefault(node.occurrence_id, node)
+        self._by_name.setdefault(node.name, node)
+        self._by_link_name.setdefault(node.simplified_name, node)
+        self._by_node_id.setdefault(node.node_id, []).append(node)
+        self._by_element_id.setdefault(_element_id(node.element_dict), []).append(node)
+        self._num_nodes += 1
+
+    def replace_element(self, node: Any, old_element_dict: Optional[dict], new_element_dict: Optional[dict]) -> None:
+        """Moves a node from the element id of its old element to that of its new one"""
+        old_element_id = _element_id(old_element_dict)
+        new_element_id = _element_id(new_element_dict)
+        if old_element_id == new_element_id:
+            return
+        nodes = self._by_element_id[old_element_id]
+        nodes.remove(node)
+        if len(nodes) == 0:
+            del self._by_element_id[old_element_id]
+        self._by_element_id.setdefault(new_element_id, []).append(node)
+
+    def by_occurrence_id(self, occurrence_id: str) -> Optional[Any]:
+        """Returns the node of an occurrence id, the instance ids of its path joined, or None"""
+        return self._by_occurrence_id.get(occurrence_id)
+
+    def by_name(self, name: str) -> Optional[Any]:
+        """Returns the node with a name, e.g. "Part 1 <1> 0", or None"""
+        return self._by_name.get(name)
+
+    def by_link_name(self, simplified_name: str) -> Optional[Any]:
+        """Returns the node with a simplified name, as used for links and joint parents, or None"""
+        return self._by_link_name.get(simplified_name)
+
+    def by_node_id(self, node_id: str) -> list:
+        """Returns the nodes that are copies of an instance, i.e. whose path ends with the instance id"""
+        return list(self._by_node_id.get(node_id, ()))
+
+    def by_element_id(self, element_id: str) -> list:
+        """Returns the nodes that are instances of an element (part studio or subassembly)"""
+        return list(self._by_element_id.get(element_id, ()))
+
+    def by_path(self, path: Sequence[str]) -> Optional[Any]:
+        """Returns the node at a path of instance ids from the root, e.g. an occurrence path, or None"""
+        if len(path) == 0:
+            return self._root
+        return self._by_occurrence_id.get("".join(path))
+
+    def with_prefix(self, path: Sequence[str]) -> list:
+        """Returns the node at a path and every node below it, i.e. all the nodes whose path starts with it"""
+        node = self.by_path(path)
+        if node is None:
+            return []
+        return [node] + list(descendants(node))
+
+    def closest_rigid_body(self, path: Sequence[str]) -> Optional[Any]:
+        """Returns the highest rigid body on a path of instance ids: the link a part at that path belongs to.
+
+        Looks up each leading part of the path in turn, so a lookup costs the depth of the path.
+        """
+        occurrence_id = ""
+        for instance_id in path:
+            occurrence_id += instance_id
+            node = self._by_occurrence_id.get(occurrence_id)
+            if node is not None and node.is_rigid_body:
+                return node
+        return None
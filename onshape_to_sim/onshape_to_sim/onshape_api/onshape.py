@@ -4,21 +4,23 @@ onshape
 
 Provides access to the Onshape REST API
 """
-from typing import Optional
+from typing import Any, Optional
 import sys
 import pdb
 
 from . import utils
+from .retry import OnshapeAPIError, RetryPolicy, TokenBucket
+from .session import SessionPool
 
 import os
-import random
-import string
 import commentjson as json
 import hmac
 import hashlib
 import base64
+import secrets
 import urllib
 import datetime
+import time
 import requests
 from colorama import Fore, Back, Style
 from urllib.parse import urlparse
@@ -28,6 +30,14 @@ __all__ = [
     "Onshape"
 ]
 
+_DATE_FORMAT = "%a, %d %b %Y %H:%M:%S GMT"
+# Headers sent with every request, besides the ones signing it
+_STATIC_HEADERS = {
+    "Content-Type": "application/json",
+    "User-Agent": "Onshape Python Sample App",
+    "Accept": "application/json",
+}
+
 
 class Onshape():
     """
@@ -37,9 +47,24 @@ class Onshape():
         stack: Base URL used to access the Onshape API
         creds: File path to the the location where credentials are stored
         logging: Turn logging on or off
+        pool_size: Number of connections kept alive per host
+        keep_alive: Reuse connections between requests
+        retry_policy: How failed requests are retried
+        rate_limiter: Token bucket shared by every request of this instance, or None for no client-side limit
+        transport: Sends the HTTP requests: the pooled sessions, or e.g. a cassette transport
     """
 
-    def __init__(self, stack: str, creds: str = "./config.json", logging: bool = True):
+    def __init__(
+        self,
+        stack: str,
+        creds: str = "./config.json",
+        logging: bool = True,
+        pool_size: int = 10,
+        keep_alive: bool = True,
+        retry_policy: Optional[RetryPolicy] = None,
+        rate_limiter: Optional[TokenBucket] = None,
+        transport: Optional[Any] = None,
+        ):
         """
         Instantiates an instance of the Onshape class. Reads credentials from a JSON file
         of this format:
@@ -59,18 +84,28 @@ class Onshape():
             stack: Base URL used to access the Onshape API
             creds: File path to the the location where credentials are stored
             logging: Turn logging on or off
+            pool_size: Number of connections kept alive per host. Set this to at least the number of threads
+                sharing the instance.
+            keep_alive: Reuse connections between requests
+            retry_policy: How failed requests are retried. Defaults to RetryPolicy()
+            rate_limiter: Token bucket shared by every request of this instance, or None for no client-side limit
+            transport: Sends the HTTP requests, with the interface of SessionPool.request and close. Defaults to a
+                SessionPool. Transports replaying recorded sessions (see cassette) don't need a credential file
         """
         self._api_version = "/api/v6/"
-        if not os.path.isfile(creds):
-            raise IOError(f"Credential file {creds} is not a file")
-
         self._logging = logging
 
-        with open(creds, "r", encoding="utf-8") as stream:
-            try:
-                config = json.load(stream)
-            except TypeError as ex:
-                raise ValueError(f"Credential file {creds} is not valid json") from ex
+        if os.path.isfile(creds):
+            with open(creds, "r", encoding="utf-8") as stream:
+                try:
+                    config = json.load(stream)
+                except TypeError as ex:
+                    raise ValueError(f"Credential file {creds} is not valid json") from ex
+        elif transport is not None and not getattr(transport, "needs_credentials", True):
+            # Nothing checks the signatures of replayed requests
+            config = {"onshape_api": stack, "onshape_access_key": "replay", "onshape_secret_key": "replay"}
+        else:
+            raise IOError(f"Credential file {creds} is not a file")
 
         try:
             self._url = config["onshape_api"]
@@ -96,9 +131,31 @@ class Onshape():
             if self._url is None or self._access_key is None or self._secret_key is None:
                 exit("No key in config.json, and environment variables not set")
 
+        if transport is None:
+            transport = SessionPool(pool_size=pool_size, keep_alive=keep_alive)
+        # Named after the SessionPool it usually is
+        self._sessions = transport
+        # Signing state that doesn't change between requests. The keyed HMAC is copied for each signature rather
+        # than keyed again, and the date header only changes once a second
+        self._hmac = hmac.new(self._secret_key, digestmod=hashlib.sha256)
+        self._auth_prefix = "On " + self._access_key.decode("utf-8") + ":HmacSHA256:"
+        self._date = (0, "")
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.rate_limiter = rate_limiter
+
         if self._logging:
             utils.log(f"onshape instance created: url ={self._url}, access key = {self._access_key}")
 
+    def close(self) -> None:
+        """Closes the transport: every pooled session and its connections, or e.g. the cassette being recorded"""
+        self._sessions.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
     def _make_nonce(self) -> str:
         """
         Generate a unique ID for the request, 25 chars in length
@@ -107,14 +164,24 @@ class Onshape():
             The cryptographic nonce
         """
 
-        chars = string.digits + string.ascii_letters
-        nonce = "".join(random.choice(chars) for i in range(25))
+        # Onshape expects an alphanumeric nonce, so no URL-safe "-" or "_". Hex digits are drawn in one call, where
+        # choosing characters one at a time makes signing slower than it used to be
+        nonce = secrets.token_hex(13)[:25]
 
         if self._logging:
             utils.log(f"nonce created: {nonce}")
 
         return nonce
 
+    def _make_date(self) -> str:
+        """The HTTP date header of a request sent now, formatted once per second"""
+        now = int(time.time())
+        second, date = self._date
+        if second != now:
+            date = datetime.datetime.fromtimestamp(now, datetime.timezone.utc).strftime(_DATE_FORMAT)
+            self._date = (now, date)
+        return date
+
     def _make_auth(
         self,
         method: str,
@@ -132,20 +199,22 @@ class Onshape():
             date: HTTP date header string
             nonce: Cryptographic nonce
             path: URL pathname
-            query: URL query string in key-value pairs
+            query: URL query string in key-value pairs, or already encoded
             ctype: HTTP Content-Type
 
         Returns:
             The authorization signature
         """
 
-        query = urllib.parse.urlencode(query)
+        if not isinstance(query, str):
+            query = urllib.parse.urlencode(query)
 
-        hmac_str = (method + "\n" + nonce + "\n" + date + "\n" + ctype + "\n" + path +
-                    "\n" + query + "\n").lower().encode("utf-8")
+        hmac_str = f"{method}\n{nonce}\n{date}\n{ctype}\n{path}\n{query}\n".lower().encode("utf-8")
 
-        signature = base64.b64encode(hmac.new(self._secret_key, hmac_str, digestmod=hashlib.sha256).digest())
-        auth = "On " + self._access_key.decode("utf-8") + ":HmacSHA256:" + signature.decode("utf-8")
+        signer = self._hmac.copy()
+        signer.update(hmac_str)
+        signature = base64.b64encode(signer.digest())
+        auth = self._auth_prefix + signature.decode("utf-8")
 
         if self._logging:
             utils.log({
@@ -170,31 +239,26 @@ class Onshape():
         Args:
             method: HTTP method
             path: Request path, e.g. /api/documents. No query string
-            query: Query string in key-value format
+            query: Query string in key-value format, or already encoded
             headers: Other headers to pass in
 
         Returns:
             Dictionary containing all headers
         """
 
-        date = datetime.datetime.utcnow().strftime("%a, %d %b %Y %H:%M:%S GMT")
+        date = self._make_date()
         nonce = self._make_nonce()
-        ctype = headers.get("Content-Type") if headers.get("Content-Type") else "application/json"
+        ctype = headers.get("Content-Type") or "application/json"
 
         auth = self._make_auth(method, date, nonce, path, query=query, ctype=ctype)
 
-        req_headers = {
-            "Content-Type": "application/json",
-            "Date": date,
-            "On-Nonce": nonce,
-            "Authorization": auth,
-            "User-Agent": "Onshape Python Sample App",
-            "Accept": "application/json"
-        }
+        req_headers = dict(_STATIC_HEADERS)
+        req_headers["Date"] = date
+        req_headers["On-Nonce"] = nonce
+        req_headers["Authorization"] = auth
 
         # add in user-defined headers
-        for h in headers:
-            req_headers[h] = headers[h]
+        req_headers.update(headers)
 
         return req_headers
 
@@ -206,7 +270,8 @@ class Onshape():
         headers: dict = {},
         body: dict = {},
         base_url: Optional[str] = None,
-        add_api_version: bool = True
+        add_api_version: bool = True,
+        idempotent: Optional[bool] = None,
         ) -> requests.Response:
         """
         Issues a request to Onshape
@@ -218,29 +283,38 @@ class Onshape():
             headers: Key-value pairs of headers
             body: Body for POST request
             base_url: Host, including scheme and port (if different from creds file)
+            idempotent: Whether the request can be repeated safely, so retried after dropped connections and server
+                errors. Defaults to whether the method is idempotent, see RetryPolicy
 
         Returns:
             Object containing the response from Onshape
+
+        Raises:
+            OnshapeAPIError if the response is still an error after retrying
         """
         if add_api_version:
             path = self._api_version + path
-        req_headers = self._make_headers(method, path, query, headers)
         if base_url is None:
             base_url = self._url
-        url = base_url + path + "?" + urllib.parse.urlencode(query)
+        # Encoded once, for the URL and for the signature of every attempt
+        query_string = urllib.parse.urlencode(query)
+        url = base_url + path + "?" + query_string
 
         if self._logging:
             utils.log(body)
-            utils.log(req_headers)
             utils.log(f"request url: {url}")
 
         # only parse as json string if we have to
         body = json.dumps(body) if type(body) == dict else body
         # print(body)
 
-        res = requests.request(method, url, headers=req_headers, data=body, allow_redirects=False, stream=True)
+        if idempotent is None:
+            idempotent = self.retry_policy.is_idempotent(method)
+        res = self._send(method, url, path, query_string, headers, body, idempotent)
         if res.status_code == 307:
             location = urlparse(res.headers["Location"])
+            # Nothing is read from the redirect, so hand its connection back to the pool
+            res.close()
             querystring = parse_qs(location.query)
 
             if self._logging:
@@ -252,8 +326,9 @@ class Onshape():
             for key in querystring:
                 new_query[key] = querystring[key][0]  # won"t work for repeated query params
 
-            return self.request(method, location.path, query=new_query, headers=headers, base_url=new_base_url, add_api_version=False)
-        elif not res.status_code == 200:
+            return self.request(method, location.path, query=new_query, headers=headers, base_url=new_base_url, add_api_version=False,
+                                idempotent=idempotent)
+        elif not 200 <= res.status_code < 300:
             print(f"! ERROR ({res.status_code}) while using OnShape API")
             if res.text:
                 print(f"! {res.text}")
@@ -262,8 +337,66 @@ class Onshape():
                 print("HINT: Check that your access rights are correct, and that the clock on your computer is set correctly")
             if self._logging:
                 utils.log(f"request failed, details: {res.text}", level=1)
+            raise OnshapeAPIError(f"{method.upper()} {path} failed with status {res.status_code}", response=res)
         else:
             if self._logging:
                 utils.log(f"request succeeded, details: {res.text}")
 
         return res
+
+    def _send(
+        self,
+        method: str,
+        url: str,
+        path: str,
+        query: str,
+        headers: dict,
+        body,
+        idempotent: bool = True,
+        ) -> requests.Response:
+        """Sends a request, retrying throttled requests, and server errors and dropped connections if it is idempotent.
+
+        Every attempt waits on the rate limiter and is signed again, since the signature covers the date and nonce.
+
+        Args:
+            method: HTTP method
+            url: Full URL including the query string
+            path: URL pathname, signed along with the query
+            query: Encoded query string, signed along with the path
+            headers: Key-value pairs of headers
+            body: Serialized body
+            idempotent: Whether the request can be repeated safely
+
+        Returns:
+            The last response received
+        """
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            req_headers = self._make_headers(method, path, query, headers)
+            if self._logging:
+                utils.log(req_headers)
+            try:
+                res = self._sessions.request(
+                    method, url, headers=req_headers, data=body, allow_redirects=False, stream=True
+                )
+            except (requests.ConnectionError, requests.Timeout) as ex:
+                if not self.retry_policy.should_retry(attempt, idempotent=idempotent):
+                    raise
+                delay = self.retry_policy.backoff(attempt)
+                if self._logging:
+                    utils.log(f"request to {url} failed ({ex}), retrying in {delay:.2f}s", level=1)
+            else:
+                if not self.retry_policy.should_retry(attempt, res.status_code, idempotent):
+                    if self.rate_limiter is not None and res.status_code != 429:
+                        self.rate_limiter.succeed()
+                    return res
+                delay = self.retry_policy.delay(attempt, res)
+                if res.status_code == 429 and self.rate_limiter is not None:
+                    self.rate_limiter.throttle(delay)
+                if self._logging:
+                    utils.log(f"request to {url} returned {res.status_code}, retrying in {delay:.2f}s", level=1)
+                res.close()
+            time.sleep(delay)
+            attempt += 1
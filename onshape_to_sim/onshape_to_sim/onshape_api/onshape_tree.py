@@ -5,16 +5,25 @@ from typing import Any, Callable, Optional, Sequence
 import copy
 
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass, asdict
 from enum import Enum
 import json
 import pdb
 import os
+import pickle
+import time
 
 import numpy as np
 import numpy.typing as npt
 
+from onshape_to_sim.onshape_api.assembly_diff import diff_assembly_definitions
 from onshape_to_sim.onshape_api.client import Client
+from onshape_to_sim.onshape_api.mass_properties import MassPropertiesResolver
+from onshape_to_sim.onshape_api.metadata import MetadataResolver
+from onshape_to_sim.onshape_api.node_index import NodeIndex, ancestors
+from onshape_to_sim.onshape_api.path_index import PathSuffixIndex, build_joint_start_index
+from onshape_to_sim.onshape_api.tree_format import StoredTree, is_stored_tree, save_tree
 from onshape_to_sim.onshape_api.utils import (
     API,
     APIAttributes,
@@ -29,14 +38,18 @@ from onshape_to_sim.onshape_api.utils import (
     join_api_url,
 )
 from onshape_to_sim.utils import (
+    express_all_mass_properties_in_world_frame,
     express_mass_properties_in_world_frame,
     load_from_pickle,
-    save_in_pickle,
 )
 
 # TODO: figure out if this is going to be here later
 
 
+# Keys of the data stored by build_tree that update_tree needs
+_ASSEMBLY_DEFINITION = "assembly_definition"
+_RESPONSES = "responses"
+
 part_relevant_metadata = set(("Rigid Body",))
 assembly_relevant_metadata = set(("Rigid Body",))
 
@@ -50,25 +63,182 @@ def get_element_tform_mate(mated_cs: dict) -> npt.ArrayLike:
     return np.round(element_tform_mate, decimals=10)
 
 
-def find_related_joints(joint_map: dict, occurrence_id: str) -> list:
-    """Find joints that the occurrence id uses"""
+def find_related_joints(joint_map: dict, occurrence_id: str, joint_start_index: Optional[dict] = None) -> list:
+    """Find joints that the occurrence id uses
+
+    Args:
+        joint_map: mapping of occurrence keys to their joints
+        occurrence_id: the occurrence to find the joints of
+        joint_start_index: the joint map grouped by build_joint_start_index. Build it once and pass it in when looking
+            up many occurrences, so that the joint map isn't scanned on every call
+    """
+    if joint_start_index is None:
+        joint_start_index = build_joint_start_index(joint_map)
     related_joints = []
-    # breakpoint()
-    for k, v in joint_map.items():
-        start_value = k[:17]
-        if occurrence_id.endswith(start_value):
-            related_joints.extend(v)
-    # breakpoint()
+    for length, joints_by_start in joint_start_index.items():
+        related_joints.extend(joints_by_start.get(occurrence_id[-length:], []))
     return related_joints
 
 
+@dataclass
+class BuildTimings():
+    """Seconds spent in each phase of build_tree.
+
+    Attributes:
+        fetch: fetching the metadata of every element, and the mass properties of the part studios alongside it
+        topology: building the nodes, transforms and joints from the assembly definition, without any API call
+        mass_properties: fetching the mass properties still missing, e.g. of rigid subassemblies, and expressing all
+            of them in the world frame
+    """
+    fetch: float = 0.0
+    topology: float = 0.0
+    mass_properties: float = 0.0
+
+    @property
+    def total(self) -> float:
+        return self.fetch + self.topology + self.mass_properties
+
+    def __str__(self) -> str:
+        return (
+            f"fetch {self.fetch:.3f}s, topology {self.topology:.3f}s, mass properties {self.mass_properties:.3f}s "
+            f"(total {self.total:.3f}s)"
+        )
+
+
+class OnshapeTree():
+    """The state shared by all the nodes of an Onshape tree.
+
+    Besides the maps that only make sense for the whole assembly, the tree keeps the numeric data of its nodes in
+    contiguous arrays indexed by node index: world transforms in an (N, 4, 4) array, centers of mass in (N, 3), inertias
+    in (N, 3, 3) and masses in (N,). Nodes read and write their row through properties, so whole-tree computations can
+    work on the arrays directly. Arrays grow by doubling as nodes are added, which means a row view held across
+    additions may be stale; read it again from the node.
+
+    Attributes:
+        root: the root node
+        nodes: every node, in the order they were added. A node's index is its position in this list
+        links: the links of the tree
+        occurrence_id_to_rigid_body_node: mapping of occurrence id to rigid body node
+        internal_naming: how many times each instance name has been seen, to name nodes uniquely
+        joint_parents: mapping of link name to its (joint, world transform) pairs
+        build_timings: how long each phase of build_tree took, if the tree was built by it
+        node_index: lookups of the nodes by occurrence id, instance id, element id and name
+    """
+
+    def __init__(self, capacity: int = 64):
+        """
+        Args:
+            capacity: number of nodes to allocate the arrays for
+        """
+        self.root: Optional[OnshapeTreeNode] = None
+        self.nodes: list = []
+        self.links: list = []
+        self.occurrence_id_to_rigid_body_node: dict = {}
+        self.internal_naming: dict = {}
+        self.joint_parents: dict = {}
+        self.build_timings: Optional[BuildTimings] = None
+        self._node_index: Optional[NodeIndex] = None
+        capacity = max(1, capacity)
+        self._world_tform_element = np.zeros((capacity, 4, 4))
+        self._com_wrt_world = np.zeros((capacity, 3))
+        self._inertia_wrt_world = np.zeros((capacity, 3, 3))
+        self._mass = np.zeros((capacity,))
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def _grow(self, capacity: int) -> None:
+        for name in ("_world_tform_element", "_com_wrt_world", "_inertia_wrt_world", "_mass"):
+            array = getattr(self, name)
+            grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            grown[:len(self.nodes)] = array[:len(self.nodes)]
+            setattr(self, name, grown)
+
+    def add_node(self, node: OnshapeTreeNode) -> int:
+        """Registers a node, returning its index in the arrays"""
+        index = len(self.nodes)
+        if index == self._mass.shape[0]:
+            self._grow(2 * index)
+        self.nodes.append(node)
+        self._world_tform_element[index] = np.eye(4)
+        if self.root is None:
+            self.root = node
+        if self._node_index is not None:
+            self._node_index.add(node)
+        return index
+
+    @property
+    def node_index(self) -> NodeIndex:
+        """The index of the nodes, built on first use and then kept up to date as nodes are added or changed"""
+        if self._node_index is None:
+            self._node_index = NodeIndex(self.nodes)
+        return self._node_index
+
+    def trim(self) -> None:
+        """Shrinks the arrays to the number of nodes, e.g. once the tree is built"""
+        if self._mass.shape[0] != len(self.nodes):
+            self._grow(max(1, len(self.nodes)))
+
+    @property
+    def world_tform_element(self) -> npt.NDArray:
+        """(N, 4, 4) world transforms of the nodes"""
+        return self._world_tform_element[:len(self.nodes)]
+
+    @property
+    def com_wrt_world(self) -> npt.NDArray:
+        """(N, 3) centers of mass of the nodes in the world frame"""
+        return self._com_wrt_world[:len(self.nodes)]
+
+    @property
+    def inertia_wrt_world(self) -> npt.NDArray:
+        """(N, 3, 3) inertias of the nodes"""
+        return self._inertia_wrt_world[:len(self.nodes)]
+
+    @property
+    def mass(self) -> npt.NDArray:
+        """(N,) masses of the nodes"""
+        return self._mass[:len(self.nodes)]
+
+    def __getstate__(self) -> dict:
+        # Don't store the unused capacity, nor the index, which is built again from the nodes
+        self.trim()
+        state = dict(self.__dict__)
+        state["_node_index"] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        # Trees pickled before they had an index
+        state.setdefault("_node_index", None)
+        self.__dict__.update(state)
+
+
 class OnshapeTreeNode():
     """A tree representing assemblies, subassemblies, and parts of an Onshape API request.
 
     The root of the tree is the root of the assembly. Children of each node are either subassemblies or parts.
     Leaves are guaranteed to be parts, while branches are guaranteed to be assemblies. The information each mate/joints
-    if stored in every single instance which is inside that mate. The root has
+    if stored in every single instance which is inside that mate. The state shared by the whole assembly and the
+    numeric data of the nodes live in the OnshapeTree the nodes belong to; nodes only hold slots.
     """
+    __slots__ = (
+        "_element_dict",
+        "node_id",
+        "name",
+        "mesh_name",
+        "simplified_name",
+        "parent_node",
+        "is_rigid_body",
+        "children",
+        "depth",
+        "occurrence_id",
+        "hidden",
+        "element_tform_mate",
+        "has_mass",
+        "volume",
+        "tree",
+        "index",
+    )
+
     def __init__(
         self,
         name: str,
@@ -78,9 +248,10 @@ class OnshapeTreeNode():
         occurrence_id: str = "world",
         parent_node: Optional[OnshapeTreeNode] = None,
         is_rigid_body: bool = False,
-        relative_path: list = [],
+        tree: Optional[OnshapeTree] = None,
         ):
-        self.element_dict: Optional[dict] = element_dict
+        # Set directly, the node isn't in the index of its tree yet
+        self._element_dict: Optional[dict] = element_dict
         self.node_id: Optional[str] = node_id
         self.name: str = name
         # Assumes the last two parts are the <instance_number> value_number
@@ -92,18 +263,105 @@ class OnshapeTreeNode():
         self.depth: int = depth
         self.occurrence_id: str = occurrence_id
         self.hidden: bool = False
-        self.relative_path = relative_path
-        self.world_tform_element: npt.ArrayLike = np.eye(4)
         self.element_tform_mate: Optional[npt.ArrayLike] = None
-        self.com_wrt_world = np.zeros((3,))
-        self.inertia_wrt_world = np.zeros((3, 3))
-        self.mass = 0.0
         self.has_mass = False
         self.volume = 0.0
-        self.links = [] # For root only
-        self.occurrence_id_to_rigid_body_node = {} # For root only
-        self.internal_naming = {} # For root only
-        self.joint_parents = {} # For root only TODO rename this
+        # Nodes join the tree of their parent. A node without a parent starts a new tree as its root
+        if tree is None:
+            tree = parent_node.tree if parent_node is not None else OnshapeTree()
+        self.tree: OnshapeTree = tree
+        self.index: int = tree.add_node(self)
+
+    @property
+    def path(self) -> tuple:
+        """The instance ids from the root down to this node, as in the path of its occurrence. Empty for the root.
+
+        Rebuilt from the parents on each call, so nodes don't have to keep a copy of the path of their ancestors.
+        """
+        path = []
+        node = self
+        while node.parent_node is not None:
+            path.append(node.node_id)
+            node = node.parent_node
+        return tuple(reversed(path))
+
+    @property
+    def relative_path(self) -> tuple:
+        """The path of the parent, as nodes used to store it"""
+        return self.parent_node.path if self.parent_node is not None else ()
+
+    @property
+    def element_dict(self) -> Optional[dict]:
+        return self._element_dict
+
+    @element_dict.setter
+    def element_dict(self, value: Optional[dict]) -> None:
+        # Subassemblies replace their instance with the subassembly, keep the element index of the tree in step
+        if self.tree._node_index is not None:
+            self.tree._node_index.replace_element(self, self._element_dict, value)
+        self._element_dict = value
+
+    @property
+    def world_tform_element(self) -> npt.NDArray:
+        return self.tree._world_tform_element[self.index]
+
+    @world_tform_element.setter
+    def world_tform_element(self, value: npt.ArrayLike) -> None:
+        self.tree._world_tform_element[self.index] = value
+
+    @property
+    def com_wrt_world(self) -> npt.NDArray:
+        return self.tree._com_wrt_world[self.index]
+
+    @com_wrt_world.setter
+    def com_wrt_world(self, value: npt.ArrayLike) -> None:
+        self.tree._com_wrt_world[self.index] = value
+
+    @property
+    def inertia_wrt_world(self) -> npt.NDArray:
+        return self.tree._inertia_wrt_world[self.index]
+
+    @inertia_wrt_world.setter
+    def inertia_wrt_world(self, value: npt.ArrayLike) -> None:
+        self.tree._inertia_wrt_world[self.index] = value
+
+    @property
+    def mass(self) -> float:
+        return float(self.tree._mass[self.index])
+
+    @mass.setter
+    def mass(self, value: float) -> None:
+        self.tree._mass[self.index] = value
+
+    def __setstate__(self, state: tuple) -> None:
+        if isinstance(state, dict):
+            raise pickle.UnpicklingError("The tree was stored before nodes used slots, load it with load_tree")
+        _, slots = state
+        for name, value in slots.items():
+            # Nodes pickled before the element was a property
+            if name == "element_dict":
+                name = "_element_dict"
+            # Nodes pickled when they stored the path of their parent, now computed
+            elif name == "relative_path":
+                continue
+            setattr(self, name, value)
+
+    # The assembly-wide state is kept by the tree, but is still reachable from the root as before
+    @property
+    def links(self) -> list:
+        return self.tree.links
+
+    @property
+    def occurrence_id_to_rigid_body_node(self) -> dict:
+        return self.tree.occurrence_id_to_rigid_body_node
+
+    @property
+    def internal_naming(self) -> dict:
+        return self.tree.internal_naming
+
+    @property
+    def joint_parents(self) -> dict:
+        return self.tree.joint_parents
 
     def _simplified_name(self):
         simple_name = ""
@@ -123,7 +381,7 @@ class OnshapeTreeNode():
         return self.joint_parents
 
     def get_rigid_bodies(self):
-        return self.rigid_bodies
+        return list(self.tree.occurrence_id_to_rigid_body_node.values())
 
     def get_occurrence_id_to_rigid_body_node(self):
         return self.occurrence_id_to_rigid_body_node
@@ -167,10 +425,14 @@ class OnshapeTreeNode():
             child.print_mass_properties()
 
     def search_by_occurrence_id(self, occurrence_id: str) -> Optional[OnshapeTreeNode]:
-        if self.occurrence_id == occurrence_id:
-            return self
-        for child in self.children:
-            child.search_by_occurrence_id(occurrence_id)
+        """Returns the node of an occurrence id if it is this node or below it, or None.
+
+        Looks the node up in the index of the tree, then checks it is below this node by walking up its parents.
+        """
+        node = self.tree.node_index.by_occurrence_id(occurrence_id)
+        if node is None or node is self or self.parent_node is None:
+            return node
+        return node if any(parent is self for parent in ancestors(node)) else None
 
     def _initialize_node(
         self,
@@ -189,9 +451,9 @@ class OnshapeTreeNode():
         """
         if self.occurrence_id == "world":
             return
-        if self.occurrence_id not in occurrence_map:
-            raise ValueError(f"Instance {self.occurrence_id} not in occurrences!")
-        occurrence = occurrence_map[self.occurrence_id]
+        occurrence = occurrence_map.get(self.occurrence_id)
+        if occurrence is None:
+            raise ValueError(f"Instance {self.occurrence_id} (path {list(self.path)}) not in occurrences!")
         self.world_tform_element = np.array(occurrence[CommonAttributes.transform]).reshape(4, 4)
         self.hidden = bool(occurrence[OccurrenceAttributes.hidden])
 
@@ -211,10 +473,11 @@ class OnshapeTreeNode():
             # Need to go up to the nearest rigid body because mate connectors can only occur on faces of 
             # parts. So if the parent assembly is the link, then we need to find it to define the joint instead
 
+            # Copy the transform out of the tree's arrays, which are reallocated as the tree grows
             if self.simplified_name not in joint_parents:
-                joint_parents[self.simplified_name] = [(joint, self.world_tform_element)]
+                joint_parents[self.simplified_name] = [(joint, self.world_tform_element.copy())]
             else:
-                joint_parents[self.simplified_name].append((joint, self.world_tform_element))
+                joint_parents[self.simplified_name].append((joint, self.world_tform_element.copy()))
 
     def closest_rigid_body_link(self) -> str:
         # Thanks again to Onshape for being incompatible with this implementation
@@ -229,33 +492,16 @@ class OnshapeTreeNode():
             parent = parent.parent_node
         return link_name
 
-    def _add_mass_properties(self) -> None:
+    def _add_mass_properties(self, mass_properties_resolver: MassPropertiesResolver) -> None:
         """Adds information about the mass, com, and inertia into the element.
 
         These values are all expressed in the element's own frame. They need to be mapped into the world frame using the
         transforms provided with the occurrence.
 
         Args:
-            mass_properties_map: mapping of instance id to mass properties
+            mass_properties_resolver: fetches the mass properties of the element this node is an instance of
         """
-        did = self.element_dict[CommonAttributes.documentId]
-        eid = self.element_dict[CommonAttributes.elementId]
-        if CommonAttributes.version in self.element_dict:
-            wvm = API.version
-            wvmid = self.element_dict[CommonAttributes.version]
-        else:
-            wvm = API.microversion
-            wvmid = self.element_dict[CommonAttributes.documentMicroversion]
-        if PartAttributes.partId in self.element_dict:
-            part_id = self.element_dict[PartAttributes.partId]
-            response = onshape_client.part_mass_properties(did=did, wvmid=wvmid, eid=eid, partid=part_id, wvm=wvm)
-            # TODO figure out if it's always 1 item. It should be
-            masses = [response[MassAttributes.bodies][part_id]]
-        else:
-            # Is an assembly
-            response = onshape_client.assembly_mass_properties(did=did, wvmid=wvmid, eid=eid, wvm=wvm)
-            masses = [response]
-        mass_properties = _extract_mass_properties(masses[0])
+        mass_properties = _extract_mass_properties(mass_properties_resolver.get(self.element_dict))
         self.volume = mass_properties[MassAttributes.volume]
         self.has_mass = mass_properties[MassAttributes.hasMass]
         self.mass, self.com_wrt_world, self.inertia_wrt_world = express_mass_properties_in_world_frame(
@@ -266,6 +512,40 @@ class OnshapeTreeNode():
         )
         
 
+def _add_rigid_bodies_mass_properties(
+    tree: OnshapeTree,
+    nodes: Sequence[OnshapeTreeNode],
+    mass_properties_resolver: MassPropertiesResolver,
+    ) -> None:
+    """Adds the mass, com and inertia of many nodes of a tree at once.
+
+    Same as calling _add_mass_properties on each node, but the mass properties are fetched together and expressed in
+    the world frame in one vectorized pass over the tree's arrays.
+
+    Args:
+        tree: the tree the nodes belong to
+        nodes: the nodes to add mass properties to
+        mass_properties_resolver: fetches the mass properties of the elements the nodes are instances of
+    """
+    if len(nodes) == 0:
+        return
+    mass_properties_resolver.prefetch(node.element_dict for node in nodes)
+    indices = np.array([node.index for node in nodes])
+    all_mass_properties = [_extract_mass_properties(mass_properties_resolver.get(node.element_dict)) for node in nodes]
+    for node, mass_properties in zip(nodes, all_mass_properties):
+        node.volume = mass_properties[MassAttributes.volume]
+        node.has_mass = mass_properties[MassAttributes.hasMass]
+    masses, coms, inertias = express_all_mass_properties_in_world_frame(
+        world_tform_elements=tree.world_tform_element[indices],
+        masses=[mass_properties[MassAttributes.mass] for mass_properties in all_mass_properties],
+        coms_in_element_frame=[mass_properties[MassAttributes.centroid] for mass_properties in all_mass_properties],
+        inertias_in_element_frame=[mass_properties[MassAttributes.inertia] for mass_properties in all_mass_properties],
+    )
+    tree.mass[indices] = masses
+    tree.com_wrt_world[indices] = coms
+    tree.inertia_wrt_world[indices] = inertias
+
+
 # TODO: combine subassemblies into a single mass property thing
 
 def _build_subassemblies_map(subassemblies: list) -> dict:
@@ -305,38 +585,35 @@ def _extract_mass_properties(response: dict) -> dict:
     return mass_properties
 
 
-def _add_instances_mass_properties(instances: list, mass_properties_map: dict) -> None:
+def _add_instances_mass_properties(
+    instances: list,
+    mass_properties_map: dict,
+    mass_properties_resolver: Optional[MassPropertiesResolver] = None,
+    ) -> None:
     """Updates a map from instance ids to mass properties in-place.
     
     Args:
         instances: the instances we want to add query mass properties for
         mass_properties_map: map of instance id to mass properties that we want to update
+        mass_properties_resolver: fetches the mass properties with one call per element. Defaults to a new resolver
+            using the client the tree was created with
     """ 
+    if mass_properties_resolver is None:
+        mass_properties_resolver = MassPropertiesResolver(onshape_client)
+    instances = [instance for instance in instances if instance[CommonAttributes.idNum] not in mass_properties_map]
+    mass_properties_resolver.prefetch(instances)
     for instance in instances:
-        instance_id = instance[CommonAttributes.idNum]
-        if instance_id in mass_properties_map:
-            continue
-        did = instance[CommonAttributes.documentId]
-        eid = instance[CommonAttributes.elementId]
-        if CommonAttributes.version in instance:
-            wvm = API.version
-            wvmid = instance[CommonAttributes.version]
-        else:
-            wvm = API.microversion
-            wvmid = instance[CommonAttributes.documentMicroversion]
-        if PartAttributes.partId in instance:
-            part_id = instance[PartAttributes.partId]
-            response = onshape_client.part_mass_properties(did=did, wvmid=wvmid, eid=eid, partid=part_id, wvm=wvm)
-            masses = [response[MassAttributes.bodies][part_id] for part_id in response[MassAttributes.bodies]]
-        else:
-            # Is an assembly
-            response = onshape_client.assembly_mass_properties(did=did, wvmid=wvmid, eid=eid, wvm=wvm)
-            masses = [response]
-        for mass in masses:
-            mass_properties = _extract_mass_properties(mass)
-            mass_properties_map[instance_id] = mass_properties
-
-def _build_features_map(features: list, instance_ids: list, subassemblies: dict, occurrence_maps: dict) -> dict:
+        mass_properties = _extract_mass_properties(mass_properties_resolver.get(instance))
+        mass_properties_map[instance[CommonAttributes.idNum]] = mass_properties
+
+
+def _build_features_map(
+    features: list,
+    instance_ids: list,
+    subassemblies: dict,
+    occurrence_maps: dict,
+    occurrence_index: Optional[PathSuffixIndex] = None,
+    ) -> dict:
     """Constructs a map of path and mate data.
 
     Mapping path to the feature data of the mate. This is because mates occur between instances of objects, but they 
@@ -347,10 +624,14 @@ def _build_features_map(features: list, instance_ids: list, subassemblies: dict,
 
     Args:
         features: the features information returned in the OnShape API Call
+        occurrence_index: suffix index of the occurrence paths, used to find the occurrences a mate applies to.
+            Built from occurrence_maps if not given
 
     Returns:
         A mapping of occurrence ids to mates
     """
+    if occurrence_index is None:
+        occurrence_index = PathSuffixIndex.from_occurrences(occurrence_maps)
     features_map = {}
     # Requires: the occurrence transform and the matedCS of the subassembly
     # Currently we only add it when we add the rigid body in, which should work for us as well.
@@ -385,56 +666,125 @@ def _build_features_map(features: list, instance_ids: list, subassemblies: dict,
                 features_map[parent_path].append(parent_info)
             else:
                 features_map[parent_path] = [parent_info]
-        for occ in occurrence_maps.keys():
-            if occ.endswith(parent_path):
-                end_ind = len(occ) - len(parent_path)
-                occ_transform = np.reshape(occurrence_maps[occ][CommonAttributes.transform], (4, 4))
-                mate_loc = occ_transform @ get_element_tform_mate(mated_entities[0][FeatureAttributes.matedCS])
-                parent_info = {
-                    FeatureAttributes.children: occ[:end_ind] + child_path,
-                    FeatureAttributes.mateType: mate_type,
-                    CommonAttributes.name: mate_name,
-                    FeatureAttributes.matedCS: mate_loc
-                }
-                if occ in features_map:
-                    features_map[occ].append(parent_info)
-                else:
-                    features_map[occ] = [parent_info]
+        element_tform_mate = get_element_tform_mate(mated_entities[0][FeatureAttributes.matedCS])
+        for occ in occurrence_index.ending_with(parent_path):
+            end_ind = len(occ) - len(parent_path)
+            occ_transform = np.reshape(occurrence_maps[occ][CommonAttributes.transform], (4, 4))
+            mate_loc = occ_transform @ element_tform_mate
+            parent_info = {
+                FeatureAttributes.children: occ[:end_ind] + child_path,
+                FeatureAttributes.mateType: mate_type,
+                CommonAttributes.name: mate_name,
+                FeatureAttributes.matedCS: mate_loc
+            }
+            if occ in features_map:
+                features_map[occ].append(parent_info)
+            else:
+                features_map[occ] = [parent_info]
     return features_map
 
 
-def _add_instances_metadata(instances: list, metadata_map: dict) -> dict:
+def _add_instances_metadata(
+    instances: list,
+    metadata_map: dict,
+    metadata_resolver: Optional[MetadataResolver] = None,
+    ) -> None:
+    """Updates a map from instance ids to their relevant metadata in-place.
+
+    Args:
+        instances: the instances we want to query metadata for
+        metadata_map: map of instance id to metadata that we want to update
+        metadata_resolver: fetches the metadata with one call per element. Defaults to a new resolver using the client
+            the tree was created with
+    """
+    if metadata_resolver is None:
+        metadata_resolver = MetadataResolver(onshape_client)
+    instances = [instance for instance in instances if instance[CommonAttributes.idNum] not in metadata_map]
+    metadata_resolver.prefetch(instances)
     for instance in instances:
         instance_id = instance[CommonAttributes.idNum]
         if instance_id in metadata_map:
             continue
-        did = instance[CommonAttributes.documentId]
-        eid = instance[CommonAttributes.elementId]
-        # Check if we want to use the version of the microversion
-        if CommonAttributes.version in instance:
-            wvm = API.version
-            wvmid = instance[CommonAttributes.version]
-        else:
-            wvm = API.microversion # TODO: Check if document microversions are a consistent thing across all subassemblies
-            wvmid = instance[CommonAttributes.documentMicroversion]
         # Check if it's a part or assembly
         if PartAttributes.partId in instance:
-            part_id = instance[PartAttributes.partId]
-            response = onshape_client.part_metadata(did=did, wvmid=wvmid, eid=eid, partid=part_id, wvm=wvm)
-            metadata_value_map = get_relevant_metadata(response, part_relevant_metadata)
+            relevant_metadata = part_relevant_metadata
         else:
-            # Is an assembly
-            response = onshape_client.element_metadata(did=did, wvmid=wvmid, eid=eid, wvm=wvm)
-            metadata_value_map = get_relevant_metadata(response, assembly_relevant_metadata)
-        metadata_map[instance_id] = metadata_value_map
-        
+            relevant_metadata = assembly_relevant_metadata
+        metadata_map[instance_id] = get_relevant_metadata(metadata_resolver.get(instance), relevant_metadata)
+
+
+def _expanded_part_instances(instances: list, subassemblies_map: dict, metadata_map: dict) -> list:
+    """The part instances inside subassemblies that are expanded into their parts, i.e. with no rigid assembly above.
+
+    Args:
+        instances: the instances of the root assembly
+        subassemblies_map: mapping of element ids to subassemblies, see _build_subassemblies_map
+        metadata_map: mapping of instance ids to their relevant metadata, see _build_metadata_map
+    """
+    def is_rigid(instance: dict) -> bool:
+        return bool(metadata_map.get(instance[CommonAttributes.idNum], {}).get("Rigid Body", False))
+
+    part_instances = []
+    visited = set()
+    stack = [instance for instance in instances if PartAttributes.partId not in instance and not is_rigid(instance)]
+    while len(stack) > 0:
+        element_id = stack.pop()[CommonAttributes.elementId]
+        # Copies of a subassembly share its instances
+        if element_id in visited or element_id not in subassemblies_map:
+            continue
+        visited.add(element_id)
+        for instance in subassemblies_map[element_id][APIAttributes.instances]:
+            if PartAttributes.partId in instance:
+                part_instances.append(instance)
+            elif not is_rigid(instance):
+                stack.append(instance)
+    return part_instances
+
+
+def _prefetch_elements(
+    instances: list,
+    subassemblies: list,
+    metadata_resolver: MetadataResolver,
+    mass_properties_resolver: MassPropertiesResolver,
+    ) -> dict:
+    """Fetches the metadata of every element, and the mass properties of the part studios of the rigid bodies.
+
+    Parts of the root assembly always become rigid bodies, so the mass properties of their part studios are fetched
+    while the metadata arrives. Parts inside a subassembly only become rigid bodies when no assembly above them is
+    rigid, which the metadata tells: once it is in, the part studios of the parts of expanded subassemblies are
+    fetched, and those of parts inside rigid subassemblies are not. The mass properties of rigid subassemblies are
+    left for when the tree is built.
 
-def _build_metadata_map(instances: list, subassemblies: list) -> dict:
+    Args:
+        instances: the instances of the root assembly
+        subassemblies: the subassemblies inside the document
+        metadata_resolver: fetches the metadata
+        mass_properties_resolver: fetches the mass properties
+
+    Returns:
+        A map of instance IDs to their relevant metadata, as _build_metadata_map returns
+    """
+    root_part_instances = [instance for instance in instances if PartAttributes.partId in instance]
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        root_parts = executor.submit(mass_properties_resolver.prefetch, root_part_instances)
+        metadata_map = _build_metadata_map(instances, subassemblies, metadata_resolver)
+        mass_properties_resolver.prefetch(
+            _expanded_part_instances(instances, _build_subassemblies_map(subassemblies), metadata_map)
+        )
+        root_parts.result()
+    return metadata_map
+
+
+def _build_metadata_map(
+    instances: list,
+    subassemblies: list,
+    metadata_resolver: Optional[MetadataResolver] = None,
+    ) -> dict:
     """Given a list of instances, return a map of their occurence ids to metadata for each instance and subassembly.
     
-    We need to map this separately because each will require an API call to each of the assembly or 
-    part metadata. The part mass properties will need a partID. I wish we could just aggregate a list of all
-    the metadata properties but they need to be accessed assembly-wise individually. 
+    The instances of the root and of every subassembly are gathered first, then their metadata is fetched once per
+    element: the part metadata of a part studio lists all of its parts, and assemblies have their own element
+    metadata. The number of API calls grows with the number of distinct elements, not instances.
 
     Note: we use instances as the key instead of occurrence id, because each instance shares the same metadata values.
     If you copy multiple parts/assemblies, they ALL SHARE THE SAME METADATA.
@@ -442,15 +792,18 @@ def _build_metadata_map(instances: list, subassemblies: list) -> dict:
     Args:
         instances: the instances of assemblies and parts inside the document.
         subassemblies: the subassemblies inside the document
+        metadata_resolver: fetches the metadata with one call per element. Defaults to a new resolver using the client
+            the tree was created with
 
     Returns:
-        A map of occurrence IDs to their mass properties
+        A map of instance IDs to their relevant metadata
     """
-    metadata_map = {}
-    _add_instances_metadata(instances, metadata_map)
+    all_instances = list(instances)
     for subassembly in subassemblies:
-        # Add all of the instances from the subassemblies into the mass properties map
-        _add_instances_metadata(subassembly[APIAttributes.instances], metadata_map)
+        # Add all of the instances from the subassemblies into the metadata map
+        all_instances.extend(subassembly[APIAttributes.instances])
+    metadata_map = {}
+    _add_instances_metadata(all_instances, metadata_map, metadata_resolver)
     return metadata_map
 
 
@@ -475,77 +828,425 @@ def _build_occurrences_map(occurrences: list) -> dict:
     return occurrences_map
         
 
+class _LegacyTreeNode():
+    """Stand-in for the nodes of trees pickled before nodes used slots, which kept everything in their __dict__"""
+
+
+class _LegacyUnpickler(pickle.Unpickler):
+    def find_class(self, module: str, name: str) -> Any:
+        if module == __name__ and name == OnshapeTreeNode.__name__:
+            return _LegacyTreeNode
+        return super().find_class(module, name)
+
+
+def _convert_legacy_tree(legacy_root: _LegacyTreeNode) -> OnshapeTreeNode:
+    """Rebuilds a tree of legacy nodes as a compact tree"""
+    tree = OnshapeTree()
+    stack = [(legacy_root, None)]
+    while len(stack) > 0:
+        legacy_node, parent_node = stack.pop()
+        state = legacy_node.__dict__
+        node = OnshapeTreeNode(
+            name=state["name"],
+            depth=state["depth"],
+            element_dict=state["element_dict"],
+            node_id=state["node_id"],
+            occurrence_id=state["occurrence_id"],
+            parent_node=parent_node,
+            is_rigid_body=state["is_rigid_body"],
+            tree=tree,
+            )
+        node.hidden = state["hidden"]
+        node.element_tform_mate = state["element_tform_mate"]
+        node.has_mass = state["has_mass"]
+        node.volume = state["volume"]
+        node.mass = state["mass"]
+        node.world_tform_element = state["world_tform_element"]
+        node.com_wrt_world = state["com_wrt_world"]
+        node.inertia_wrt_world = state["inertia_wrt_world"]
+        if parent_node is not None:
+            parent_node.add_child(node)
+        if node.is_rigid_body:
+            tree.occurrence_id_to_rigid_body_node[node.occurrence_id] = node
+        # Reversed so children are popped, and added, in their original order
+        for child in reversed(legacy_node.children):
+            stack.append((child, node))
+    root_state = legacy_root.__dict__
+    tree.links = root_state.get("links", [])
+    tree.internal_naming = root_state.get("internal_naming", {})
+    tree.joint_parents = root_state.get("joint_parents", {})
+    tree.trim()
+    return tree.root
+
+
+def _tree_from_stored(stored: StoredTree) -> OnshapeTreeNode:
+    """Builds the tree stored by save_tree.
+
+    Nodes are filled in directly rather than through __init__, whose names and transforms are already stored, and the
+    numeric data is copied into the tree's arrays at once.
+    """
+    num_nodes = len(stored)
+    tree = OnshapeTree(capacity=num_nodes)
+    parents = stored.array("parent").tolist()
+    depths = stored.array("depth").tolist()
+    flags = stored.array("flags")
+    is_rigid_body = (flags & 1).astype(bool).tolist()
+    hidden = (flags & 2).astype(bool).tolist()
+    has_mass = (flags & 4).astype(bool).tolist()
+    volumes = stored.array("volume").tolist()
+    element_tform_mates = stored.array("element_tform_mate")
+    strings = stored._strings
+    node_ids = strings["node_id"]
+    names = strings["name"]
+    mesh_names = strings["mesh_name"]
+    simplified_names = strings["simplified_name"]
+    occurrence_ids = strings["occurrence_id"]
+    nodes = tree.nodes
+    for index in range(num_nodes):
+        node = OnshapeTreeNode.__new__(OnshapeTreeNode)
+        node._element_dict = stored.element_dict(index)
+        node.node_id = node_ids[index]
+        node.name = names[index]
+        node.mesh_name = mesh_names[index]
+        node.simplified_name = simplified_names[index]
+        node.parent_node = nodes[parents[index]] if parents[index] >= 0 else None
+        node.is_rigid_body = is_rigid_body[index]
+        node.children = []
+        node.depth = depths[index]
+        node.occurrence_id = occurrence_ids[index]
+        node.hidden = hidden[index]
+        node.element_tform_mate = None
+        if element_tform_mates is not None and not np.isnan(element_tform_mates[index, 0, 0]):
+            node.element_tform_mate = np.array(element_tform_mates[index])
+        node.has_mass = has_mass[index]
+        node.volume = volumes[index]
+        node.tree = tree
+        node.index = index
+        nodes.append(node)
+        if node.parent_node is not None:
+            node.parent_node.add_child(node)
+    tree.root = nodes[0]
+    tree.world_tform_element[:] = stored.array("world_tform_element")
+    tree.com_wrt_world[:] = stored.array("com_wrt_world")
+    tree.inertia_wrt_world[:] = stored.array("inertia_wrt_world")
+    tree.mass[:] = stored.array("mass")
+    for occurrence_id, stored_node in stored.occurrence_id_to_rigid_body_node.items():
+        tree.occurrence_id_to_rigid_body_node[occurrence_id] = nodes[stored_node.index]
+    tree.internal_naming = dict(stored.internal_naming)
+    tree.links = stored.links
+    tree.joint_parents = stored.joint_parents
+    return tree.root
+
+
+def load_tree(file_path: str) -> OnshapeTreeNode:
+    """Loads a stored tree.
+
+    Trees are stored with save_tree (see tree_format). Trees pickled by earlier versions, either alone or in the
+    dictionary build_tree stored, still load; those stored before nodes used slots are converted to the compact
+    representation. To read a stored tree without building it, use tree_format.open_tree.
+
+    Args:
+        file_path: the directory written by save_tree, or a pickle file
+
+    Returns:
+        The root of the tree
+    """
+    if is_stored_tree(file_path):
+        return _tree_from_stored(StoredTree(file_path))
+    try:
+        data = load_from_pickle(file_path)
+    except pickle.UnpicklingError:
+        with open(file_path, "rb") as fi:
+            data = _LegacyUnpickler(fi).load()
+    tree = data["tree"] if isinstance(data, dict) else data
+    if isinstance(tree, _LegacyTreeNode):
+        tree = _convert_legacy_tree(tree)
+    return tree
+
+
+def _update_extras(
+    assembly_definition: dict,
+    mass_properties_resolver: MassPropertiesResolver,
+    metadata_resolver: MetadataResolver,
+    ) -> dict:
+    """What update_tree needs, stored alongside a tree. Element keys are tuples, so responses are stored as pairs"""
+    return {
+        _ASSEMBLY_DEFINITION: assembly_definition,
+        _RESPONSES: {
+            API.mass_properties: [[key, response] for key, response in mass_properties_resolver.responses.items()],
+            API.metadata: [[key, response] for key, response in metadata_resolver.responses.items()],
+        },
+    }
+
+
+def load_stored_data(file_path: str) -> dict:
+    """Loads a tree stored by build_tree along with what update_tree needs to update it.
+
+    Args:
+        file_path: the directory written by build_tree, or a pickle file written by an earlier version
+
+    Returns:
+        A dictionary with the root of the tree under "tree", and the assembly definition and the responses it was
+        built from, if they were stored
+    """
+    if not is_stored_tree(file_path):
+        data = load_from_pickle(file_path)
+        return data if isinstance(data, dict) else {"tree": data}
+    data = {"tree": load_tree(file_path)}
+    extras = StoredTree(file_path).extras
+    if extras is not None:
+        data[_ASSEMBLY_DEFINITION] = extras[_ASSEMBLY_DEFINITION]
+        data[_RESPONSES] = {
+            name: {tuple(key): response for key, response in responses}
+            for name, responses in extras[_RESPONSES].items()
+        }
+    return data
+
+
 def build_tree(
     json_assembly_data: dict,
     robot_name: str,
     store_data: bool = False,
     load_from_file: bool = False,
-    file_path: str = ""
+    file_path: str = "",
+    mass_properties_resolver: Optional[MassPropertiesResolver] = None,
+    metadata_resolver: Optional[MetadataResolver] = None,
     ) -> OnshapeTreeNode:
     """Given a JSON Onshape API call for the elements in an assembly, return a tree representing the entire assembly.
+
+    The tree is built in three phases, whose durations are kept in the tree's build_timings:
+        1. the metadata of every element is fetched concurrently, together with the mass properties of the part
+           studios of the parts that become rigid bodies: those of the root, then those with no rigid assembly above
+           them once the metadata tells which assemblies are rigid
+        2. the nodes, transforms and joints are built from the definition and the metadata, without any API call
+        3. the mass properties of the rigid bodies are attached, after fetching those of rigid subassemblies
     
     Args:
         json_assembly_data: the json returned by a call to the Onshape API
+        store_data: store the tree in file_path with save_tree, along with what update_tree needs to update it later
+        mass_properties_resolver: fetches the mass properties of the rigid bodies. Defaults to a new resolver using
+            the client the tree was created with
+        metadata_resolver: fetches the metadata of the instances. Defaults to a new resolver using the client the tree
+            was created with
 
     Returns:
         The root of the Onshape tree
     """
     if load_from_file:
-        all_items = load_from_pickle(file_path)
-        return all_items["tree"]
-    else:
-        root_dict = json_assembly_data[APIAttributes.rootAssembly]
-        root_dict[CommonAttributes.name] = CommonAttributes.root
-        root_subassemblies = _build_subassemblies_map(json_assembly_data[APIAttributes.subassemblies])
-        assembly_features = root_dict[APIAttributes.features]
-        root_instances = root_dict[APIAttributes.instances]
-        instance_ids = [
-            instance[CommonAttributes.idNum] 
-            for instance in root_instances 
-            if instance[CommonAttributes.elementType] == ElementAttributes.assembly
-        ]
-        root_occurrences = _build_occurrences_map(root_dict[APIAttributes.occurrences])
-        root_instances = root_dict[APIAttributes.instances]
-        root_metadata = _build_metadata_map(
-            root_instances,
-            json_assembly_data[APIAttributes.subassemblies]
-            )
-        root_mates = _build_features_map(assembly_features, instance_ids, root_subassemblies, root_occurrences)
+        return load_tree(file_path)
+    if mass_properties_resolver is None:
+        mass_properties_resolver = MassPropertiesResolver(onshape_client)
+    if metadata_resolver is None:
+        metadata_resolver = MetadataResolver(onshape_client)
+    timings = BuildTimings()
+    # Building the maps modifies the definition, keep it as received to compare later definitions with
+    assembly_definition = copy.deepcopy(json_assembly_data) if store_data else None
+    root_dict = json_assembly_data[APIAttributes.rootAssembly]
+    root_dict[CommonAttributes.name] = CommonAttributes.root
+    root_instances = root_dict[APIAttributes.instances]
+
+    # Phase 1: every API call whose answer the topology needs, or that doesn't depend on it, at once
+    start = time.perf_counter()
+    root_metadata = _prefetch_elements(
+        root_instances,
+        json_assembly_data[APIAttributes.subassemblies],
+        metadata_resolver,
+        mass_properties_resolver,
+        )
+    timings.fetch = time.perf_counter() - start
+
+    # Phase 2: the topology, from the definition and the metadata alone
+    start = time.perf_counter()
+    root_subassemblies = _build_subassemblies_map(json_assembly_data[APIAttributes.subassemblies])
+    assembly_features = root_dict[APIAttributes.features]
+    instance_ids = [
+        instance[CommonAttributes.idNum] 
+        for instance in root_instances 
+        if instance[CommonAttributes.elementType] == ElementAttributes.assembly
+    ]
+    root_occurrences = _build_occurrences_map(root_dict[APIAttributes.occurrences])
+    root_mates = _build_features_map(assembly_features, instance_ids, root_subassemblies, root_occurrences)
     root_node = OnshapeTreeNode(name=robot_name, element_dict=root_dict)
-    build_tree_helper(
+    rigid_body_nodes = _build_topology(
         root_node,
         root_subassemblies,
         root_mates,
         root_occurrences,
         root_metadata,
         )
+    timings.topology = time.perf_counter() - start
+
+    # Phase 3: the mass properties of the rigid bodies, fetching those phase 1 couldn't know were needed
+    start = time.perf_counter()
+    _add_rigid_bodies_mass_properties(root_node.tree, rigid_body_nodes, mass_properties_resolver)
+    timings.mass_properties = time.perf_counter() - start
+
+    root_node.tree.trim()
+    root_node.tree.build_timings = timings
     if store_data:
-        all_items = {}
-        all_items["tree"] = root_node
-        all_items[CommonAttributes.root] = root_dict
-        all_items[APIAttributes.subassemblies] = root_subassemblies
-        all_items[APIAttributes.features] = root_mates
-        all_items[APIAttributes.occurrences] = root_occurrences
-        all_items[API.metadata] = root_metadata
-        save_in_pickle(all_items, file_path)
+        save_tree(
+            root_node,
+            file_path,
+            extras=_update_extras(assembly_definition, mass_properties_resolver, metadata_resolver),
+        )
     return root_node
 
 
-def build_tree_helper(
+def _rebuild_joint_parents(root: OnshapeTreeNode, document_mates: dict) -> None:
+    """Recomputes the joint parents of a tree in place, visiting nodes in the same order as build_tree_helper"""
+    joint_parents = root.joint_parents
+    joint_parents.clear()
+    stack = deque()
+    stack.append(root)
+    while len(stack) > 0:
+        next_node = stack.pop()
+        next_node._add_joint_info(document_mates, joint_parents)
+        for child_node in next_node.children:
+            child_node._add_joint_info(document_mates, joint_parents)
+            if not child_node.is_rigid_body:
+                stack.append(child_node)
+
+
+def _patch_tree(
+    root: OnshapeTreeNode,
+    json_assembly_data: dict,
+    mass_properties_resolver: MassPropertiesResolver,
+    metadata_resolver: MetadataResolver,
+    ) -> bool:
+    """Updates a tree in place to a new definition of its assembly, when the definition has the same nodes.
+
+    Nodes get their new instance data, transforms and visibility. Mass properties are resolved again for every rigid
+    body, which only reaches the API for elements the resolvers haven't seen (e.g. at a new microversion), and the
+    joint map is recomputed from the new mates.
+
+    Returns:
+        False, leaving the tree untouched, if the nodes of the new definition differ and the tree must be rebuilt
+    """
+    root_dict = json_assembly_data[APIAttributes.rootAssembly]
+    subassemblies = _build_subassemblies_map(json_assembly_data[APIAttributes.subassemblies])
+    occurrences = _build_occurrences_map(root_dict[APIAttributes.occurrences])
+    metadata = _build_metadata_map(
+        root_dict[APIAttributes.instances], json_assembly_data[APIAttributes.subassemblies], metadata_resolver
+    )
+    instances_by_assembly = {
+        root.element_dict[CommonAttributes.elementId]: {
+            instance[CommonAttributes.idNum]: instance for instance in root_dict[APIAttributes.instances]
+        }
+    }
+    for element_id, subassembly in subassemblies.items():
+        instances_by_assembly[element_id] = {
+            instance[CommonAttributes.idNum]: instance for instance in subassembly[APIAttributes.instances]
+        }
+    # Match every node with its new instance first, so nothing is modified if the tree has to be rebuilt
+    updates = []
+    for node in root.tree.nodes:
+        if node is root:
+            continue
+        instance = instances_by_assembly.get(
+            node.parent_node.element_dict[CommonAttributes.elementId], {}
+        ).get(node.node_id)
+        if instance is None or node.occurrence_id not in occurrences:
+            return False
+        is_rigid = bool(metadata.get(node.node_id, {}).get("Rigid Body", False))
+        if is_rigid != node.is_rigid_body:
+            return False
+        element_dict = instance if is_rigid else subassemblies.get(instance[CommonAttributes.elementId])
+        if element_dict is None:
+            return False
+        updates.append((node, element_dict))
+
+    root_dict[CommonAttributes.name] = CommonAttributes.root
+    root.element_dict = root_dict
+    for node, element_dict in updates:
+        node.element_dict = element_dict
+        node._add_occurrence_info(occurrences)
+    mates = _build_features_map(
+        list(root_dict[APIAttributes.features]), [], subassemblies, occurrences
+    )
+    _rebuild_joint_parents(root, mates)
+    _add_rigid_bodies_mass_properties(
+        root.tree, list(root.occurrence_id_to_rigid_body_node.values()), mass_properties_resolver
+    )
+    return True
+
+
+def update_tree(
+    stored_data: dict,
+    json_assembly_data: dict,
+    robot_name: Optional[str] = None,
+    store_data: bool = False,
+    file_path: str = "",
+    ) -> tuple:
+    """Updates a stored tree to a new definition of its assembly, e.g. at a new microversion.
+
+    The definitions are compared first. Metadata and mass properties fetched for the stored tree are reused for every
+    element whose version or microversion didn't change, so only elements that did change are fetched again, one call
+    per element. If the new definition has the same nodes, with the same names, the stored tree, its rigid body map
+    and its joint map are patched in place; otherwise the tree is built again (still reusing the stored responses).
+
+    Args:
+        stored_data: the data stored by build_tree with store_data set, as returned by load_stored_data
+        json_assembly_data: the new definition of the assembly
+        robot_name: name of the root when the tree is built again. Defaults to the stored root's name
+        store_data: store the updated tree, to update it again later
+        file_path: where to store the updated tree
+
+    Returns:
+        The root of the updated tree and the differences between the definitions
+    """
+    root = stored_data["tree"]
+    if _ASSEMBLY_DEFINITION not in stored_data:
+        raise ValueError("The stored data has no assembly definition to compare with, build the tree again")
+    diff = diff_assembly_definitions(stored_data[_ASSEMBLY_DEFINITION], json_assembly_data)
+    if not diff:
+        return root, diff
+    mass_properties_resolver = MassPropertiesResolver(onshape_client)
+    metadata_resolver = MetadataResolver(onshape_client)
+    responses = stored_data.get(_RESPONSES, {})
+    mass_properties_resolver.seed(responses.get(API.mass_properties, {}))
+    metadata_resolver.seed(responses.get(API.metadata, {}))
+
+    assembly_definition = copy.deepcopy(json_assembly_data)
+    if diff.structure_changed or not _patch_tree(
+        root, json_assembly_data, mass_properties_resolver, metadata_resolver
+    ):
+        root = build_tree(
+            json_assembly_data,
+            robot_name=robot_name if robot_name is not None else root.name,
+            mass_properties_resolver=mass_properties_resolver,
+            metadata_resolver=metadata_resolver,
+        )
+    if store_data:
+        save_tree(
+            root,
+            file_path,
+            extras=_update_extras(assembly_definition, mass_properties_resolver, metadata_resolver),
+        )
+    return root, diff
+
+
+def _build_topology(
     root: OnshapeTreeNode,
     document_subassemblies: dict,
     document_mates: dict,
     document_occurrences: dict,
     document_metadata: dict,
-    ) -> None:
-    """Helper function which, given the root node and API document information, fills out the tree with nodes.
+    ) -> list:
+    """Fills out the tree with nodes, their transforms and joints, given the root node and API document information.
+
+    Makes no API call: the metadata deciding which nodes are rigid bodies has to be fetched beforehand.
 
     Args:
         root: the root node of the Onshape tree
         document_subassemblies: a mapping of element ids to subassemblies
         document_mates: a mapping of occurence ids to mates
         document_occurrences: a mapping of path (joined into a single string) to the occurrence information
+        document_metadata: a mapping of instance ids to their relevant metadata
+
+    Returns:
+        The rigid body nodes, in the order they were added
     """ 
+    rigid_body_nodes = []
     stack = deque()
     stack.append(root)
     is_root_node = True
@@ -561,14 +1262,12 @@ def build_tree_helper(
         # Root doesn't have mass properties so it doens't matter, and we only need to add mass 
         # properties for the children
         # Iterate through the elements in the API instances
+        # The children share the path of their parent, and extend its occurrence id
         if next_node.occurrence_id == "world":
             current_occ_id = ""
-            new_rel_path = []
         else:
             current_occ_id = next_node.occurrence_id
-            new_rel_path = copy.deepcopy(next_node.relative_path)
-            new_rel_path.append(next_node.node_id)
-        
+
         for instance in next_element[APIAttributes.instances]:
             # Create a child node
             occurrence_id = instance[CommonAttributes.idNum]
@@ -598,7 +1297,6 @@ def build_tree_helper(
                 occurrence_id=f"{current_occ_id}{occurrence_id}",
                 parent_node=next_node,
                 is_rigid_body=is_rigid,
-                relative_path=new_rel_path
                 )
 
             # Add information about the occurrences and mates
@@ -607,7 +1305,7 @@ def build_tree_helper(
 
             # Check if the object is a rigid body or not
             if is_rigid:
-                child_node._add_mass_properties()
+                rigid_body_nodes.append(child_node)
                 root.occurrence_id_to_rigid_body_node[child_node.occurrence_id] = child_node
                 next_node.add_child(child_node)
                 # TODO: integrate this more smoothly later on
@@ -618,8 +1316,34 @@ def build_tree_helper(
             child_node.element_dict = document_subassemblies[child_id]
             stack.append(child_node)
             next_node.add_child(child_node)
-        
-            
+    return rigid_body_nodes
+
+
+def build_tree_helper(
+    root: OnshapeTreeNode,
+    document_subassemblies: dict,
+    document_mates: dict,
+    document_occurrences: dict,
+    document_metadata: dict,
+    mass_properties_resolver: Optional[MassPropertiesResolver] = None,
+    ) -> None:
+    """Helper function which, given the root node and API document information, fills out the tree with nodes.
+
+    Args:
+        root: the root node of the Onshape tree
+        document_subassemblies: a mapping of element ids to subassemblies
+        document_mates: a mapping of occurence ids to mates
+        document_occurrences: a mapping of path (joined into a single string) to the occurrence information
+        mass_properties_resolver: fetches the mass properties of the rigid bodies. Defaults to a new resolver using
+            the client the tree was created with
+    """ 
+    if mass_properties_resolver is None:
+        mass_properties_resolver = MassPropertiesResolver(onshape_client)
+    # Mass properties are fetched once the whole tree is known, so that each element is requested only once
+    rigid_body_nodes = _build_topology(
+        root, document_subassemblies, document_mates, document_occurrences, document_metadata
+    )
+    _add_rigid_bodies_mass_properties(root.tree, rigid_body_nodes, mass_properties_resolver)
 
 
 def download_all_rigid_bodies_meshes(
@@ -627,18 +1351,33 @@ def download_all_rigid_bodies_meshes(
     data_directory: str = "",
     file_type: str = API.stl,
     api_client: Any = None,
+    max_workers: int = 8,
+    progress_callback: Optional[Callable[[int, int, str], None]] = None,
     ) -> list:
     """Downloads the STL associated with each part inside the document.
-    
+
+    Rigid bodies sharing a document, element and part are only downloaded once. Part exports and assembly
+    translations run concurrently on a thread pool, but the returned names keep the order of `rigid_bodies`.
+
+    Args:
+        rigid_bodies: the rigid body nodes to download meshes for
+        data_directory: where to store the meshes
+        file_type: extension of the mesh files
+        api_client: the client to download with. Defaults to the client the tree was created with
+        max_workers: maximum number of meshes downloaded at once
+        progress_callback: called with (number of meshes done, number of meshes, mesh name) as each one finishes
+
     Returns:
         A list containing the names of each rigid body we want to render in the viusalizer
     """
-    if api_client is not None:
-        onshape_client = api_client
+    client = api_client if api_client is not None else onshape_client
     if data_directory != "" and not os.path.isdir(data_directory):
         os.mkdir(data_directory)
     rigid_bodies_seen = set()
     mesh_names = []
+    # Maps each mesh path to the download writing it, so two bodies with the same name don't write the same file
+    # at once. As when downloading one at a time, the last one wins.
+    downloads = {}
     for rigid_body in rigid_bodies:
         rigid_body_data = rigid_body.element_dict
         if CommonAttributes.version in rigid_body_data:
@@ -664,23 +1403,35 @@ def download_all_rigid_bodies_meshes(
             if rigid_body_hash in rigid_bodies_seen:
                 continue
             rigid_bodies_seen.add(rigid_body_hash)
-            rigid_body_mesh = onshape_client.part_stl_pipeline(
-                did=did, wvm=wvm, wvmid=wvmid, eid=eid, part_id=rigid_body_id, filename=mesh_path,
+            download = (
+                client.part_stl_pipeline,
+                dict(did=did, wvm=wvm, wvmid=wvmid, eid=eid, part_id=rigid_body_id, filename=mesh_path),
             )
         else:
             rigid_body_hash = join_api_url(did, eid)
             if rigid_body_hash in rigid_bodies_seen:
                 continue
             rigid_bodies_seen.add(rigid_body_hash)
-            rigid_body_mesh = onshape_client.assembly_stl_pipeline(
-                did=did,
-                wvm=wvm,
-                wvmid=wvmid,
-                eid=eid,
-                meshname=mesh_filename,
-                filename=mesh_path,
+            download = (
+                client.assembly_stl_pipeline,
+                dict(did=did, wvm=wvm, wvmid=wvmid, eid=eid, meshname=mesh_filename, filename=mesh_path),
             )
+        downloads.pop(mesh_path, None)
+        downloads[mesh_path] = (mesh_filename, download)
         mesh_names.append(mesh_filename)
+
+    num_downloads = len(downloads)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(pipeline, **kwargs): mesh_filename
+            for mesh_filename, (pipeline, kwargs) in downloads.values()
+        }
+        for num_done, future in enumerate(as_completed(futures), start=1):
+            if progress_callback is not None:
+                progress_callback(num_done, num_downloads, futures[future])
+    # Let every download finish before reporting the first failure, so no file is left half written
+    for future in futures:
+        future.result()
     return mesh_names
 
 
@@ -711,4 +1462,36 @@ def create_onshape_tree(
         store_data = store_data,
         load_from_file = load_data,
         file_path = file_path,
-        )
\ No newline at end of file
+        )
+
+
+def update_onshape_tree(
+    did: str,
+    wvmid: str,
+    eid: str,
+    wvm: str,
+    file_path: str,
+    store_data: bool = True,
+    api_client: Any = None,
+    ) -> tuple:
+    """Updates the tree stored by create_onshape_tree to another workspace, version or microversion of the assembly.
+
+    See update_tree.
+
+    Returns:
+        The root of the updated tree and the differences between the assembly definitions
+    """
+    global onshape_client
+    onshape_client = api_client
+    json_data = onshape_client.assembly_definition(
+        did=did,
+        wvmid=wvmid,
+        eid=eid,
+        wvm=wvm,
+        )
+    return update_tree(
+        load_stored_data(file_path),
+        json_data,
+        store_data=store_data,
+        file_path=file_path,
+        )
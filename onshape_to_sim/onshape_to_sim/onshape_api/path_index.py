@@ -0,0 +1,81 @@
+"""
+path_index
+==========
+
+Indices over occurrence paths, so mates can be matched to occurrences without scanning every occurrence
+"""
+from typing import Iterable, Sequence
+
+from onshape_to_sim.onshape_api.utils import OccurrenceAttributes
+
+__all__ = [
+    "PathSuffixIndex",
+    "build_joint_start_index",
+    "occurrence_suffixes",
+]
+
+
+def occurrence_suffixes(path: Sequence[str]) -> Iterable[str]:
+    """Yields the joined trailing segments of a path, from the whole path down to its last segment"""
+    for i in range(len(path)):
+        yield "".join(path[i:])
+
+
+class PathSuffixIndex():
+    """Maps every trailing part of the occurrence paths to the occurrences ending with it.
+
+    Mates refer to occurrences by their path relative to the assembly defining the mate, so a mate of a subassembly
+    applies to every occurrence whose path ends with that relative path. Instead of checking each occurrence key with
+    str.endswith, the index stores every path under each of its suffixes of whole segments (instance ids). A lookup
+    is then a dictionary access, and building the index costs the sum of the squared path depths, which stay small.
+
+    Keys are returned in the order the occurrences were added.
+    """
+
+    def __init__(self):
+        self._occurrences = {}
+        self._num_paths = 0
+
+    @classmethod
+    def from_occurrences(cls, occurrences_map: dict) -> "PathSuffixIndex":
+        """Indexes a map of joined occurrence path to occurrence, as built by _build_occurrences_map"""
+        index = cls()
+        for key, occurrence in occurrences_map.items():
+            index.add(key, occurrence[OccurrenceAttributes.path])
+        return index
+
+    def add(self, key: str, path: Sequence[str]) -> None:
+        """Adds an occurrence.
+
+        Args:
+            key: the key the occurrence is stored under, usually its joined path
+            path: the instance ids making up the path of the occurrence
+        """
+        for suffix in occurrence_suffixes(path):
+            self._occurrences.setdefault(suffix, []).append(key)
+        self._num_paths += 1
+
+    def ending_with(self, path: str) -> list:
+        """Returns the keys of the occurrences whose joined path ends with the given joined path"""
+        return self._occurrences.get(path, [])
+
+    def __len__(self) -> int:
+        return self._num_paths
+
+
+def build_joint_start_index(joint_map: dict, segment_length: int = 17) -> dict:
+    """Groups the joints of a joint map by the first instance id of their occurrence key.
+
+    Args:
+        joint_map: mapping of occurrence keys to their joints
+        segment_length: length of an instance id
+
+    Returns:
+        A mapping of start length to a mapping of the first instance id of each key (or the whole key when it is
+        shorter, e.g. "world") to the joints of all the keys starting with it, in the order of the joint map
+    """
+    index = {}
+    for key, joints in joint_map.items():
+        start = key[:segment_length]
+        index.setdefault(len(start), {}).setdefault(start, []).extend(joints)
+    return index
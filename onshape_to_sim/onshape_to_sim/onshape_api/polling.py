@@ -0,0 +1,183 @@
+"""
+polling
+=======
+
+Adaptive polling of asynchronous Onshape translations (exports)
+"""
+from typing import Callable, Iterable, Optional
+from concurrent.futures import Future
+from dataclasses import dataclass
+import threading
+import time
+
+from onshape_to_sim.onshape_api.utils import API
+
+__all__ = [
+    "PollSchedule",
+    "TranslationPoller",
+]
+
+
+@dataclass
+class PollSchedule():
+    """When to poll a translation.
+
+    The first poll happens after `initial_interval` seconds, and each following interval is `backoff` times longer,
+    up to `max_interval`. Most translations finish within seconds, so they are caught early, while long ones don't
+    flood the API with status requests.
+
+    Attributes:
+        initial_interval: Seconds before the first poll
+        backoff: Factor by which the interval grows after every poll
+        max_interval: Longest interval between two polls in seconds
+        deadline: Seconds after which a translation that isn't done is abandoned
+    """
+    initial_interval: float = 0.5
+    backoff: float = 1.5
+    max_interval: float = 10.0
+    deadline: float = 600.0
+
+    @classmethod
+    def fixed(cls, interval: float, deadline: float = 600.0) -> "PollSchedule":
+        """A schedule polling every `interval` seconds"""
+        return cls(initial_interval=interval, backoff=1.0, max_interval=interval, deadline=deadline)
+
+    def next_interval(self, interval: float) -> float:
+        return min(self.max_interval, interval * self.backoff)
+
+
+class _Translation():
+    """A translation being waited on"""
+
+    def __init__(self, tid: str, configuration: str, schedule: PollSchedule, now: float):
+        self.tid = tid
+        self.configuration = configuration
+        self.schedule = schedule
+        self.future = Future()
+        self.interval = schedule.initial_interval
+        self.next_poll = now + schedule.initial_interval
+        self.deadline = now + schedule.deadline
+
+
+class TranslationPoller():
+    """Waits on any number of translations from a single background polling loop.
+
+    Translations are submitted from any thread and each gets a concurrent.futures.Future, which resolves to the
+    final status response once the translation is done. One thread polls whichever translations are due, sleeping
+    until the next one is, so threads exporting meshes concurrently don't each run their own polling loop. Async
+    code can await the futures with asyncio.wrap_future.
+
+    Attributes:
+        schedule: Default schedule of the translations
+    """
+
+    def __init__(
+        self,
+        status_request: Callable[..., dict],
+        schedule: Optional[PollSchedule] = None,
+        clock: Callable[[], float] = time.monotonic,
+        ):
+        """
+        Args:
+            status_request: Fetches the status of a translation, called as status_request(tid=..., configuration=...)
+            schedule: Default schedule of the translations
+            clock: Monotonic clock in seconds
+        """
+        self._status_request = status_request
+        self.schedule = schedule if schedule is not None else PollSchedule()
+        self._clock = clock
+        self._pending = []
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def submit(
+        self,
+        tid: str,
+        configuration: str = API.default,
+        schedule: Optional[PollSchedule] = None,
+        ) -> Future:
+        """Starts waiting on a translation.
+
+        Args:
+            tid: translation id of the item being translated
+            configuration: configuration of the translation
+            schedule: overrides the default schedule for this translation
+
+        Returns:
+            A future resolving to the final status response. It fails with AttributeError if the translation ends in
+            another state than done, and with TimeoutError if the deadline passes.
+        """
+        schedule = schedule if schedule is not None else self.schedule
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Translation poller has been closed")
+            translation = _Translation(tid, configuration, schedule, self._clock())
+            self._pending.append(translation)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="translation-poller", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return translation.future
+
+    def wait(self, tids: Iterable[str], configuration: str = API.default) -> list:
+        """Waits on several translations at once and returns their final status responses in order"""
+        futures = [self.submit(tid, configuration) for tid in tids]
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        """Stops the polling loop. Translations still pending fail with a RuntimeError"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while True:
+                    if self._closed:
+                        for translation in self._pending:
+                            translation.future.set_exception(RuntimeError("Translation poller has been closed"))
+                        self._pending.clear()
+                        return
+                    now = self._clock()
+                    due = [translation for translation in self._pending if translation.next_poll <= now]
+                    if len(due) > 0:
+                        break
+                    timeout = None
+                    if len(self._pending) > 0:
+                        timeout = min(translation.next_poll for translation in self._pending) - now
+                    self._condition.wait(timeout)
+            # Poll outside of the lock so translations can be submitted meanwhile
+            for translation in due:
+                self._poll(translation)
+
+    def _poll(self, translation: _Translation) -> None:
+        try:
+            status_response = self._status_request(tid=translation.tid, configuration=translation.configuration)
+            request_state = status_response[API.request_state]
+        except Exception as ex:
+            self._finish(translation, exception=ex)
+            return
+        if request_state == API.done:
+            self._finish(translation, result=status_response)
+        elif request_state != API.active:
+            self._finish(translation, exception=AttributeError(f"Request state terminated with state {request_state}"))
+        elif self._clock() >= translation.deadline:
+            self._finish(translation, exception=TimeoutError(
+                f"Translation {translation.tid} not done after {translation.schedule.deadline}s"
+            ))
+        else:
+            translation.interval = translation.schedule.next_interval(translation.interval)
+            translation.next_poll = min(self._clock() + translation.interval, translation.deadline)
+
+    def _finish(self, translation: _Translation, result: Optional[dict] = None, exception: Optional[Exception] = None):
+        with self._condition:
+            self._pending.remove(translation)
+        if exception is not None:
+            translation.future.set_exception(exception)
+        else:
+            translation.future.set_result(result)
@@ -0,0 +1,193 @@
+"""
+retry
+=====
+
+Retries, backoff and client-side rate limiting for the Onshape REST API
+"""
+from typing import Optional
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+import asyncio
+import datetime
+import random
+import threading
+import time
+
+import requests
+
+__all__ = [
+    "OnshapeAPIError",
+    "RetryPolicy",
+    "TokenBucket",
+]
+
+
+class OnshapeAPIError(requests.HTTPError):
+    """Raised when the Onshape API answers with an error that retrying did not resolve."""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Converts a Retry-After header, given either in seconds or as an HTTP date, into seconds to wait.
+
+    Returns:
+        The number of seconds to wait, or None if the header is missing or malformed
+    """
+    if value is None:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, (retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+@dataclass
+class RetryPolicy():
+    """Decides which failed requests are retried and how long to wait before each attempt.
+
+    Waits grow exponentially from `backoff_base` up to `backoff_max`, with full jitter so that threads throttled at
+    the same time don't retry in lockstep. A Retry-After header from the server takes precedence.
+
+    Requests that are not idempotent, e.g. the POSTs starting translations, may have been carried out when the
+    connection drops or the server errors, so retrying them could do the work twice. They are only retried when
+    throttled, which the server answers without carrying the request out.
+
+    Attributes:
+        max_retries: Number of retries after the first attempt. 0 disables retrying
+        backoff_base: Upper bound of the first wait in seconds
+        backoff_max: Cap on any single wait in seconds, including ones asked for by Retry-After
+        retry_statuses: HTTP statuses that are retried
+        idempotent_methods: HTTP methods retried after dropped connections and server errors
+    """
+    max_retries: int = 5
+    backoff_base: float = 0.5
+    backoff_max: float = 60.0
+    retry_statuses: tuple = (429, 500, 502, 503, 504)
+    idempotent_methods: tuple = ("GET", "HEAD", "DELETE")
+
+    def is_idempotent(self, method: str) -> bool:
+        return method.upper() in self.idempotent_methods
+
+    def should_retry(self, attempt: int, status_code: Optional[int] = None, idempotent: bool = True) -> bool:
+        """Whether the request should be retried after the given (0-indexed) attempt failed.
+
+        Args:
+            attempt: Index of the attempt that failed
+            status_code: Status of the failed response, or None if the request never got one
+            idempotent: Whether the request can be repeated safely. Otherwise only throttled requests are retried
+        """
+        if attempt >= self.max_retries:
+            return False
+        if not idempotent:
+            return status_code == 429 and status_code in self.retry_statuses
+        return status_code is None or status_code in self.retry_statuses
+
+    def backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter for the given (0-indexed) failed attempt"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def delay(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        """Seconds to wait before retrying, honouring the Retry-After header of the response if there is one"""
+        if response is not None:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                return min(self.backoff_max, retry_after)
+        return self.backoff(attempt)
+
+
+class TokenBucket():
+    """A thread-safe token bucket limiting how many requests are sent per second.
+
+    Tokens refill continuously at `rate` per second up to `capacity`. Callers reserve a token and wait until it is
+    theirs, so the limit holds across every thread and asyncio task sharing the bucket.
+
+    When the server throttles, `throttle` pauses every caller for the Retry-After time and lowers the rate; each
+    success raises it again, up to `max_rate`. The bucket therefore settles at the highest rate the API sustains.
+
+    Attributes:
+        rate: Current number of tokens added per second
+        max_rate: Ceiling of the rate
+        min_rate: Floor of the rate
+        capacity: Largest burst of requests allowed at once
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: Optional[float] = None,
+        min_rate: Optional[float] = None,
+        decrease_factor: float = 0.5,
+        increase_step: Optional[float] = None,
+        ):
+        """
+        Args:
+            rate: Requests per second allowed, and the ceiling the rate recovers to after throttling
+            capacity: Largest burst of requests allowed at once. Defaults to one second worth of tokens
+            min_rate: Floor of the rate after throttling. Defaults to a tenth of `rate`
+            decrease_factor: The rate is multiplied by this on every throttle
+            increase_step: The rate grows by this after every success. Defaults to 1% of `rate`
+        """
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive, got {rate}")
+        self.rate = float(rate)
+        self.max_rate = float(rate)
+        self.min_rate = float(min_rate) if min_rate is not None else self.max_rate / 10
+        self.capacity = float(capacity) if capacity is not None else max(1.0, self.max_rate)
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_step if increase_step is not None else self.max_rate / 100
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Takes tokens from the bucket, going into debt if needed.
+
+        Returns:
+            How many seconds the caller has to wait before using the tokens
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= tokens
+            wait = max(0.0, -self._tokens / self.rate)
+            return max(wait, self._paused_until - now)
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """Blocks the calling thread until the tokens are available"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def async_acquire(self, tokens: float = 1.0) -> None:
+        """Waits without blocking the event loop until the tokens are available"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def throttle(self, pause: float = 0.0) -> None:
+        """Reacts to the server throttling: pauses every caller for `pause` seconds and lowers the rate."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._paused_until = max(self._paused_until, now + pause)
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+
+    def succeed(self) -> None:
+        """Reacts to a successful request by raising the rate towards its ceiling."""
+        if self.rate >= self.max_rate:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
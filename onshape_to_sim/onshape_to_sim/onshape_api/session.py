@@ -0,0 +1,113 @@
+"""
+session
+=======
+
+Pooled, keep-alive HTTP sessions for the Onshape REST API
+"""
+from typing import Optional
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+__all__ = [
+    "SessionPool"
+]
+
+
+def host_key(url: str) -> str:
+    """Returns the scheme://netloc part of a URL, which is what connections are pooled by."""
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+class SessionPool():
+    """
+    Keeps one persistent requests.Session per host.
+
+    Onshape redirects exports (307) to different hosts, so a single session is not enough to reuse the TLS
+    connections for every call. Each host gets its own session with a connection pool of `pool_size` sockets.
+
+    Attributes:
+        pool_size: Number of connections kept alive per host
+        keep_alive: Reuse connections between requests. If False, every request closes its connection
+    """
+
+    def __init__(self, pool_size: int = 10, keep_alive: bool = True):
+        """
+        Args:
+            pool_size: Number of connections kept alive per host. Should be at least the number of threads
+                issuing requests concurrently, otherwise connections are discarded after use.
+            keep_alive: Reuse connections between requests
+        """
+        if pool_size < 1:
+            raise ValueError(f"Pool size must be positive, got {pool_size}")
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _make_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        if not self.keep_alive:
+            session.headers["Connection"] = "close"
+        return session
+
+    def session_for(self, url: str) -> requests.Session:
+        """Returns the session for the host of the URL, creating it on first use.
+
+        Args:
+            url: Any URL on the host, with or without a path
+
+        Returns:
+            The session bound to that host
+        """
+        key = host_key(url)
+        session = self._sessions.get(key)
+        if session is not None:
+            return session
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Session pool has been closed")
+            if key not in self._sessions:
+                self._sessions[key] = self._make_session()
+            return self._sessions[key]
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Issues a request through the session of the URL's host. Takes the same arguments as requests.request"""
+        return self.session_for(url).request(method, url, **kwargs)
+
+    @property
+    def hosts(self) -> list:
+        """The hosts that currently have an open session"""
+        return list(self._sessions.keys())
+
+    def close(self, url: Optional[str] = None) -> None:
+        """Closes the sessions and their pooled connections.
+
+        Args:
+            url: If given, only close the session of this URL's host. Otherwise close everything and refuse
+                new sessions.
+        """
+        with self._lock:
+            if url is not None:
+                session = self._sessions.pop(host_key(url), None)
+                if session is not None:
+                    session.close()
+                return
+            self._closed = True
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
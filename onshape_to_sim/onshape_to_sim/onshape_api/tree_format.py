@@ -0,0 +1,490 @@
+"""
+tree_format
+===========
+
+Storing Onshape trees as numeric arrays with a JSON sidecar for their strings, so they load quickly and without pickle
+
+A stored tree is a directory holding:
+    tree.json: the format version, the strings of every node (names, ids) and the rigid bodies
+    joints.json: the joint map and the links, read the first time they are needed
+    *.npy: the structure (parent and depth of each node, flags) and the numeric data of the nodes, in node order, and
+        the transforms of the joint map
+    elements.json: the API data of the nodes, read the first time a node's element_dict is needed
+    extras.json: optional data stored alongside the tree, e.g. what update_tree needs
+
+The arrays are memory-mapped, so opening a stored tree only reads the sidecar. StoredTree gives read access to the
+nodes without building them; load_tree in onshape_tree builds the full tree.
+"""
+from __future__ import annotations
+from collections.abc import Mapping
+from typing import Any, Callable, Iterator, Optional
+import json
+import os
+
+import numpy as np
+import numpy.typing as npt
+
+from onshape_to_sim.onshape_api.node_index import NodeIndex
+
+__all__ = [
+    "FORMAT_VERSION",
+    "StoredNode",
+    "StoredTree",
+    "TreeFormatError",
+    "is_stored_tree",
+    "open_tree",
+    "save_tree",
+]
+
+FORMAT_NAME = "onshape_to_sim.tree"
+# Bump when the layout changes. Trees written by a newer version are refused rather than misread
+FORMAT_VERSION = 2
+
+_SIDECAR = "tree.json"
+_JOINTS = "joints.json"
+_ELEMENTS = "elements.json"
+_EXTRAS = "extras.json"
+
+# Bits of the flags array
+_RIGID_BODY = 1
+_HIDDEN = 2
+_HAS_MASS = 4
+
+_STRING_FIELDS = ("node_id", "name", "mesh_name", "simplified_name", "occurrence_id")
+_NODE_ARRAYS = (
+    "parent",
+    "depth",
+    "flags",
+    "element",
+    "volume",
+    "mass",
+    "com_wrt_world",
+    "inertia_wrt_world",
+    "world_tform_element",
+    "element_tform_mate",
+    "joint_transforms",
+)
+# Only stored when some node has one
+_OPTIONAL_ARRAYS = ("element_tform_mate",)
+# Stored by earlier versions: the path of the parent of each node, which is now computed from the parents
+_DROPPED_ARRAYS = ("relative_path",)
+
+
+class TreeFormatError(ValueError):
+    """A directory doesn't hold a stored tree this version can read"""
+
+
+def _to_json(value: Any) -> Any:
+    """Converts the numpy values found in API data, e.g. transforms, for json.dump"""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _encode(value: Any, transforms: list) -> Any:
+    """Encodes the arrays and tuples of the joint map, which JSON would turn into lists.
+
+    Transforms are moved to `transforms` and replaced by their position in it, so they can be stored as an array.
+    """
+    if isinstance(value, np.ndarray):
+        if value.shape == (4, 4):
+            transforms.append(value)
+            return {"__transform__": len(transforms) - 1}
+        return {"__ndarray__": value.tolist()}
+    if isinstance(value, tuple):
+        return {"__tuple__": [_encode(item, transforms) for item in value]}
+    if isinstance(value, list):
+        return [_encode(item, transforms) for item in value]
+    if isinstance(value, dict):
+        return {key: _encode(item, transforms) for key, item in value.items()}
+    return value
+
+
+def _decoder(transforms: npt.NDArray) -> Callable[[dict], Any]:
+    """The object hook undoing _encode while the JSON is parsed"""
+    def decode(value: dict) -> Any:
+        if "__transform__" in value:
+            return transforms[value["__transform__"]]
+        if "__ndarray__" in value:
+            return np.array(value["__ndarray__"])
+        if "__tuple__" in value:
+            return tuple(value["__tuple__"])
+        return value
+    return decode
+
+
+def _write_json(data: Any, file_path: str) -> None:
+    # json.dumps encodes in C, json.dump in Python
+    with open(file_path, "w") as fi:
+        fi.write(json.dumps(data, default=_to_json, separators=(",", ":")))
+
+
+def _read_json(file_path: str, object_hook: Optional[Callable[[dict], Any]] = None) -> Any:
+    with open(file_path, "r") as fi:
+        return json.load(fi, object_hook=object_hook)
+
+
+def is_stored_tree(path: str) -> bool:
+    """Whether a path is a directory written by save_tree"""
+    return os.path.isfile(os.path.join(path, _SIDECAR))
+
+
+def save_tree(root: Any, directory: str, extras: Optional[dict] = None) -> None:
+    """Stores a tree in a directory, replacing any tree stored there.
+
+    Args:
+        root: the root of the tree
+        directory: where to store the tree. Created if missing
+        extras: JSON compatible data to store alongside the tree, read back with StoredTree.extras
+    """
+    tree = root.tree
+    if root is not tree.root:
+        raise ValueError(f"{root} is not the root of its tree")
+    nodes = tree.nodes
+    num_nodes = len(nodes)
+    parent = np.array([-1 if node.parent_node is None else node.parent_node.index for node in nodes], dtype=np.int32)
+    # Building a tree node by node needs every parent before its children, which all builders already ensure
+    if np.any(parent >= np.arange(num_nodes)):
+        raise ValueError("Every node must be added to its tree after its parent")
+
+    # Subassembly nodes share the data of their subassembly, so each element dict is only stored once
+    elements = []
+    element_indices = {}
+    element = np.full(num_nodes, -1, dtype=np.int32)
+    element_tform_mate = np.full((num_nodes, 4, 4), np.nan)
+    flags = np.zeros(num_nodes, dtype=np.uint8)
+    for node in nodes:
+        if node.element_dict is not None:
+            key = id(node.element_dict)
+            if key not in element_indices:
+                element_indices[key] = len(elements)
+                elements.append(node.element_dict)
+            element[node.index] = element_indices[key]
+        if node.element_tform_mate is not None:
+            element_tform_mate[node.index] = node.element_tform_mate
+        flags[node.index] = (
+            _RIGID_BODY * bool(node.is_rigid_body) + _HIDDEN * bool(node.hidden) + _HAS_MASS * bool(node.has_mass)
+        )
+
+    joint_transforms = []
+    # Trees stored by earlier versions lay their joints out differently, so the joint map is kept as it is
+    joints = {"links": _encode(tree.links, joint_transforms), "joint_parents": _encode(tree.joint_parents, joint_transforms)}
+
+    arrays = {
+        "parent": parent,
+        "depth": np.array([node.depth for node in nodes], dtype=np.int32),
+        "flags": flags,
+        "element": element,
+        "volume": np.array([node.volume for node in nodes], dtype=np.float64),
+        "mass": tree.mass,
+        "com_wrt_world": tree.com_wrt_world,
+        "inertia_wrt_world": tree.inertia_wrt_world,
+        "world_tform_element": tree.world_tform_element,
+        "element_tform_mate": element_tform_mate,
+        "joint_transforms": np.array(joint_transforms, dtype=np.float64).reshape(-1, 4, 4),
+    }
+    if np.all(np.isnan(element_tform_mate[:, 0, 0])):
+        del arrays["element_tform_mate"]
+
+    os.makedirs(directory, exist_ok=True)
+    # The sidecar is written last, so an interrupted save isn't mistaken for a stored tree
+    sidecar_path = os.path.join(directory, _SIDECAR)
+    if os.path.exists(sidecar_path):
+        os.remove(sidecar_path)
+    for name in _OPTIONAL_ARRAYS + _DROPPED_ARRAYS:
+        if name not in arrays and os.path.exists(os.path.join(directory, f"{name}.npy")):
+            os.remove(os.path.join(directory, f"{name}.npy"))
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(array))
+    _write_json(elements, os.path.join(directory, _ELEMENTS))
+    _write_json(joints, os.path.join(directory, _JOINTS))
+    extras_path = os.path.join(directory, _EXTRAS)
+    if extras is not None:
+        _write_json(extras, extras_path)
+    elif os.path.exists(extras_path):
+        os.remove(extras_path)
+    sidecar = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "num_nodes": num_nodes,
+        "strings": {field: [getattr(node, field) for node in nodes] for field in _STRING_FIELDS},
+        "rigid_bodies": [node.index for node in tree.occurrence_id_to_rigid_body_node.values()],
+        "internal_naming": tree.internal_naming,
+    }
+    _write_json(sidecar, sidecar_path)
+
+
+class StoredNode():
+    """Read access to a node of a stored tree, with the attributes of OnshapeTreeNode.
+
+    Numeric attributes are rows of the memory-mapped arrays, so they are read-only.
+    """
+    __slots__ = ("stored", "index")
+
+    def __init__(self, stored: StoredTree, index: int):
+        self.stored = stored
+        self.index = index
+
+    def _string(self, field: str) -> Optional[str]:
+        return self.stored._strings[field][self.index]
+
+    @property
+    def node_id(self) -> Optional[str]:
+        return self._string("node_id")
+
+    @property
+    def name(self) -> str:
+        return self._string("name")
+
+    @property
+    def mesh_name(self) -> str:
+        return self._string("mesh_name")
+
+    @property
+    def simplified_name(self) -> str:
+        return self._string("simplified_name")
+
+    @property
+    def occurrence_id(self) -> str:
+        return self._string("occurrence_id")
+
+    @property
+    def depth(self) -> int:
+        return int(self.stored.array("depth")[self.index])
+
+    @property
+    def is_rigid_body(self) -> bool:
+        return bool(self.stored.array("flags")[self.index] & _RIGID_BODY)
+
+    @property
+    def hidden(self) -> bool:
+        return bool(self.stored.array("flags")[self.index] & _HIDDEN)
+
+    @property
+    def has_mass(self) -> bool:
+        return bool(self.stored.array("flags")[self.index] & _HAS_MASS)
+
+    @property
+    def volume(self) -> float:
+        return float(self.stored.array("volume")[self.index])
+
+    @property
+    def mass(self) -> float:
+        return float(self.stored.array("mass")[self.index])
+
+    @property
+    def com_wrt_world(self) -> npt.NDArray:
+        return self.stored.array("com_wrt_world")[self.index]
+
+    @property
+    def inertia_wrt_world(self) -> npt.NDArray:
+        return self.stored.array("inertia_wrt_world")[self.index]
+
+    @property
+    def world_tform_element(self) -> npt.NDArray:
+        return self.stored.array("world_tform_element")[self.index]
+
+    @property
+    def element_tform_mate(self) -> Optional[npt.NDArray]:
+        element_tform_mates = self.stored.array("element_tform_mate")
+        if element_tform_mates is None or np.isnan(element_tform_mates[self.index, 0, 0]):
+            return None
+        return element_tform_mates[self.index]
+
+    @property
+    def element_dict(self) -> Optional[dict]:
+        return self.stored.element_dict(self.index)
+
+    @property
+    def parent_node(self) -> Optional[StoredNode]:
+        parent = int(self.stored.array("parent")[self.index])
+        return None if parent < 0 else self.stored.node(parent)
+
+    @property
+    def children(self) -> list:
+        return [self.stored.node(child) for child in self.stored._children()[self.index]]
+
+    @property
+    def relative_path(self) -> tuple:
+        parent = self.parent_node
+        return parent.path if parent is not None else ()
+
+    @property
+    def path(self) -> tuple:
+        path = []
+        node = self
+        while node.parent_node is not None:
+            path.append(node.node_id)
+            node = node.parent_node
+        return tuple(reversed(path))
+
+    def __repr__(self):
+        return f"{self.name} ({self.simplified_name}, mesh_name: {self.mesh_name}): {self.occurrence_id} (depth {self.depth})"
+
+
+class _RigidBodies(Mapping):
+    """Occurrence id to rigid body node of a stored tree, building each node the first time it is looked up"""
+
+    def __init__(self, stored: StoredTree):
+        self._stored = stored
+        occurrence_ids = stored._strings["occurrence_id"]
+        self._indices = {occurrence_ids[index]: index for index in stored._sidecar["rigid_bodies"]}
+
+    def __getitem__(self, occurrence_id: str) -> StoredNode:
+        return self._stored.node(self._indices[occurrence_id])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._indices)
+
+    def __len__(self) -> int:
+        return len(self._indices)
+
+
+class StoredTree():
+    """A tree stored by save_tree, read on demand.
+
+    Opening it only reads the sidecar; arrays are memory-mapped when first used and element dicts are read the first
+    time one is needed. It answers the queries made of a root node when generating a description (name,
+    get_occurrence_id_to_rigid_body_node, get_joint_parents), so it can be used in place of a built tree.
+
+    Attributes:
+        directory: the directory the tree is stored in
+        version: the format version the tree was written with
+    """
+
+    def __init__(self, directory: str):
+        """
+        Args:
+            directory: the directory written by save_tree
+
+        Raises:
+            TreeFormatError: if the directory doesn't hold a tree this version can read
+        """
+        if not is_stored_tree(directory):
+            raise TreeFormatError(f"{directory} doesn't hold a stored tree")
+        self.directory = directory
+        self._sidecar = _read_json(os.path.join(directory, _SIDECAR))
+        if self._sidecar.get("format") != FORMAT_NAME:
+            raise TreeFormatError(f"{directory} holds data of another format: {self._sidecar.get('format')}")
+        self.version = self._sidecar["version"]
+        if self.version > FORMAT_VERSION:
+            raise TreeFormatError(
+                f"{directory} was stored with format version {self.version}, this version reads up to {FORMAT_VERSION}"
+            )
+        self._strings = self._sidecar["strings"]
+        self._arrays = {}
+        self._nodes = {}
+        self._elements = None
+        self._extras = None
+        self._children_by_parent = None
+        self._rigid_bodies = None
+        self._joints = None
+        self._node_index = None
+
+    def __len__(self) -> int:
+        return self._sidecar["num_nodes"]
+
+    def array(self, name: str) -> Optional[npt.NDArray]:
+        """One of the stored arrays, memory-mapped read-only. None for optional arrays that weren't stored"""
+        if name not in self._arrays:
+            if name not in _NODE_ARRAYS:
+                raise KeyError(name)
+            file_path = os.path.join(self.directory, f"{name}.npy")
+            if name in _OPTIONAL_ARRAYS and not os.path.exists(file_path):
+                self._arrays[name] = None
+            else:
+                # A plain array view of the mapping indexes faster than np.memmap, and keeps the mapping open
+                self._arrays[name] = np.load(file_path, mmap_mode="r").view(np.ndarray)
+        return self._arrays[name]
+
+    def node(self, index: int) -> StoredNode:
+        """The node at an index. Index 0 is the root"""
+        if index not in self._nodes:
+            self._nodes[index] = StoredNode(self, index)
+        return self._nodes[index]
+
+    def element_dict(self, index: int) -> Optional[dict]:
+        """The API data of the node at an index"""
+        element = int(self.array("element")[index])
+        if element < 0:
+            return None
+        if self._elements is None:
+            self._elements = _read_json(os.path.join(self.directory, _ELEMENTS))
+        return self._elements[element]
+
+    @property
+    def extras(self) -> Optional[dict]:
+        """The extras stored with the tree, if any"""
+        if self._extras is None:
+            extras_path = os.path.join(self.directory, _EXTRAS)
+            if os.path.exists(extras_path):
+                self._extras = _read_json(extras_path)
+        return self._extras
+
+    def _children(self) -> list:
+        if self._children_by_parent is None:
+            self._children_by_parent = [[] for _ in range(len(self))]
+            for index, parent in enumerate(self.array("parent").tolist()):
+                if parent >= 0:
+                    self._children_by_parent[parent].append(index)
+        return self._children_by_parent
+
+    @property
+    def root(self) -> StoredNode:
+        return self.node(0)
+
+    @property
+    def node_index(self) -> NodeIndex:
+        """The index of the nodes, built the first time it is used. Building it reads the API data of the nodes"""
+        if self._node_index is None:
+            self._node_index = NodeIndex(self.node(index) for index in range(len(self)))
+        return self._node_index
+
+    @property
+    def name(self) -> str:
+        return self.root.name
+
+    @property
+    def simplified_name(self) -> str:
+        return self.root.simplified_name
+
+    @property
+    def internal_naming(self) -> dict:
+        return self._sidecar["internal_naming"]
+
+    def _read_joints(self) -> dict:
+        if self._joints is None:
+            # Read whole rather than mapped: joints are few, and their transforms are handed out as writable arrays
+            transforms = np.load(os.path.join(self.directory, "joint_transforms.npy"))
+            self._joints = _read_json(os.path.join(self.directory, _JOINTS), object_hook=_decoder(transforms))
+        return self._joints
+
+    @property
+    def links(self) -> list:
+        return self._read_joints()["links"]
+
+    @property
+    def occurrence_id_to_rigid_body_node(self) -> Mapping:
+        if self._rigid_bodies is None:
+            self._rigid_bodies = _RigidBodies(self)
+        return self._rigid_bodies
+
+    @property
+    def joint_parents(self) -> dict:
+        return self._read_joints()["joint_parents"]
+
+    def get_occurrence_id_to_rigid_body_node(self) -> Mapping:
+        return self.occurrence_id_to_rigid_body_node
+
+    def get_rigid_bodies(self) -> list:
+        return list(self.occurrence_id_to_rigid_body_node.values())
+
+    def get_joint_parents(self) -> dict:
+        return self.joint_parents
+
+
+def open_tree(directory: str) -> StoredTree:
+    """Opens a tree stored by save_tree without reading its arrays or API data"""
+    return StoredTree(directory)
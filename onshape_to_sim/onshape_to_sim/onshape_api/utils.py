@@ -9,10 +9,12 @@ from dataclasses import dataclass, asdict
 import logging
 from logging.config import dictConfig
 import os
-import subprocess
+import warnings
 
 import openmesh as om
 
+from onshape_to_sim.onshape_api import mesh_conversion
+
 __all__ = [
     'log'
 ]
@@ -36,6 +38,7 @@ class API:
     external_data_ids: str = "resultExternalDataIds"
     fine: str = "fine"
     gltf: str = "gltf"
+    mass_as_group: str = "massAsGroup"
     mass_properties: str = "massproperties"
     mass_override: str = "useMassPropertyOverrides"
     mate_connectors: str = "includeMateConnectors"
@@ -73,6 +76,7 @@ class CommonAttributes:
     name: str = "name"
     suppressed: str = "suppressed"
     idNum: str = "id"
+    items: str = "items"
     isStandardContent: str = "isStandardContent"
     fullConfiguration: str = "fullConfiguration"
     documentVersion: str = "documentVersion"
@@ -164,6 +168,33 @@ def add_d_wvm_e_ids(api_request: str, did: str, wvm: str, wvmid: str, eid: str)
     return request + "/e/" + eid
 
 
+def get_wvm_and_id(element_dict: dict) -> tuple:
+    """Returns which document state an instance refers to, preferring versions over microversions over workspaces
+
+    Args:
+        element_dict: an instance or subassembly returned by the API
+    Returns:
+        The (wvm, wvmid) pair to request the element with
+    """
+    if CommonAttributes.version in element_dict:
+        return API.version, element_dict[CommonAttributes.version]
+    if CommonAttributes.documentMicroversion in element_dict:
+        return API.microversion, element_dict[CommonAttributes.documentMicroversion]
+    return API.workspace, element_dict[CommonAttributes.workspace]
+
+
+def get_element_key(element_dict: dict) -> tuple:
+    """Identifies the element an instance refers to, as (did, wvm, wvmid, eid, configuration)"""
+    wvm, wvmid = get_wvm_and_id(element_dict)
+    return (
+        element_dict[CommonAttributes.documentId],
+        wvm,
+        wvmid,
+        element_dict[CommonAttributes.elementId],
+        element_dict.get(CommonAttributes.configuration, API.default),
+    )
+
+
 def get_relevant_metadata(metadata_list: list, relevant_metadata: set) -> dict:
     """Returns each entry in the relevant metadata set mapped to its value."""
     metadata_value_map = {}
@@ -185,18 +216,30 @@ def convert_stls_to_objs(
     stl_dir: Optional[str] = None,
     save_dir: Optional[str] = None,
     path_to_onshape_api: Optional[str] = None,
-    ) -> None:
+    max_workers: Optional[int] = None,
+    ) -> list:
     """Given a list of stl files, saves them as .objs with the same name
 
+    Files are converted in process by mesh_conversion, several at once on a process pool. The .objs have welded
+    vertices, shared by the triangles using them, and no normals.
+
     Args:
         stl_files: the absolute paths to the stl files
         stl_dir: the directory where the stls are located
         save_dir: the directory we want to save the .obj files to
+        path_to_onshape_api: deprecated and ignored. It was the location of the stl2obj binary the files used to be
+            converted with
+        max_workers: number of processes converting files. Defaults to the number of CPUs
+
+    Returns:
+        The paths of the .obj files
     """
-    # TODO: Figure out how to fix this later with an absolute path
-    stl_to_obj = "./stl2obj"
     if path_to_onshape_api is not None:
-        stl_to_obj = os.path.join(path_to_onshape_api, stl_to_obj)
+        warnings.warn(
+            "path_to_onshape_api is deprecated and ignored: STL files are converted in process",
+            DeprecationWarning,
+            stacklevel=2,
+        )
     # Create the stl save directory if it doesn't exist
     if stl_dir is not None and not os.path.isdir(stl_dir):
         os.mkdir(stl_dir)
@@ -207,15 +250,15 @@ def convert_stls_to_objs(
         os.mkdir(save_dir)
     elif save_dir is None:
         save_dir = ""
-    
+
+    stl_paths = []
+    obj_paths = []
     for stl in stl_files:
-        obj_filename = "".join(stl.split(".")[:-1])
-        obj_path = os.path.join(save_dir, check_and_append_extension(obj_filename, API.obj))
-        stl_path = os.path.join(stl_dir, check_and_append_extension(stl, API.stl))
-        # subprocess.call(["ls"])
-        print(obj_path)
-        print(stl_path)
-        subprocess.call([stl_to_obj, "--input", str(stl_path), "--output", str(obj_path)])
+        obj_filename = os.path.splitext(os.path.basename(stl))[0]
+        obj_paths.append(os.path.join(save_dir, check_and_append_extension(obj_filename, API.obj)))
+        stl_paths.append(os.path.join(stl_dir, check_and_append_extension(stl, API.stl)))
+    mesh_conversion.convert_stls_to_objs(stl_paths, obj_paths, max_workers=max_workers)
+    return obj_paths
 
 
 def join_api_url(*args: str) -> str:
@@ -228,59 +271,64 @@ def join_api_url(*args: str) -> str:
     return api_url
 
 
+_LOG_RED = '\033[91m'
+_LOG_ENDC = '\033[0m'
+_LOG_CONFIG = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'stdout': {
+            'format': '[%(levelname)s]: %(asctime)s - %(message)s',
+            'datefmt': '%x %X'
+        },
+        'stderr': {
+            'format': _LOG_RED + '[%(levelname)s]: %(asctime)s - %(message)s' + _LOG_ENDC,
+            'datefmt': '%x %X'
+        }
+    },
+    'handlers': {
+        'stdout': {
+            'class': 'logging.StreamHandler',
+            'level': 'DEBUG',
+            'formatter': 'stdout'
+        },
+        'stderr': {
+            'class': 'logging.StreamHandler',
+            'level': 'ERROR',
+            'formatter': 'stderr'
+        }
+    },
+    'loggers': {
+        'info': {
+            'handlers': ['stdout'],
+            'level': 'INFO',
+            'propagate': True
+        },
+        'error': {
+            'handlers': ['stderr'],
+            'level': 'ERROR',
+            'propagate': False
+        }
+    }
+}
+_logging_configured = False
+
+
 def log(msg, level=0):
     '''
     Logs a message to the console, with optional level paramater
 
+    The logging module is configured on the first message only: configuring it replaces its handlers, which is far
+    slower than logging.
+
     Args:
         - msg (str): message to send to console
         - level (int): log level; 0 for info, 1 for error (default = 0)
     '''
-
-    red = '\033[91m'
-    endc = '\033[0m'
-
-    # configure the logging module
-    cfg = {
-        'version': 1,
-        'disable_existing_loggers': False,
-        'formatters': {
-            'stdout': {
-                'format': '[%(levelname)s]: %(asctime)s - %(message)s',
-                'datefmt': '%x %X'
-            },
-            'stderr': {
-                'format': red + '[%(levelname)s]: %(asctime)s - %(message)s' + endc,
-                'datefmt': '%x %X'
-            }
-        },
-        'handlers': {
-            'stdout': {
-                'class': 'logging.StreamHandler',
-                'level': 'DEBUG',
-                'formatter': 'stdout'
-            },
-            'stderr': {
-                'class': 'logging.StreamHandler',
-                'level': 'ERROR',
-                'formatter': 'stderr'
-            }
-        },
-        'loggers': {
-            'info': {
-                'handlers': ['stdout'],
-                'level': 'INFO',
-                'propagate': True
-            },
-            'error': {
-                'handlers': ['stderr'],
-                'level': 'ERROR',
-                'propagate': False
-            }
-        }
-    }
-
-    dictConfig(cfg)
+    global _logging_configured
+    if not _logging_configured:
+        dictConfig(_LOG_CONFIG)
+        _logging_configured = True
 
     lg = 'info' if level == 0 else 'error'
     lvl = 20 if level == 0 else 40
@@ -56,6 +56,7 @@ class RobotDescription(object):
         self.useFixedLinks = False
         self.simplifySTLs = 'no'
         self.maxSTLSize = 3
+        self._stlsToSimplify = []
         self.xml = ''
         self.jointMaxEffort = 1
         self.jointMaxVelocity = 10
@@ -71,6 +72,11 @@ class RobotDescription(object):
     def shouldSimplifySTLs(self, node):
         return self.simplifySTLs == 'all' or self.simplifySTLs == node
 
+    def simplifyMergedSTLs(self):
+        # Merged meshes of all the links are simplified at once, on a process pool
+        stl_combine.simplify_stls(self._stlsToSimplify, self.maxSTLSize)
+        self._stlsToSimplify = []
+
     def append(self, str):
         self.xml += str+"\n"
 
@@ -93,7 +99,7 @@ class RobotDescription(object):
             return self.jointMaxVelocity
 
     def resetLink(self):
-        self._mesh = {'visual': None, 'collision': None}
+        self._mesh = {'visual': stl_combine.MeshAccumulator(), 'collision': stl_combine.MeshAccumulator()}
         self._color = np.array([0., 0., 0.])
         self._color_mass = 0
         self._link_childs = 0
@@ -121,13 +127,8 @@ class RobotDescription(object):
             self._color += np.array(color) * mass
             self._color_mass += mass
 
-        m = stl_combine.load_mesh(stl)
-        stl_combine.apply_matrix(m, matrix)
-
-        if self._mesh[node] is None:
-            self._mesh[node] = m
-        else:
-            self._mesh[node] = stl_combine.combine_meshes(self._mesh[node], m)
+        # Meshes are transformed and joined once, when the link ends
+        self._mesh[node].add(stl, matrix)
 
     def linkDynamics(self):
         mass = 0
@@ -210,7 +211,7 @@ class RobotURDF(RobotDescription):
         mass, com, inertia = self.linkDynamics()
 
         for node in ['visual', 'collision']:
-            if self._mesh[node] is not None:
+            if len(self._mesh[node]) > 0:
                 if node == 'visual' and self._color_mass > 0:
                     color = self._color / self._color_mass
                 else:
@@ -218,9 +219,9 @@ class RobotURDF(RobotDescription):
 
                 filename = self._link_name+'_'+node+'.stl'
                 stl_combine.save_mesh(
-                    self._mesh[node], self.meshDir+'/'+filename)
+                    self._mesh[node].to_mesh(), self.meshDir+'/'+filename)
                 if self.shouldSimplifySTLs(node):
-                    stl_combine.simplify_stl(self.meshDir+'/'+filename, self.maxSTLSize)
+                    self._stlsToSimplify.append(self.meshDir+'/'+filename)
                 self.addSTL(np.identity(4), filename, color, self._link_name, node)
 
         self.append('<inertial>')
@@ -340,6 +341,7 @@ class RobotURDF(RobotDescription):
         self.append('')
 
     def finalize(self):
+        self.simplifyMergedSTLs()
         self.append(self.additionalXML)
         self.append('</robot>')
 
@@ -456,14 +458,13 @@ class RobotSDF(RobotDescription):
         mass, com, inertia = self.linkDynamics()
 
         for node in ['visual', 'collision']:
-            if self._mesh[node] is not None:
+            if len(self._mesh[node]) > 0:
                 color = self._color / self._color_mass
                 filename = self._link_name+'_'+node+'.stl'
                 stl_combine.save_mesh(
-                    self._mesh[node], self.meshDir+'/'+filename)
+                    self._mesh[node].to_mesh(), self.meshDir+'/'+filename)
                 if self.shouldSimplifySTLs(node):
-                    stl_combine.simplify_stl(
-                        self.meshDir+'/'+filename, self.maxSTLSize)
+                    self._stlsToSimplify.append(self.meshDir+'/'+filename)
                 self.addSTL(np.identity(4), filename, color, self._link_name, 'visual')
 
         self.append('<inertial>')
@@ -591,6 +592,7 @@ class RobotSDF(RobotDescription):
         # print('Joint from: '+linkFrom+' to: '+linkTo+', transform: '+str(transform))
 
     def finalize(self):
+        self.simplifyMergedSTLs()
         self.append(self.additionalXML)
         self.append('</model>')
         self.append('</sdf>')
@@ -1,4 +1,4 @@
-from typing import Any, Optional
+from typing import Any, Optional, Union
 import math
 import os
 import pdb
@@ -18,12 +18,23 @@ from gz.math7 import (
     Pose3d,
     Vector3d,
 )
+from onshape_to_sim.collision_geometry import (
+    CollisionGenerator,
+    CollisionShape,
+    ShapeKinds,
+)
 from onshape_to_sim.onshape_api.client import (
     Client,
 )
+from onshape_to_sim.onshape_api.node_index import (
+    NodeIndex,
+)
 from onshape_to_sim.onshape_api.onshape_tree import (
     OnshapeTreeNode,
 )
+from onshape_to_sim.onshape_api.tree_format import (
+    StoredTree,
+)
 from onshape_to_sim.onshape_api.utils import (
     APIAttributes,
     CommonAttributes,
@@ -40,7 +51,10 @@ from onshape_to_sim.sdf.element_data import (
     onshape_mate_to_gz_mate,
 )
 from sdformat13 import (
+    Box,
+    Capsule,
     Collision,
+    Cylinder,
     Frame,
     Geometry,
     GeometryType,
@@ -52,6 +66,7 @@ from sdformat13 import (
     Mesh,
     Model,
     Root,
+    Sphere,
     Visual,
 )
 
@@ -187,6 +202,53 @@ def make_collision_object(collision_name: str, mesh_uri: str, pose: npt.ArrayLik
     return collision
 
 
+def make_shape_geometry_object(shape: CollisionShape, mesh_uri: Optional[str] = None) -> Geometry:
+    """Creates an SDF geometry object from a collision shape. Convex shapes are meshes, at mesh_uri"""
+    if shape.kind == ShapeKinds.convex:
+        return make_geometry_object(mesh_uri)
+    geometry = Geometry()
+    if shape.kind == ShapeKinds.box:
+        geometry.set_type(GeometryType(GeometryTypeMap.box))
+        box = Box()
+        box.set_size(Vector3d(*shape.size))
+        geometry.set_box_shape(box)
+    elif shape.kind == ShapeKinds.sphere:
+        geometry.set_type(GeometryType(GeometryTypeMap.sphere))
+        sphere = Sphere()
+        sphere.set_radius(shape.size[0])
+        geometry.set_sphere_shape(sphere)
+    elif shape.kind == ShapeKinds.cylinder:
+        geometry.set_type(GeometryType(GeometryTypeMap.cylinder))
+        cylinder = Cylinder()
+        cylinder.set_radius(shape.size[0])
+        cylinder.set_length(shape.size[1])
+        geometry.set_cylinder_shape(cylinder)
+    else:
+        geometry.set_type(GeometryType(GeometryTypeMap.capsule))
+        capsule = Capsule()
+        capsule.set_radius(shape.size[0])
+        capsule.set_length(shape.size[1])
+        geometry.set_capsule_shape(capsule)
+    return geometry
+
+
+def make_shape_collision_object(
+    collision_name: str,
+    shape: CollisionShape,
+    world_tform_mesh: np.ndarray,
+    mesh_uri: Optional[str] = None,
+    ) -> Collision:
+    """Creates a collision object from a collision shape, placed in the world by the transform of its mesh"""
+    collision = Collision()
+    collision.set_name(collision_name)
+    collision.set_geometry(make_shape_geometry_object(shape, mesh_uri))
+    world_tform_shape = world_tform_mesh @ shape.pose
+    collision.set_raw_pose(
+        make_pose_gz(world_tform_shape[:3, 3], rotationMatrixToEulerAngles(world_tform_shape[:3, :3]))
+    )
+    return collision
+
+
 def make_frame_object(frame_name: str) -> Frame:
     """Creates a frame object with a given name."""
     frame = Frame()
@@ -247,6 +309,10 @@ def mesh_filepath(robot_name: str, mesh_name: str, mesh_directory: str) -> str:
     return f"file://{mesh_directory}/{robot_name}/{mesh_name}.obj"
 
 
+def mesh_local_path(mesh_uri: str) -> str:
+    return mesh_uri[len("file://"):]
+
+
 def make_dummy_name(parent_name: str, child_name: str, joint_type: str, axis: str) -> str:
     return f"{parent_name}_to_{child_name}_{joint_type}_{axis}_link"
 
@@ -264,26 +330,49 @@ def _translate_rotation_axis(translation_pose: Pose3d, rotation_pose: Pose3d) ->
 
 def find_closest_rigid_body(
     mated_occurrence_path: list,
-    occurrence_id_to_rigid_bodies_nodes: dict,
+    node_index: NodeIndex,
     parent_link: str
     ) -> OnshapeTreeNode:
-    """Going down the line, finds the highest level rigid body that contains the part"""
-    node_path = ""
-    for additional_path in mated_occurrence_path:
-        node_path += additional_path
-        # breakpoint()
-        if node_path in occurrence_id_to_rigid_bodies_nodes:
-            return occurrence_id_to_rigid_bodies_nodes[node_path]
-    print(occurrence_id_to_rigid_bodies_nodes)
-    raise ValueError(f"Mate from {parent_link} to {mated_occurrence_path} not on rigid bodies!")
+    """Going down the line, finds the highest level rigid body that contains the part
+
+    Args:
+        mated_occurrence_path: the instance ids of the path of the mated occurrence
+        node_index: the node index of the tree, e.g. onshape_root.tree.node_index
+        parent_link: the link on the other side of the mate, for the error message
+    """
+    node = node_index.closest_rigid_body(mated_occurrence_path)
+    if node is None:
+        raise ValueError(f"Mate from {parent_link} to {mated_occurrence_path} not on rigid bodies!")
+    return node
 
 
 class RobotSDF():
 
     world_frame: str = "world_frame"
 
-    def __init__(self, onshape_root: OnshapeTreeNode, mesh_directory: str, sdf_name: Optional[str] = None):
+    def __init__(
+        self,
+        onshape_root: Union[OnshapeTreeNode, StoredTree],
+        mesh_directory: str,
+        sdf_name: Optional[str] = None,
+        collision_generator: Optional[CollisionGenerator] = None,
+        obj_directory: Optional[str] = None,
+        ):
+        """
+        Args:
+            onshape_root: the root of the tree, or a stored tree opened with open_tree, which only reads the rigid
+                bodies and joints
+            mesh_directory: the directory the meshes are in
+            sdf_name: the name of the model. Defaults to the name of the root
+            collision_generator: generates the collision shapes of the links from their meshes, which must have been
+                downloaded. Links get no collisions without it
+            obj_directory: the directory convert_stls_to_objs wrote the meshes of the links to, which the collision
+                shapes are generated from. Convex hulls are written next to them. Defaults to where the visuals
+                reference the meshes, `<mesh_directory>/<robot name>`
+        """
         self.robot_name = onshape_root.name
+        self.collision_generator = collision_generator
+        self.obj_directory = obj_directory
         self.sdf_root = Root()
         self.mesh_directory = mesh_directory
         if not os.path.isdir(mesh_directory):
@@ -328,7 +417,7 @@ class RobotSDF():
             # TODO (@bhung): see if this is still necessary after the new changes
             # child_node = find_closest_rigid_body(
             #     child,
-            #     occurrence_id_to_node,
+            #     node_index,
             #     parent_link
             # )
             child_node = occurrence_id_to_node[child]
@@ -506,13 +595,9 @@ class RobotSDF():
         inertia_in_world_gz = make_inertial_gz(node.mass, node.inertia_wrt_world, np.hstack((node.com_wrt_world, rpy)))
         link_sdf.set_inertial(inertia_in_world_gz)
         mesh_uri = mesh_filepath(self.robot_name, node.mesh_name, self.mesh_directory)
-        # TODO: Drake appears to fail with the collision object for some reason?
-        # collision_sdf = make_collision_object(
-        #     node.simplified_name + "_collision",
-        #     mesh_uri
-        # )
-        # collision_sdf.set_raw_pose(com_in_world_gz)
-        # link_sdf.add_collision(collision_sdf)
+        # Simple shapes rather than the visual mesh, which simulators are slow to check contacts with
+        if self.collision_generator is not None:
+            self.add_collisions(link_sdf, node)
 
         # TODO: get all of the colors and make the visuals
         material_sdf = self.get_material(node)
@@ -539,11 +624,35 @@ class RobotSDF():
         frame_sdf.set_raw_pose(com_in_world_gz)
         self.sdf_root.model().add_frame(frame_sdf)
 
+    def collision_mesh_path(self, mesh_name: str) -> str:
+        """The OBJ a link's collision shapes are generated from, or convex hulls of it written to"""
+        if self.obj_directory is None:
+            return mesh_local_path(mesh_filepath(self.robot_name, mesh_name, self.mesh_directory))
+        return os.path.join(self.obj_directory, f"{mesh_name}.obj")
+
+    def add_collisions(self, link_sdf: Link, node: OnshapeTreeNode) -> None:
+        """Adds the collision shapes of the mesh of a node to its link. Convex hulls are written next to the mesh"""
+        mesh_path = self.collision_mesh_path(node.mesh_name)
+        if not os.path.isfile(mesh_path):
+            print(f"Link {node.simplified_name}: no mesh at {mesh_path}, skipping its collisions")
+            return
+        shapes = self.collision_generator.shapes_for_mesh(mesh_path)
+        for i, shape in enumerate(shapes):
+            collision_name = f"{node.simplified_name}_collision_{i}"
+            hull_uri = None
+            if shape.kind == ShapeKinds.convex:
+                hull_path = self.collision_mesh_path(f"{node.mesh_name}_hull_{i}")
+                shape.write_obj(hull_path)
+                hull_uri = f"file://{hull_path}"
+            link_sdf.add_collision(
+                make_shape_collision_object(collision_name, shape, node.world_tform_element, hull_uri)
+            )
+
     def get_material(self, node: OnshapeTreeNode) -> Material:
         """TODO: Get the actual material properties based on the colors and shit"""
         return make_material_object()
 
-    def _build_sdf(self, onshape_root: OnshapeTreeNode) -> None:
+    def _build_sdf(self, onshape_root: Union[OnshapeTreeNode, StoredTree]) -> None:
         """Creates an SDF using the Onshape root node"""
         for rigid_body in list(onshape_root.get_occurrence_id_to_rigid_body_node().values()):
             self.add_link(rigid_body)
@@ -1,15 +1,95 @@
+from concurrent.futures import ProcessPoolExecutor
+import functools
 import numpy as np
-import shutil
 import math
-import subprocess
 import stl
 import os
 from stl import mesh
 from colorama import Fore, Back, Style
 
+from .onshape_api.mesh_conversion import (
+    STL_COUNT_SIZE,
+    STL_HEADER_SIZE,
+    STL_TRIANGLE,
+    stl_triangle_count,
+    weld_vertices,
+)
+
+# Triangles transformed at once by apply_matrix, bounding its temporaries
+TRANSFORM_CHUNK = 65536
+
+
+def probe_stl(stl_file):
+    """The number of triangles of an STL file, or None for ASCII files. See mesh_conversion.stl_triangle_count"""
+    return stl_triangle_count(stl_file)
+
+
+class MappedSTL(object):
+    """An STL file whose triangles are mapped into memory rather than read.
+
+    The triangles, normals and attributes are views of the mapping, so pages are only read when used and are shared
+    with the page cache rather than copied. The mapping is copy-on-write: changing the views never changes the file,
+    and only the pages changed are copied. ASCII files, which cannot be mapped, are parsed by numpy-stl instead.
+    """
+
+    def __init__(self, stl_file):
+        self.stl_file = stl_file
+        self.num_triangles = probe_stl(stl_file)
+        self.is_binary = self.num_triangles is not None
+        self._data = None
+        self._bounds = None
+
+    @property
+    def data(self):
+        """The triangles as numpy-stl's structured Mesh.dtype, mapped on first use"""
+        if self._data is None:
+            if not self.is_binary:
+                self._data = mesh.Mesh.from_file(self.stl_file).data
+                self.num_triangles = len(self._data)
+            elif self.num_triangles == 0:
+                self._data = np.zeros(0, dtype=mesh.Mesh.dtype)
+            else:
+                # Mesh.dtype is mesh_conversion.STL_TRIANGLE under numpy-stl's field names
+                self._data = np.memmap(self.stl_file, dtype=mesh.Mesh.dtype, mode='c',
+                                       offset=STL_HEADER_SIZE + STL_COUNT_SIZE, shape=(self.num_triangles,))
+        return self._data
+
+    @property
+    def triangles(self):
+        """(N, 3, 3) vertices of each triangle"""
+        return self.data['vectors']
+
+    @property
+    def normals(self):
+        """(N, 3) normal of each triangle"""
+        return self.data['normals']
+
+    @property
+    def attributes(self):
+        """(N, 1) attribute byte count of each triangle"""
+        return self.data['attr']
+
+    @property
+    def bounds(self):
+        """The (min, max) corners of the bounding box of the triangles.
+
+        STL headers hold no bounds, so they are computed from the vertices the first time they are asked for.
+        """
+        if self._bounds is None:
+            if len(self.triangles) == 0:
+                self._bounds = (np.zeros(3, dtype=np.float32), np.zeros(3, dtype=np.float32))
+            else:
+                points = self.triangles.reshape(-1, 3)
+                self._bounds = (points.min(axis=0), points.max(axis=0))
+        return self._bounds
+
+    def to_mesh(self):
+        """A numpy-stl Mesh viewing the mapped triangles, without copying them"""
+        return mesh.Mesh(self.data, calculate_normals=False, name=os.path.basename(self.stl_file))
+
 
 def load_mesh(stl_file):
-    return mesh.Mesh.from_file(stl_file)
+    return MappedSTL(stl_file).to_mesh()
 
 
 def save_mesh(mesh, stl_file):
@@ -20,79 +100,140 @@ def combine_meshes(m1, m2):
     return mesh.Mesh(np.concatenate([m1.data, m2.data]))
 
 
+def transform_triangles(source, target, matrix):
+    """Writes the triangles of source, transformed by a 4x4 matrix, to target, a chunk of triangles at a time.
+
+    Both are arrays of Mesh.dtype of the same length, and may be the same array.
+    """
+    matrix = np.asarray(matrix)
+    rotation = matrix[0:3, 0:3].T.astype(np.float32)
+    translation = matrix[0:3, 3].astype(np.float32)
+
+    for start in range(0, len(source), TRANSFORM_CHUNK):
+        chunk = source[start:start + TRANSFORM_CHUNK]
+        out = target[start:start + TRANSFORM_CHUNK]
+        out['vectors'] = chunk['vectors'] @ rotation + translation
+        # Normals are directions, only rotated
+        out['normals'] = chunk['normals'] @ rotation
+        if out is not chunk:
+            out['attr'] = chunk['attr']
+
+
 def apply_matrix(mesh, matrix):
-    rotation = matrix[0:3, 0:3]
-    translation = matrix[0:3, 3:4].T.tolist()
-
-    def transform(points):
-        return (rotation*np.matrix(points).T).T + translation*len(points)
-
-    mesh.v0 = transform(mesh.v0)
-    mesh.v1 = transform(mesh.v1)
-    mesh.v2 = transform(mesh.v2)
-    mesh.normals = transform(mesh.normals)
-
-
-# Script taken from doing the needed operation
-# (Filters > Remeshing, Simplification and Reconstruction >
-# Quadric Edge Collapse Decimation, with parameters:
-# 0.9 percentage reduction (10%), 0.3 Quality threshold (70%)
-# Target number of faces is ignored with those parameters
-# conserving face normals, planar simplification and
-# post-simplimfication cleaning)
-# And going to Filter > Show current filter script
-filter_script_mlx = """
-<!DOCTYPE FilterScript>
-<FilterScript>
-<filter name="Simplification: Quadric Edge Collapse Decimation">
-
-<Param type="RichFloat" value="%reduction%" name="TargetPerc"/>
-<Param type="RichFloat" value="0.5" name="QualityThr"/>
-<Param type="RichBool" value="false" name="PreserveBoundary"/>
-<Param type="RichFloat" value="1" name="BoundaryWeight"/>
-<Param type="RichBool" value="true" name="PreserveNormal"/>
-<Param type="RichBool" value="false" name="PreserveTopology"/>
-<Param type="RichBool" value="true" name="OptimalPlacement"/>
-<Param type="RichBool" value="true" name="PlanarQuadric"/>
-<Param type="RichBool" value="false" name="QualityWeight"/>
-<Param type="RichFloat" value="0.001" name="PlanarWeight"/>
-<Param type="RichBool" value="true" name="AutoClean"/>
-<Param type="RichBool" value="false" name="Selected"/>
-
-
-</filter>
-</FilterScript>
-"""
-
-
-def create_tmp_filter_file(filename='filter_file_tmp.mlx', reduction=0.9):
-    with open('/tmp/' + filename, 'w', encoding="utf-8") as stream:
-        stream.write(filter_script_mlx.replace('%reduction%', str(reduction)))
-    return '/tmp/' + filename
+    """Transforms a mesh in place"""
+    transform_triangles(mesh.data, mesh.data, matrix)
+
+
+class MeshAccumulator(object):
+    """Merges the meshes of the parts of a link in a single pass.
+
+    Parts are only mapped as they are added. Joining them transforms each straight into one buffer allocated for all
+    the triangles, rather than concatenating the merged mesh again for every part.
+    """
+
+    def __init__(self):
+        self._parts = []
+        self.num_triangles = 0
+
+    def __len__(self):
+        return len(self._parts)
+
+    def add(self, stl_file, matrix):
+        """Adds the mesh of a part, placed in the link by a 4x4 matrix"""
+        mapped = MappedSTL(stl_file)
+        # ASCII files are parsed to be counted
+        self.num_triangles += len(mapped.data) if mapped.num_triangles is None else mapped.num_triangles
+        self._parts.append((mapped, np.array(matrix, dtype=float)))
+
+    def to_mesh(self):
+        """The merged mesh of the parts added"""
+        data = np.empty(self.num_triangles, dtype=mesh.Mesh.dtype)
+        start = 0
+        for mapped, matrix in self._parts:
+            end = start + len(mapped.data)
+            transform_triangles(mapped.data, data[start:end], matrix)
+            start = end
+        return mesh.Mesh(data, calculate_normals=False)
+
+
+def write_stl(stl_file, triangles):
+    """Writes triangles to a binary STL file, with their normals.
+
+    The header is fixed, unlike the one numpy-stl writes with the time, so the same triangles give the same file. The
+    file is written next to its destination and moved in place, so readers never see it half written.
+    """
+    data = np.zeros(len(triangles), dtype=mesh.Mesh.dtype)
+    data['vectors'] = triangles
+    normals = np.cross(data['vectors'][:, 1] - data['vectors'][:, 0], data['vectors'][:, 2] - data['vectors'][:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    data['normals'] = np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+
+    tmp_file = stl_file + '.tmp'
+    with open(tmp_file, 'wb') as stream:
+        stream.write(b'onshape_to_sim'.ljust(STL_HEADER_SIZE, b' '))
+        stream.write(np.uint32(len(data)).tobytes())
+        stream.write(data.tobytes())
+    os.replace(tmp_file, stl_file)
+
+
+def decimate_triangles(triangles, num_triangles):
+    """Reduces triangles to about a number of triangles with open3d's quadric edge collapse decimation.
+
+    STL vertices are welded first, so that triangles share their edges as the decimation needs. Both steps are
+    deterministic, so the same triangles always decimate the same.
+
+    Returns:
+        The (N, 3, 3) vertices of each triangle left
+    """
+    # open3d is heavy to import and only needed to simplify meshes
+    import open3d as o3d
+
+    vertices, faces = weld_vertices(triangles)
+    decimated = o3d.geometry.TriangleMesh(
+        o3d.utility.Vector3dVector(vertices.astype(np.float64)),
+        o3d.utility.Vector3iVector(faces.astype(np.int32)),
+    ).simplify_quadric_decimation(target_number_of_triangles=int(num_triangles))
+    vertices = np.asarray(decimated.vertices, dtype=np.float32)
+    return vertices[np.asarray(decimated.triangles)]
 
 
 def reduce_faces(in_file, out_file, reduction=0.5):
-    filter_script_path = create_tmp_filter_file(reduction=reduction)
-    # Add input mesh
-    command = "meshlabserver -i " + in_file
-    # Add the filter script
-    command += " -s " + filter_script_path
-    # Add the output filename and output flags
-    command += " -o " + out_file 
-    command += " > /tmp/meshlab.log 2>&1"
-    # Execute command
-    # print("Going to execute: " + command)
-    output = subprocess.check_output(command, shell=True)
-    # last_line = output.splitlines()[-1]
-    # print("Done:")
-    #print(in_file + " > " + out_file + ": " + last_line)
+    """Decimates an STL file to the given fraction of its triangles"""
+    triangles = MappedSTL(in_file).triangles
+    write_stl(out_file, decimate_triangles(triangles, max(1, int(len(triangles) * reduction))))
+
+
+def max_stl_triangles(max_size):
+    """The number of triangles a binary STL of max_size megabytes holds"""
+    return max(1, int((max_size * 1024 * 1024 - STL_HEADER_SIZE - STL_COUNT_SIZE) // STL_TRIANGLE.itemsize))
 
 
 def simplify_stl(stl_file, max_size=3):
+    """Decimates an STL file in place until it fits in max_size megabytes, when it is larger"""
     size_M = os.path.getsize(stl_file)/(1024*1024)
 
     if size_M > max_size:
         print(Fore.BLUE + '+ '+os.path.basename(stl_file) +
               (' is %.2f M, running mesh simplification' % size_M))
-        shutil.copyfile(stl_file, '/tmp/simplify.stl')
-        reduce_faces('/tmp/simplify.stl', stl_file, max_size / size_M)
+        triangles = MappedSTL(stl_file).triangles
+        write_stl(stl_file, decimate_triangles(triangles, max_stl_triangles(max_size)))
+
+
+def simplify_stls(stl_files, max_size=3, max_workers=None):
+    """Simplifies STL files in place, several at once on a process pool.
+
+    Args:
+        stl_files: the STL files to simplify
+        max_size: the size in megabytes each file should fit in
+        max_workers: number of processes simplifying files. Defaults to the number of CPUs; 1 simplifies in this
+            process
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = min(max_workers, len(stl_files))
+    if max_workers <= 1:
+        for stl_file in stl_files:
+            simplify_stl(stl_file, max_size)
+        return
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(functools.partial(simplify_stl, max_size=max_size), stl_files))
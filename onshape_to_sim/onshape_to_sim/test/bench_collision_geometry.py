@@ -0,0 +1,82 @@
+"""Benchmarks checking contacts against generated collision shapes rather than the visual mesh.
+
+Points are tested for being inside a mesh by casting a ray from each and counting the triangles it crosses, which is
+what checking against the visual mesh costs, and inside its collision shapes with their closed forms. Generating the
+shapes is timed too, then finding them again in the cache. Run from this directory:
+    python bench_collision_geometry.py --triangles 20000 --points 2000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from onshape_to_sim.onshape_api.cache import ResponseCache
+from onshape_to_sim.collision_geometry import CollisionGenerator
+from onshape_to_sim.onshape_api.mesh_conversion import weld_vertices, write_obj
+from bench_mesh_conversion import sphere_triangles
+from test_collision_geometry import cylinder_triangles
+
+
+def _mesh_contains(triangles: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """Whether each point is inside a closed mesh, by the parity of the triangles a ray along x crosses"""
+    direction = np.array([1.0, 0.0, 0.0])
+    edge1 = triangles[:, 1] - triangles[:, 0]
+    edge2 = triangles[:, 2] - triangles[:, 0]
+    p = np.cross(direction, edge2)
+    det = np.einsum("ij,ij->i", edge1, p)
+    inv_det = np.divide(1.0, det, out=np.zeros_like(det), where=np.abs(det) > 1e-12)
+    crossings = np.zeros(len(points), dtype=int)
+    for i, point in enumerate(points):
+        t = point - triangles[:, 0]
+        u = np.einsum("ij,ij->i", t, p) * inv_det
+        q = np.cross(t, edge1)
+        v = q @ direction * inv_det
+        distance = np.einsum("ij,ij->i", edge2, q) * inv_det
+        crossings[i] = np.count_nonzero((u >= 0) & (v >= 0) & (u + v <= 1) & (distance > 0) & (inv_det != 0))
+    return crossings % 2 == 1
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--triangles", type=int, default=20000, help="triangles per mesh")
+    parser.add_argument("--points", type=int, default=2000, help="points checked against each mesh")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    meshes = {
+        "sphere": sphere_triangles(args.triangles).astype(float),
+        "cylinder": cylinder_triangles(0.3, 2.0, num_sides=args.triangles // 4),
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for name, triangles in meshes.items():
+            mesh_path = os.path.join(directory, f"{name}.obj")
+            write_obj(mesh_path, *weld_vertices(triangles.astype(np.float32)))
+            cache = ResponseCache(os.path.join(directory, "cache"))
+
+            start = time.perf_counter()
+            shapes = CollisionGenerator(cache=cache).shapes_for_mesh(mesh_path)
+            generated = time.perf_counter() - start
+            start = time.perf_counter()
+            CollisionGenerator(cache=cache).shapes_for_mesh(mesh_path)
+            cached = time.perf_counter() - start
+
+            low, high = triangles.reshape(-1, 3).min(axis=0), triangles.reshape(-1, 3).max(axis=0)
+            points = rng.uniform(low - 0.1, high + 0.1, size=(args.points, 3))
+            start = time.perf_counter()
+            inside_mesh = _mesh_contains(triangles, points)
+            mesh_time = time.perf_counter() - start
+            start = time.perf_counter()
+            inside_shapes = np.any([shape.contains(points) for shape in shapes], axis=0)
+            shapes_time = time.perf_counter() - start
+
+            print(f"{name}: {len(triangles)} triangles -> {', '.join(shape.kind for shape in shapes)}")
+            print(f"  generated in {generated * 1000:.1f} ms, from the cache in {cached * 1000:.2f} ms")
+            print(f"  {args.points} points against the mesh:   {mesh_time * 1000:10.1f} ms")
+            print(f"  {args.points} points against the shapes: {shapes_time * 1000:10.3f} ms "
+                  f"({mesh_time / shapes_time:.0f}x faster, {np.mean(inside_mesh == inside_shapes):.1%} agree)")
+
+
+if __name__ == "__main__":
+    main()
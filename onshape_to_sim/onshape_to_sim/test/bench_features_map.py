@@ -0,0 +1,102 @@
+"""Benchmarks matching mates to occurrences with the path suffix index against scanning every occurrence.
+
+Runs on the assemblies stored in the throwy pickles and on a synthetic assembly. Run from this directory:
+    python bench_features_map.py --subassemblies 100 --parts 50
+"""
+import argparse
+import copy
+import time
+
+import numpy as np
+
+from onshape_to_sim.onshape_api.onshape_tree import (
+    _build_features_map,
+    _build_occurrences_map,
+    _build_subassemblies_map,
+    get_element_tform_mate,
+    load_tree,
+)
+from synthetic_assembly import make_assembly
+
+
+def scan_features_map(features: list, subassemblies: dict, occurrence_maps: dict) -> dict:
+    """The mate resolution checking every occurrence key with str.endswith, for reference"""
+    features = list(features)
+    for subassembly in subassemblies.values():
+        features.extend(subassembly["features"])
+    features_map = {}
+    for feature in features:
+        mated_entities = feature["featureData"]["matedEntities"]
+        parent_path = "".join(mated_entities[0]["matedOccurrence"])
+        child_path = "".join(mated_entities[1]["matedOccurrence"])
+        if parent_path == "":
+            parent_path = "world"
+            features_map.setdefault(parent_path, []).append(child_path)
+        for occ in occurrence_maps.keys():
+            if occ.endswith(parent_path):
+                occ_transform = np.reshape(occurrence_maps[occ]["transform"], (4, 4))
+                occ_transform @ get_element_tform_mate(mated_entities[0]["matedCS"])
+                features_map.setdefault(occ, []).append(occ[:len(occ) - len(parent_path)] + child_path)
+    return features_map
+
+
+def assembly_from_tree(tree_path: str) -> dict:
+    """Rebuilds an assembly definition from a stored tree, whose nodes keep the instances they were built from"""
+    root = load_tree(tree_path)
+    subassemblies = {}
+    stack = [root]
+    while len(stack) > 0:
+        node = stack.pop()
+        for child in node.children:
+            if "instances" in child.element_dict:
+                subassemblies[child.element_dict["elementId"]] = child.element_dict
+                stack.append(child)
+    return {"rootAssembly": root.element_dict, "subAssemblies": list(subassemblies.values())}
+
+
+def _time(function, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - start) / repeats
+
+
+def bench(name: str, assembly: dict, repeats: int) -> None:
+    root = assembly["rootAssembly"]
+    subassemblies = _build_subassemblies_map(assembly["subAssemblies"])
+    occurrences = _build_occurrences_map(root["occurrences"])
+    features = root["features"]
+    num_features = len(features) + sum(len(subassembly["features"]) for subassembly in subassemblies.values())
+
+    scan = _time(lambda: scan_features_map(features, subassemblies, occurrences), repeats)
+    # _build_features_map appends the subassembly mates to the list it is given
+    indexed = _time(
+        lambda: _build_features_map(copy.copy(features), [], subassemblies, occurrences), repeats
+    )
+    print(
+        f"{name:>24}: {len(occurrences):6d} occurrences, {num_features:5d} mates | "
+        f"scan {scan * 1000:9.2f} ms | index {indexed * 1000:8.2f} ms | {scan / indexed:6.1f}x"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subassemblies", type=int, default=100, help="copies of the synthetic subassembly")
+    parser.add_argument("--parts", type=int, default=50, help="parts in the synthetic subassembly")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    for tree_path in ("throwy_tree.pickle", "throwy_hand_tree.pickle"):
+        bench(tree_path, assembly_from_tree(tree_path), args.repeats)
+    synthetic = make_assembly(
+        num_studios=4,
+        parts_per_studio=25,
+        num_subassemblies=args.subassemblies,
+        parts_per_subassembly=args.parts,
+        mates=True,
+    )
+    bench("synthetic", synthetic, max(1, args.repeats // 5))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Benchmarks expressing mass properties in the world frame and combining them into links, one body at a time
+against the vectorized engine.
+
+Run from this directory:
+    python bench_inertial.py --bodies 10000 --links 100
+"""
+import argparse
+import time
+
+import numpy as np
+
+from onshape_to_sim.utils import combine_inertial_properties_by_group, express_all_mass_properties_in_world_frame
+
+
+def random_bodies(num_bodies: int, seed: int = 0) -> tuple:
+    """Random rigid transforms, masses, centers of mass and symmetric positive definite inertias"""
+    rng = np.random.default_rng(seed)
+    quaternions = rng.normal(size=(num_bodies, 4))
+    quaternions /= np.linalg.norm(quaternions, axis=1, keepdims=True)
+    w, x, y, z = quaternions.T
+    rotations = np.stack([
+        np.stack([1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)], axis=-1),
+        np.stack([2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)], axis=-1),
+        np.stack([2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)], axis=-1),
+    ], axis=1)
+    transforms = np.tile(np.eye(4), (num_bodies, 1, 1))
+    transforms[:, :3, :3] = rotations
+    transforms[:, :3, 3] = rng.uniform(-1.0, 1.0, size=(num_bodies, 3))
+    masses = rng.uniform(0.01, 2.0, size=num_bodies)
+    coms = rng.uniform(-0.1, 0.1, size=(num_bodies, 3))
+    factors = rng.normal(scale=0.01, size=(num_bodies, 3, 3))
+    inertias = np.einsum("nij,nkj->nik", factors, factors) + 1e-6 * np.eye(3)
+    return transforms, masses, coms, inertias
+
+
+def express_one_at_a_time(world_tform_element, mass, com_in_element_frame, inertia_in_element_frame) -> tuple:
+    """Expresses the mass properties of one body in the world frame, as done for each node before"""
+    com_in_element_vector = np.array([com_in_element_frame[0], com_in_element_frame[1], com_in_element_frame[2], 1])
+    return mass, (world_tform_element @ com_in_element_vector)[:3], inertia_in_element_frame
+
+
+def combine_one_at_a_time(groups, masses, coms, inertias) -> dict:
+    """Combines each group with a Python loop over its bodies, for reference"""
+    combined = {}
+    for group in np.unique(groups):
+        members = np.flatnonzero(groups == group)
+        mass = 0.0
+        weighted_com = np.zeros(3)
+        for i in members:
+            mass += masses[i]
+            weighted_com += masses[i] * coms[i]
+        com = weighted_com / mass
+        inertia = np.zeros((3, 3))
+        for i in members:
+            r = coms[i] - com
+            inertia += inertias[i] + masses[i] * (np.dot(r, r) * np.eye(3) - np.outer(r, r))
+        combined[group] = (mass, com, inertia)
+    return combined
+
+
+def _time(function) -> tuple:
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bodies", type=int, default=10000)
+    parser.add_argument("--links", type=int, default=100)
+    args = parser.parse_args()
+
+    transforms, masses, coms, inertias = random_bodies(args.bodies)
+    groups = np.random.default_rng(1).integers(0, args.links, size=args.bodies)
+
+    loop_time, per_body = _time(lambda: [
+        express_one_at_a_time(transforms[i], masses[i], coms[i], inertias[i])
+        for i in range(args.bodies)
+    ])
+    batch_time, (_, world_coms, world_inertias) = _time(
+        lambda: express_all_mass_properties_in_world_frame(transforms, masses, coms, inertias)
+    )
+    assert np.allclose(np.array([com for _, com, _ in per_body]), world_coms)
+    print(f"world frame, {args.bodies} bodies: loop {loop_time * 1000:8.2f} ms | "
+          f"batch {batch_time * 1000:6.2f} ms | {loop_time / batch_time:6.1f}x")
+
+    loop_time, expected = _time(lambda: combine_one_at_a_time(groups, masses, world_coms, world_inertias))
+    batch_time, (links, link_masses, link_coms, link_inertias) = _time(
+        lambda: combine_inertial_properties_by_group(groups, masses, world_coms, world_inertias)
+    )
+    for i, link in enumerate(links):
+        assert np.isclose(expected[link][0], link_masses[i])
+        assert np.allclose(expected[link][2], link_inertias[i])
+    print(f"combine into {args.links} links: loop {loop_time * 1000:8.2f} ms | "
+          f"batch {batch_time * 1000:6.2f} ms | {loop_time / batch_time:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
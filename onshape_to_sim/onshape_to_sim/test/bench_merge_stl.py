@@ -0,0 +1,88 @@
+"""Benchmarks merging the meshes of the parts of a link.
+
+Merging is compared with the way RobotDescription.mergeSTL used to do it: every part read with numpy-stl, transformed
+with np.matrix, then concatenated to the mesh merged so far. Peak memory is that of numpy allocations, as seen by
+tracemalloc. Run from this directory:
+    python bench_merge_stl.py --parts 200 --triangles 5000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from stl import mesh
+
+from onshape_to_sim import stl_combine
+from bench_mesh_conversion import sphere_triangles
+from test_mesh_conversion import write_binary_stl
+
+
+def _legacy_merge(stl_files: list, matrices: list) -> mesh.Mesh:
+    """Merges meshes as RobotDescription.mergeSTL used to"""
+    merged = None
+    for stl_file, matrix in zip(stl_files, matrices):
+        part = mesh.Mesh.from_file(stl_file)
+        rotation = matrix[0:3, 0:3]
+        translation = matrix[0:3, 3:4].T.tolist()
+
+        def transform(points):
+            return (rotation*np.matrix(points).T).T + translation*len(points)
+
+        part.v0 = transform(part.v0)
+        part.v1 = transform(part.v1)
+        part.v2 = transform(part.v2)
+        part.normals = transform(part.normals)
+        merged = part if merged is None else stl_combine.combine_meshes(merged, part)
+    return merged
+
+
+def _accumulated_merge(stl_files: list, matrices: list) -> mesh.Mesh:
+    accumulator = stl_combine.MeshAccumulator()
+    for stl_file, matrix in zip(stl_files, matrices):
+        accumulator.add(stl_file, matrix)
+    return accumulator.to_mesh()
+
+
+def _measure(merge, stl_files: list, matrices: list) -> tuple:
+    tracemalloc.start()
+    start = time.perf_counter()
+    merged = merge(stl_files, matrices)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return merged, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--parts", type=int, default=200)
+    parser.add_argument("--triangles", type=int, default=5000, help="triangles per part")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    triangles = sphere_triangles(args.triangles)
+    with tempfile.TemporaryDirectory() as directory:
+        stl_files = [os.path.join(directory, f"part{i}.stl") for i in range(args.parts)]
+        matrices = []
+        for stl_file in stl_files:
+            write_binary_stl(stl_file, triangles)
+            matrix = np.matrix(np.eye(4))
+            matrix[:3, :3] = np.linalg.qr(rng.random((3, 3)))[0]
+            matrix[:3, 3] = rng.random((3, 1))
+            matrices.append(matrix)
+
+        legacy, legacy_time, legacy_peak = _measure(_legacy_merge, stl_files, matrices)
+        merged, merged_time, merged_peak = _measure(_accumulated_merge, stl_files, matrices)
+
+    np.testing.assert_allclose(merged.vectors, legacy.vectors, atol=1e-5)
+    size = merged.data.nbytes / 2**20
+    print(f"{args.parts} parts of {len(triangles)} triangles, {size:.0f} MB merged")
+    print(f"  one by one:  {legacy_time:8.2f} s, peak {legacy_peak / 2**20:6.0f} MB")
+    print(f"  accumulated: {merged_time:8.2f} s, peak {merged_peak / 2**20:6.0f} MB"
+          f" ({legacy_time / merged_time:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Benchmarks converting STL meshes to OBJ meshes in one process and on a process pool.
+
+Meshes are synthetic spheres, whose triangles share their vertices as exported meshes do. Run from this directory:
+    python bench_mesh_conversion.py --meshes 300 --triangles 20000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from onshape_to_sim.onshape_api.mesh_conversion import convert_stls_to_objs
+from test_mesh_conversion import write_binary_stl
+
+
+def sphere_triangles(num_triangles: int) -> np.ndarray:
+    """A UV sphere with about the given number of triangles"""
+    num_rings = max(2, int(np.sqrt(num_triangles / 2)))
+    theta = np.linspace(0, np.pi, num_rings + 1)
+    phi = np.linspace(0, 2 * np.pi, num_rings + 1)
+    theta, phi = np.meshgrid(theta, phi, indexing="ij")
+    points = np.stack([np.sin(theta) * np.cos(phi), np.sin(theta) * np.sin(phi), np.cos(theta)], axis=-1)
+    corners = [points[:-1, :-1], points[1:, :-1], points[1:, 1:], points[:-1, 1:]]
+    triangles = np.concatenate([
+        np.stack([corners[0], corners[1], corners[2]], axis=-2).reshape(-1, 3, 3),
+        np.stack([corners[0], corners[2], corners[3]], axis=-2).reshape(-1, 3, 3),
+    ])
+    return triangles.astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--meshes", type=int, default=300)
+    parser.add_argument("--triangles", type=int, default=20000, help="triangles per mesh")
+    parser.add_argument("--workers", type=int, default=None, help="processes, defaults to the number of CPUs")
+    args = parser.parse_args()
+
+    triangles = sphere_triangles(args.triangles)
+    with tempfile.TemporaryDirectory() as directory:
+        stl_paths = [os.path.join(directory, f"mesh{i}.stl") for i in range(args.meshes)]
+        obj_paths = [os.path.join(directory, f"mesh{i}.obj") for i in range(args.meshes)]
+        for stl_path in stl_paths:
+            write_binary_stl(stl_path, triangles)
+
+        start = time.perf_counter()
+        convert_stls_to_objs(stl_paths[:10], obj_paths[:10], max_workers=1)
+        serial = (time.perf_counter() - start) / 10
+        start = time.perf_counter()
+        counts = convert_stls_to_objs(stl_paths, obj_paths, max_workers=args.workers)
+        pooled = time.perf_counter() - start
+
+    print(f"{args.meshes} meshes of {len(triangles)} triangles, {counts[0][0]} vertices once welded")
+    print(f"  one process: {serial * 1000:8.1f} ms per mesh ({serial * args.meshes:.1f}s for all)")
+    print(f"  pool:        {pooled:8.2f} s for all ({args.meshes / pooled:.1f} meshes/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Benchmarks building a tree and downloading its meshes from a recorded session, without a network.
+
+Record a session once, with real credentials:
+    python bench_replay.py cassette --record --creds config.json --did <did> --wvm v --wvmid <vid> --eid <eid>
+then replay it as often as needed, optionally with latency and throttling:
+    python bench_replay.py cassette --latency 0.05 --rate-limit 20
+"""
+import argparse
+import tempfile
+import time
+
+from onshape_to_sim.onshape_api.cassette import RecordingTransport, ReplayTransport
+from onshape_to_sim.onshape_api.client import Client
+from onshape_to_sim.onshape_api.onshape_tree import create_onshape_tree, download_all_rigid_bodies_meshes
+from onshape_to_sim.onshape_api.session import SessionPool
+
+
+def run_session(client: Client, document: dict, mesh_directory: str) -> None:
+    start = time.perf_counter()
+    root = create_onshape_tree(
+        did=document["did"],
+        wvm=document["wvm"],
+        wvmid=document["wvmid"],
+        eid=document["eid"],
+        robot_name="bench",
+        api_client=client,
+    )
+    build = time.perf_counter() - start
+    rigid_bodies = list(root.get_occurrence_id_to_rigid_body_node().values())
+    start = time.perf_counter()
+    meshes = download_all_rigid_bodies_meshes(rigid_bodies, data_directory=mesh_directory, api_client=client)
+    download = time.perf_counter() - start
+    print(f"{len(root.tree)} nodes, {len(rigid_bodies)} rigid bodies")
+    print(f"  build:    {build:8.3f}s ({root.tree.build_timings})")
+    print(f"  download: {download:8.3f}s ({len(set(meshes)) / max(download, 1e-9):.1f} meshes/s)")
+    print(f"  requests: {client.request_stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("cassette", help="cassette directory")
+    parser.add_argument("--record", action="store_true", help="record a session instead of replaying one")
+    parser.add_argument("--creds", default="config.json", help="credentials, only used when recording")
+    parser.add_argument("--did")
+    parser.add_argument("--wvm", default="v")
+    parser.add_argument("--wvmid")
+    parser.add_argument("--eid")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every replayed response")
+    parser.add_argument("--recorded-latency", type=float, default=0.0, help="fraction of the recorded time added")
+    parser.add_argument("--rate-limit", type=float, default=None, help="replayed requests per second before 429s")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as mesh_directory:
+        if args.record:
+            document = {"did": args.did, "wvm": args.wvm, "wvmid": args.wvmid, "eid": args.eid}
+            transport = RecordingTransport(args.cassette, SessionPool(), description=document)
+            # Without the disk cache, so that every request of the session reaches the cassette
+            with Client(creds=args.creds, logging=False, use_cache=False, transport=transport) as client:
+                run_session(client, document, mesh_directory)
+            return
+        transport = ReplayTransport(
+            args.cassette,
+            latency=args.latency,
+            recorded_latency_scale=args.recorded_latency,
+            rate_limit=args.rate_limit,
+        )
+        with Client(logging=False, use_cache=False, transport=transport) as client:
+            run_session(client, transport.description, mesh_directory)
+        print(f"  replayed: {transport.num_requests} responses, {transport.num_throttled} throttled")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Benchmarks signed requests per second with and without pooled sessions against a local stub server.
+
+Run from this directory:
+    python bench_sessions.py --requests 500
+"""
+import argparse
+import tempfile
+import time
+from unittest import mock
+
+import requests
+
+from onshape_to_sim.onshape_api.onshape import Onshape
+from stub_server import StubServer, json_route, write_creds
+
+
+def _requests_per_second(api: Onshape, num_requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(num_requests):
+        api.request("get", "documents").json()
+    return num_requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir, StubServer({"/api/v6/documents": json_route({"items": []})}) as server:
+        creds = write_creds(tmp_dir, server.url)
+
+        # The unpooled baseline sends every request through a throwaway session, like requests.request does
+        api = Onshape(stack=server.url, creds=creds, logging=False)
+        with mock.patch.object(api._sessions, "request", requests.request):
+            connections_before = server.connections
+            unpooled = _requests_per_second(api, args.requests)
+            unpooled_connections = server.connections - connections_before
+
+        connections_before = server.connections
+        pooled = _requests_per_second(api, args.requests)
+        pooled_connections = server.connections - connections_before
+        api.close()
+
+    print(f"unpooled: {unpooled:8.1f} req/s over {unpooled_connections} connections")
+    print(f"pooled:   {pooled:8.1f} req/s over {pooled_connections} connections")
+    print(f"speedup:  {pooled / unpooled:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Benchmarks signing requests, and signed requests per second with the network taken out.
+
+Signing is compared with the way it was done before: a new HMAC keyed for every request, a nonce drawn one character
+at a time and the date formatted every time. Requests go through a transport answering at once, so only the work of
+the client is measured, with logging off and on. Fails if signing is no faster than before. Run from this directory:
+    python bench_signing.py --requests 20000
+"""
+import argparse
+import base64
+import datetime
+import hashlib
+import hmac
+import logging
+import random
+import string
+import tempfile
+import time
+import urllib
+
+import requests
+
+from onshape_to_sim.onshape_api.onshape import Onshape
+from stub_server import write_creds
+
+
+class _InstantTransport():
+    """Answers every request at once with the same response"""
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b"{}"
+        response._content_consumed = True
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+def _legacy_headers(api: Onshape, method: str, path: str, query: dict) -> dict:
+    """Signs a request as Onshape._make_headers used to"""
+    date = datetime.datetime.now(datetime.timezone.utc).strftime("%a, %d %b %Y %H:%M:%S GMT")
+    nonce = "".join(random.choice(string.digits + string.ascii_letters) for _ in range(25))
+    query = urllib.parse.urlencode(query)
+    hmac_str = (method + "\n" + nonce + "\n" + date + "\n" + "application/json" + "\n" + path +
+                "\n" + query + "\n").lower().encode("utf-8")
+    signature = base64.b64encode(hmac.new(api._secret_key, hmac_str, digestmod=hashlib.sha256).digest())
+    auth = "On " + api._access_key.decode("utf-8") + ":HmacSHA256:" + signature.decode("utf-8")
+    return {
+        "Content-Type": "application/json",
+        "Date": date,
+        "On-Nonce": nonce,
+        "Authorization": auth,
+        "User-Agent": "Onshape Python Sample App",
+        "Accept": "application/json"
+    }
+
+
+def _per_second(function, num_calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(num_calls):
+        function()
+    return num_calls / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    path = "/api/v6/parts/d/did/m/mid/e/eid/partid/JHD/massproperties"
+    query = {"configuration": "default", "useMassPropertyOverrides": True}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        api = Onshape(stack="http://localhost", creds=write_creds(tmp_dir, "http://localhost"), logging=False,
+                      transport=_InstantTransport())
+        legacy = _per_second(lambda: _legacy_headers(api, "get", path, query), args.requests)
+        signed = _per_second(lambda: api._make_headers("get", path, query), args.requests)
+        requested = _per_second(lambda: api.request("get", path[len("/api/v6/"):], query=query), args.requests)
+
+        # With logging on, messages are formatted and handled; send them nowhere to time only the client
+        api._logging = True
+        api.request("get", "documents")
+        for name in ("info", "error"):
+            logging.getLogger(name).disabled = True
+        logged = _per_second(lambda: api.request("get", path[len("/api/v6/"):], query=query), args.requests // 10)
+
+    print(f"signing, as before: {legacy:10.0f} headers/s")
+    print(f"signing:            {signed:10.0f} headers/s ({signed / legacy:.2f}x)")
+    print(f"requests:           {requested:10.0f} req/s")
+    print(f"requests, logging:  {logged:10.0f} req/s")
+    assert signed > legacy, "signing is slower than it was before"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Measures storing and loading a tree with pickle against the array format of tree_format.
+
+Loading is timed four ways: unpickling, building the full tree with load_tree, opening the tree with open_tree, and
+opening it and reading what the SDF generation reads of every rigid body and joint. Run from this directory:
+    python bench_tree_format.py --subassemblies 100 --parts 50
+"""
+import argparse
+import os
+import pickle
+import tempfile
+import time
+
+from onshape_to_sim.onshape_api import onshape_tree
+from onshape_to_sim.onshape_api.onshape_tree import build_tree, load_tree
+from onshape_to_sim.onshape_api.tree_format import open_tree, save_tree
+from synthetic_assembly import FakeApiClient, make_assembly
+
+
+def _time(function, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - start) / repeats
+
+
+def _directory_size(directory: str) -> int:
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+
+def read_for_sdf(stored) -> None:
+    """Reads the rigid body and joint data RobotSDF uses"""
+    for node in stored.get_occurrence_id_to_rigid_body_node().values():
+        node.simplified_name, node.mesh_name, node.mass
+        node.world_tform_element, node.com_wrt_world, node.inertia_wrt_world
+    stored.get_joint_parents()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subassemblies", type=int, default=100, help="copies of the synthetic subassembly")
+    parser.add_argument("--parts", type=int, default=50, help="parts in the synthetic subassembly")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    assembly = make_assembly(
+        num_studios=4,
+        parts_per_studio=25,
+        num_subassemblies=args.subassemblies,
+        parts_per_subassembly=args.parts,
+        mates=True,
+    )
+    onshape_tree.onshape_client = FakeApiClient(assembly)
+    root = build_tree(assembly, robot_name="synthetic")
+    with tempfile.TemporaryDirectory() as directory:
+        pickle_path = os.path.join(directory, "tree.pickle")
+        tree_path = os.path.join(directory, "tree")
+        save_pickle = _time(lambda: pickle.dump(root, open(pickle_path, "wb")), args.repeats)
+        save_arrays = _time(lambda: save_tree(root, tree_path), args.repeats)
+        load_pickle = _time(lambda: pickle.load(open(pickle_path, "rb")), args.repeats)
+        load_arrays = _time(lambda: load_tree(tree_path), args.repeats)
+        open_only = _time(lambda: open_tree(tree_path), args.repeats)
+        open_arrays = _time(lambda: read_for_sdf(open_tree(tree_path)), args.repeats)
+        print(f"{len(root.tree)} nodes, {len(root.occurrence_id_to_rigid_body_node)} rigid bodies")
+        print(f"  size:      pickle {os.path.getsize(pickle_path) / 1024:9.1f} KiB | arrays {_directory_size(tree_path) / 1024:9.1f} KiB")
+        print(f"  save:      pickle {save_pickle * 1000:9.2f} ms  | arrays {save_arrays * 1000:9.2f} ms")
+        print(f"  load:      pickle {load_pickle * 1000:9.2f} ms  | load_tree {load_arrays * 1000:9.2f} ms")
+        print(f"  open:      open_tree {open_only * 1000:9.2f} ms | with sdf reads {open_arrays * 1000:9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
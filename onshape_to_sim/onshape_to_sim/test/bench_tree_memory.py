@@ -0,0 +1,103 @@
+"""Measures the memory and pickle size of trees with dict-based nodes against the compact, slot-based tree.
+
+The dict-based trees are the throwy pickles as stored, and a synthetic assembly converted to the same layout. Run
+from this directory:
+    python bench_tree_memory.py --subassemblies 100 --parts 50
+"""
+import argparse
+import pickle
+import tracemalloc
+
+import numpy as np
+
+from onshape_to_sim.onshape_api import onshape_tree
+from onshape_to_sim.onshape_api.onshape_tree import _LegacyTreeNode, _LegacyUnpickler, build_tree, load_tree
+from synthetic_assembly import FakeApiClient, make_assembly
+
+
+def to_dict_tree(root) -> _LegacyTreeNode:
+    """Converts a compact tree into dict-based nodes laid out as before nodes used slots"""
+    converted = {}
+    for node in root.tree.nodes:
+        legacy = _LegacyTreeNode()
+        legacy.__dict__.update(
+            element_dict=node.element_dict,
+            node_id=node.node_id,
+            name=node.name,
+            mesh_name=node.mesh_name,
+            simplified_name=node.simplified_name,
+            parent_node=converted.get(id(node.parent_node)),
+            is_rigid_body=node.is_rigid_body,
+            children=[],
+            depth=node.depth,
+            occurrence_id=node.occurrence_id,
+            hidden=node.hidden,
+            relative_path=list(node.relative_path),
+            world_tform_element=np.array(node.world_tform_element),
+            element_tform_mate=node.element_tform_mate,
+            com_wrt_world=np.array(node.com_wrt_world),
+            inertia_wrt_world=np.array(node.inertia_wrt_world),
+            mass=node.mass,
+            has_mass=node.has_mass,
+            volume=node.volume,
+            links=[],
+            occurrence_id_to_rigid_body_node={},
+            internal_naming={},
+            joint_parents={},
+        )
+        if legacy.parent_node is not None:
+            legacy.parent_node.children.append(legacy)
+        converted[id(node)] = legacy
+    legacy_root = converted[id(root)]
+    legacy_root.internal_naming = dict(root.internal_naming)
+    legacy_root.joint_parents = dict(root.joint_parents)
+    legacy_root.occurrence_id_to_rigid_body_node = {
+        occurrence_id: converted[id(node)] for occurrence_id, node in root.occurrence_id_to_rigid_body_node.items()
+    }
+    return legacy_root
+
+
+def _loaded_size(data: bytes, loads) -> int:
+    """Bytes allocated by loading a pickle and still held afterwards"""
+    tracemalloc.start()
+    loaded = loads(data)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del loaded
+    return size
+
+
+def bench(name: str, legacy_root: _LegacyTreeNode, compact_root) -> None:
+    legacy_data = pickle.dumps(legacy_root)
+    compact_data = pickle.dumps(compact_root)
+    legacy_memory = _loaded_size(legacy_data, pickle.loads)
+    compact_memory = _loaded_size(compact_data, pickle.loads)
+    print(
+        f"{name:>24}: {len(compact_root.tree):6d} nodes | "
+        f"memory {legacy_memory / 1024:9.1f} KiB -> {compact_memory / 1024:9.1f} KiB "
+        f"({legacy_memory / len(compact_root.tree):7.0f} -> {compact_memory / len(compact_root.tree):6.0f} B/node) | "
+        f"pickle {len(legacy_data) / 1024:9.1f} KiB -> {len(compact_data) / 1024:9.1f} KiB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subassemblies", type=int, default=100, help="copies of the synthetic subassembly")
+    parser.add_argument("--parts", type=int, default=50, help="parts in the synthetic subassembly")
+    args = parser.parse_args()
+
+    for tree_path in ("throwy_tree.pickle", "throwy_hand_tree.pickle"):
+        with open(tree_path, "rb") as fi:
+            legacy_root = _LegacyUnpickler(fi).load()
+        bench(tree_path, legacy_root, load_tree(tree_path))
+
+    assembly = make_assembly(
+        num_studios=4, parts_per_studio=25, num_subassemblies=args.subassemblies, parts_per_subassembly=args.parts
+    )
+    onshape_tree.onshape_client = FakeApiClient(assembly)
+    root = build_tree(assembly, robot_name="synthetic")
+    bench("synthetic", to_dict_tree(root), root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+"""Fixtures shared by the tests"""
+import pytest
+
+from onshape_to_sim.onshape_api import onshape_tree
+from onshape_to_sim.onshape_api.onshape_tree import build_tree
+from synthetic_assembly import FakeApiClient, make_assembly
+
+
+@pytest.fixture
+def synthetic_root(monkeypatch, request):
+    """A tree built from a synthetic assembly with mates.
+
+    Parametrize it indirectly with a dict of make_assembly arguments to build another assembly.
+    """
+    arguments = dict(num_studios=3, parts_per_studio=4, num_subassemblies=2, parts_per_subassembly=3, mates=True)
+    arguments.update(getattr(request, "param", {}))
+    assembly = make_assembly(**arguments)
+    monkeypatch.setattr(onshape_tree, "onshape_client", FakeApiClient(assembly), raising=False)
+    return build_tree(assembly, robot_name="robot")
@@ -0,0 +1,113 @@
+"""A local HTTP server standing in for the Onshape API in tests and benchmarks."""
+from typing import Callable, Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import threading
+
+from onshape_to_sim.onshape_api.client import Client
+
+# A handler gets (method, path, query string, headers) and returns (status, headers, body)
+Route = Callable[[str, str, str, dict], tuple]
+
+
+def json_route(payload: dict, status: int = 200) -> Route:
+    """A route always answering with the same JSON payload"""
+    body = json.dumps(payload).encode("utf-8")
+
+    def route(method, path, query, headers):
+        return status, {"Content-Type": "application/json"}, body
+    return route
+
+
+class StubServer():
+    """Serves registered routes on localhost with HTTP/1.1 keep-alive.
+
+    Routes are matched on the request path without the query string. Unknown paths return 404.
+    """
+
+    def __init__(self, routes: Optional[dict] = None):
+        self.routes = {} if routes is None else dict(routes)
+        self.requests = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Send headers and body in one segment so keep-alive clients don't stall on delayed ACKs
+            wbufsize = 1 << 16
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length", 0))
+                if length:
+                    self.rfile.read(length)
+                path, _, query = self.path.partition("?")
+                with stub._lock:
+                    stub.requests.append((self.command, path, query, dict(self.headers)))
+                route = stub.routes.get(path)
+                if route is None:
+                    status, headers, body = 404, {}, b""
+                else:
+                    status, headers, body = route(self.command, path, query, dict(self.headers))
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = _handle
+            do_POST = _handle
+            do_DELETE = _handle
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def write_creds(directory: str, url: str) -> str:
+    """Writes a credentials file pointing the client at the stub server and returns its path"""
+    creds = os.path.join(directory, "stub_config.json")
+    with open(creds, "w") as fi:
+        json.dump({
+            "onshape_api": url,
+            "onshape_access_key": "stub_access_key",
+            "onshape_secret_key": "stub_secret_key",
+        }, fi)
+    return creds
+
+
+def stub_client(directory: str, server: StubServer, **kwargs) -> Client:
+    """A client of the stub server, with logging and the response cache off unless kwargs turn them on"""
+    kwargs.setdefault("logging", False)
+    kwargs.setdefault("use_cache", False)
+    return Client(creds=write_creds(directory, server.url), **kwargs)
@@ -0,0 +1,208 @@
+"""Synthetic Onshape assembly definitions and an offline client answering for them, for tests and benchmarks."""
+from typing import Optional
+import hashlib
+import threading
+import time
+
+DOCUMENT_ID = "d" * 24
+MICROVERSION = "m" * 24
+
+
+def instance_id(number: int) -> str:
+    """A 17 character instance id, like the ones Onshape assigns"""
+    return f"I{number:016d}"
+
+
+def _part_instance(number: int, studio: int, part: int) -> dict:
+    return {
+        "id": instance_id(number),
+        "name": f"Part {studio}-{part} <1>",
+        "type": "Part",
+        "documentId": DOCUMENT_ID,
+        "documentMicroversion": MICROVERSION,
+        "elementId": f"studio{studio}",
+        "partId": f"P{studio}-{part}",
+        "configuration": "default",
+    }
+
+
+def _assembly_instance(number: int, element_id: str) -> dict:
+    return {
+        "id": instance_id(number),
+        "name": f"{element_id} <1>",
+        "type": "Assembly",
+        "documentId": DOCUMENT_ID,
+        "documentMicroversion": MICROVERSION,
+        "elementId": element_id,
+        "configuration": "default",
+    }
+
+
+def _occurrence(path: list, offset: int) -> dict:
+    transform = [1.0, 0.0, 0.0, 0.01 * offset, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0]
+    return {"path": list(path), "transform": transform, "hidden": False}
+
+
+def _mate(name: str, parent_path: list, child_path: list) -> dict:
+    mated_cs = {"xAxis": [1.0, 0.0, 0.0], "yAxis": [0.0, 1.0, 0.0], "zAxis": [0.0, 0.0, 1.0], "origin": [0.0, 0.0, 0.01]}
+    return {
+        "featureData": {
+            "name": name,
+            "mateType": "REVOLUTE",
+            "matedEntities": [
+                {"matedOccurrence": list(parent_path), "matedCS": mated_cs},
+                {"matedOccurrence": list(child_path), "matedCS": mated_cs},
+            ],
+        }
+    }
+
+
+def _chain_mates(prefix: str, instances: list) -> list:
+    """Mates each instance to the next one, and the first one to the world"""
+    mates = [_mate(f"{prefix} world", [], [instances[0]["id"]])] if len(instances) > 0 else []
+    for i in range(len(instances) - 1):
+        mates.append(_mate(f"{prefix} {i}", [instances[i]["id"]], [instances[i + 1]["id"]]))
+    return mates
+
+
+def make_assembly(
+    num_studios: int = 3,
+    parts_per_studio: int = 5,
+    num_subassemblies: int = 2,
+    parts_per_subassembly: int = 3,
+    mates: bool = False,
+    ) -> dict:
+    """Builds an assembly definition.
+
+    The root holds `parts_per_studio` parts of each of `num_studios` part studios, and `num_subassemblies` copies of
+    one subassembly holding `parts_per_subassembly` parts of the first studio. With `mates`, the instances of the root
+    and of the subassembly are each mated in a chain.
+    """
+    number = 0
+    root_instances = []
+    occurrences = []
+    for studio in range(num_studios):
+        for part in range(parts_per_studio):
+            root_instances.append(_part_instance(number, studio, part))
+            number += 1
+    sub_instances = []
+    for part in range(parts_per_subassembly):
+        sub_instances.append(_part_instance(number, 0, parts_per_studio + part))
+        number += 1
+    for _ in range(num_subassemblies):
+        root_instances.append(_assembly_instance(number, "subassembly"))
+        number += 1
+    for instance in root_instances:
+        occurrences.append(_occurrence([instance["id"]], len(occurrences)))
+        if instance["type"] == "Assembly":
+            for sub_instance in sub_instances:
+                occurrences.append(_occurrence([instance["id"], sub_instance["id"]], len(occurrences)))
+    subassemblies = []
+    if num_subassemblies > 0:
+        subassemblies.append({
+            "documentId": DOCUMENT_ID,
+            "documentMicroversion": MICROVERSION,
+            "elementId": "subassembly",
+            "instances": sub_instances,
+            "features": _chain_mates("sub", sub_instances) if mates else [],
+        })
+    return {
+        "rootAssembly": {
+            "documentId": DOCUMENT_ID,
+            "documentMicroversion": MICROVERSION,
+            "elementId": "root",
+            "instances": root_instances,
+            "occurrences": occurrences,
+            "features": _chain_mates("root", root_instances) if mates else [],
+        },
+        "subAssemblies": subassemblies,
+    }
+
+
+def mass_body(name: str) -> dict:
+    """Mass properties of a body, derived from its name so every body differs"""
+    seed = int(hashlib.sha256(name.encode("utf-8")).hexdigest()[:8], 16)
+    mass = 0.1 + seed % 1000 / 1000.0
+    return {
+        "mass": [mass, mass, mass],
+        "hasMass": True,
+        "volume": [mass / 1000.0] * 3,
+        "centroid": [0.001 * (seed % 7), 0.001 * (seed % 11), 0.001 * (seed % 13)] + [0.0] * 6,
+        "inertia": [mass, 0.0, 0.0, 0.0, mass, 0.0, 0.0, 0.0, mass] + [0.0] * 9,
+    }
+
+
+def _body_name(name: str, wvmid: str) -> str:
+    return name if wvmid == MICROVERSION else f"{name}@{wvmid}"
+
+
+class FakeApiClient():
+    """Answers the metadata and mass properties calls made while building a tree, and records them.
+
+    Every part is a rigid body; subassemblies are not unless `rigid_assemblies` is set. Mass properties of elements
+    at another microversion than MICROVERSION differ, as if the elements had been edited.
+    """
+
+    def __init__(
+        self,
+        assembly: dict,
+        rigid_assemblies: bool = False,
+        missing_bodies: Optional[set] = None,
+        latency: float = 0.0,
+        ):
+        self.rigid_assemblies = rigid_assemblies
+        # Seconds each call takes, to stand in for the network
+        self.latency = latency
+        # Part ids of each part studio
+        self.studios = {}
+        instances = list(assembly["rootAssembly"]["instances"])
+        for subassembly in assembly["subAssemblies"]:
+            instances.extend(subassembly["instances"])
+        for instance in instances:
+            if "partId" in instance:
+                self.studios.setdefault(instance["elementId"], set()).add(instance["partId"])
+        # Part ids left out of the part studio responses
+        self.missing_bodies = set() if missing_bodies is None else set(missing_bodies)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _record(self, name: str, **kwargs) -> None:
+        with self._lock:
+            self.calls.append((name, kwargs))
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def count(self, name: str) -> int:
+        return sum(1 for call_name, _ in self.calls if call_name == name)
+
+    def part_metadata(self, did, wvmid, eid, partid, configuration="default", wvm="m"):
+        self._record("part_metadata", did=did, eid=eid, partid=partid)
+        return [{"name": "Rigid Body", "value": True}]
+
+    def all_part_metadata(self, did, wvmid, eid, configuration="default", wvm="m"):
+        self._record("all_part_metadata", did=did, eid=eid, configuration=configuration)
+        return {
+            "items": [
+                {"partId": part_id, "properties": [{"name": "Rigid Body", "value": True}]}
+                for part_id in sorted(self.studios[eid])
+            ]
+        }
+
+    def element_metadata(self, did, wvmid, eid, configuration="default", wvm="m"):
+        self._record("element_metadata", did=did, eid=eid)
+        return [{"name": "Rigid Body", "value": self.rigid_assemblies}]
+
+    def part_mass_properties(self, did, wvmid, eid, partid, configuration="default", wvm="m"):
+        self._record("part_mass_properties", did=did, eid=eid, partid=partid)
+        return {"bodies": {partid: mass_body(_body_name(partid, wvmid))}}
+
+    def part_studio_mass_properties(self, did, wvmid, eid, configuration="default", wvm="m"):
+        self._record("part_studio_mass_properties", did=did, eid=eid, configuration=configuration)
+        bodies = {
+            part_id: mass_body(_body_name(part_id, wvmid)) for part_id in sorted(self.studios[eid]) if part_id not in self.missing_bodies
+        }
+        return {"bodies": bodies}
+
+    def assembly_mass_properties(self, did, wvmid, eid, configuration="default", wvm="m"):
+        self._record("assembly_mass_properties", did=did, eid=eid, configuration=configuration)
+        return mass_body(_body_name(eid, wvmid))
@@ -0,0 +1,66 @@
+"""Tests the asyncio Onshape client"""
+import asyncio
+import json
+import threading
+import time
+
+from onshape_to_sim.onshape_api.async_client import AsyncClient
+from stub_server import StubServer, stub_client, write_creds
+
+
+class _SlowDocument():
+    """Answers slowly while recording the largest number of simultaneous requests"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, method, path, query, headers):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        return 200, {"Content-Type": "application/json"}, json.dumps({"name": path.split("/")[-1]}).encode()
+
+
+def test_async_client_bounds_concurrency(tmp_path):
+    route = _SlowDocument(delay=0.05)
+    routes = {f"/api/v6/documents/doc{i}": route for i in range(40)}
+    with StubServer(routes) as server:
+        creds = write_creds(tmp_path, server.url)
+
+        async def fetch_all():
+            async with AsyncClient(creds=creds, logging=False, max_concurrency=8) as client:
+                return await asyncio.gather(*(client.get_document(did=f"doc{i}") for i in range(40)))
+
+        start = time.perf_counter()
+        documents = asyncio.run(fetch_all())
+        elapsed = time.perf_counter() - start
+
+    assert [document["name"] for document in documents] == [f"doc{i}" for i in range(40)]
+    assert route.max_in_flight <= 8
+    # 40 requests at 50 ms each take 2 s serially
+    assert elapsed < 1.5
+    # Every request is signed with its own nonce
+    nonces = [headers["On-Nonce"] for _, _, _, headers in server.requests]
+    assert len(set(nonces)) == 40
+    assert all(headers["Authorization"].startswith("On stub_access_key:HmacSHA256:")
+               for _, _, _, headers in server.requests)
+
+
+def test_async_client_shares_an_existing_client(tmp_path):
+    with StubServer({"/api/v6/documents/doc": _SlowDocument(delay=0.0)}) as server:
+        client = stub_client(tmp_path, server)
+
+        async def fetch():
+            async with AsyncClient(client=client) as async_client:
+                return await async_client.get_document(did="doc")
+
+        assert asyncio.run(fetch()) == {"name": "doc"}
+        # The client is not owned by the async client, so it stays usable
+        assert client.get_document(did="doc") == {"name": "doc"}
+        client.close()
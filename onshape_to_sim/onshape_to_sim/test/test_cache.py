@@ -0,0 +1,105 @@
+"""Tests the persistent response cache"""
+import os
+
+from onshape_to_sim.onshape_api.cache import ResponseCache, cache_key
+from stub_server import StubServer, json_route, stub_client
+
+MASS_PROPERTIES = {"bodies": {"JHD": {"mass": [1.0], "hasMass": True}}}
+
+
+def test_versions_are_served_from_the_cache(tmp_path):
+    routes = {
+        "/api/v6/parts/d/did/v/vid/e/eid/partid/JHD/massproperties": json_route(MASS_PROPERTIES),
+        "/api/v6/parts/d/did/w/wid/e/eid/partid/JHD/massproperties": json_route(MASS_PROPERTIES),
+    }
+    with StubServer(routes) as server:
+        client = stub_client(tmp_path, server, use_cache=True, cache_path=tmp_path / "cache")
+        for _ in range(3):
+            assert client.part_mass_properties(did="did", wvmid="vid", eid="eid", partid="JHD", wvm="v") == \
+                MASS_PROPERTIES
+        assert len(server.requests) == 1
+
+        # A new client (a new run) reuses what is on disk
+        client = stub_client(tmp_path, server, use_cache=True, cache_path=tmp_path / "cache")
+        client.part_mass_properties("did", "vid", "eid", "JHD", wvm="v")
+        assert len(server.requests) == 1
+
+        # Workspaces change, so they are never cached
+        for _ in range(2):
+            client.part_mass_properties(did="did", wvmid="wid", eid="eid", partid="JHD", wvm="w")
+        assert len(server.requests) == 3
+
+
+def test_stls_are_served_from_the_cache(tmp_path):
+    routes = {"/api/v6/parts/d/did/m/mid/e/eid/partid/JHD/stl": lambda *args: (200, {}, b"solid mesh")}
+    with StubServer(routes) as server:
+        client = stub_client(tmp_path, server, use_cache=True, cache_path=tmp_path / "cache")
+        for i in range(2):
+            client.part_stl_pipeline(did="did", wvmid="mid", eid="eid", part_id="JHD", filename=str(tmp_path / f"m{i}"),
+                                     wvm="m")
+            with open(tmp_path / f"m{i}.stl", "rb") as fi:
+                assert fi.read() == b"solid mesh"
+        assert len(server.requests) == 1
+
+        # Other configurations are exported, and cached, on their own
+        client.part_stl_pipeline(did="did", wvmid="mid", eid="eid", part_id="JHD", filename=str(tmp_path / "long"),
+                                 wvm="m", configuration="length=2")
+        assert len(server.requests) == 2
+        assert "configuration=length%3D2" in server.requests[-1][2]
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(tmp_path, max_size=250)
+    keys = [cache_key("endpoint", "did", "v", "vid", eid=str(i)) for i in range(3)]
+    cache.put_json(keys[0], "a" * 100)
+    cache.put_json(keys[1], "b" * 100)
+    # Using the first entry makes the second one the least recently used
+    os.utime(cache._path(keys[1], ".json"), (0, 0))
+    cache._entries[cache._path(keys[1], ".json")][1] = 0
+    assert cache.get_json(keys[0]) == "a" * 100
+    cache.put_json(keys[2], "c" * 100)
+    assert cache.get_json(keys[1]) is None
+    assert cache.get_json(keys[0]) == "a" * 100
+    assert cache.get_json(keys[2]) == "c" * 100
+    assert cache.size <= 250
+
+    # Reopening the cache picks up the existing entries, once they are needed
+    reopened = ResponseCache(tmp_path, max_size=250)
+    assert reopened._entries is None
+    assert reopened.get_json(keys[0]) == "a" * 100 and reopened._entries is None
+    assert reopened.size == cache.size
+    reopened.clear()
+    assert reopened.size == 0
+    assert keys[0] not in reopened
+
+
+def test_interrupted_writes_are_discarded(tmp_path):
+    cache = ResponseCache(tmp_path)
+    key = cache_key("endpoint", "did", "v", "vid")
+    cache.put_json(key, {"value": 1})
+    leftover = os.path.join(os.path.dirname(cache._path(key, ".json")), ".tmp_leftover")
+    in_progress = os.path.join(os.path.dirname(cache._path(key, ".json")), ".tmp_in_progress")
+    for path in (leftover, in_progress):
+        with open(path, "w") as fi:
+            fi.write("{\"val")
+    os.utime(leftover, (0, 0))
+    ResponseCache(tmp_path).put_json(cache_key("endpoint", "did", "v", "vid", eid="other"), {"value": 2})
+    assert not os.path.exists(leftover)
+    # Another process may still be writing recent ones
+    assert os.path.exists(in_progress)
+    assert cache.get_json(key) == {"value": 1}
+
+
+def test_cached_files_leave_partial_downloads_alone(tmp_path):
+    cache = ResponseCache(tmp_path / "cache")
+    key = cache_key("part_stl", "did", "v", "vid")
+    (tmp_path / "mesh.stl").write_bytes(b"solid mesh")
+    cache.put_file(key, str(tmp_path / "mesh.stl"))
+    (tmp_path / "part.stl.part").write_bytes(b"solid")
+
+    assert cache.get_file(key, str(tmp_path / "part.stl"))
+    assert not cache.get_file(cache_key("part_stl", "did", "v", "other"), str(tmp_path / "other.stl"))
+
+    assert (tmp_path / "part.stl").read_bytes() == b"solid mesh"
+    assert (tmp_path / "part.stl.part").read_bytes() == b"solid"
+    assert sorted(os.listdir(tmp_path)) == ["cache", "mesh.stl", "part.stl", "part.stl.part"]
@@ -0,0 +1,73 @@
+"""Tests recording sessions with the API to cassettes and replaying them offline"""
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+import pytest
+
+from onshape_to_sim.onshape_api.cassette import CassetteError, RecordingTransport, ReplayTransport
+from onshape_to_sim.onshape_api.client import Client
+from onshape_to_sim.onshape_api.retry import RetryPolicy
+from onshape_to_sim.onshape_api.session import SessionPool
+from stub_server import StubServer, json_route, stub_client
+
+MASS_PROPERTIES = {"bodies": {"JHD": {"mass": [1.0], "hasMass": True}}}
+ROUTES = {
+    "/api/v6/documents/did": json_route({"name": "robot"}),
+    "/api/v6/partstudios/d/did/m/mid/e/eid/massproperties": json_route(MASS_PROPERTIES),
+    "/api/v6/parts/d/did/m/mid/e/eid/partid/JHD/stl": lambda *args: (200, {}, b"solid mesh"),
+}
+
+
+def _record(tmp_path) -> str:
+    cassette = str(tmp_path / "cassette")
+    with StubServer(ROUTES) as server:
+        transport = RecordingTransport(cassette, SessionPool(), description={"did": "did"})
+        with stub_client(tmp_path, server, transport=transport) as client:
+            assert client.get_document("did") == {"name": "robot"}
+            client.part_studio_mass_properties("did", "mid", "eid", wvm="m")
+            client.part_stl_pipeline(did="did", wvmid="mid", eid="eid", part_id="JHD",
+                                     filename=str(tmp_path / "recorded"), wvm="m")
+        assert len(server.requests) == 3
+    return cassette
+
+
+def _replay_client(transport: ReplayTransport, **kwargs) -> Client:
+    # No credential file is needed to replay
+    return Client(creds="missing.json", logging=False, use_cache=False, transport=transport, **kwargs)
+
+
+def test_replay_answers_without_a_network(tmp_path):
+    cassette = _record(tmp_path)
+    transport = ReplayTransport(cassette)
+
+    with _replay_client(transport) as client:
+        assert client.get_document("did") == {"name": "robot"}
+        assert client.part_studio_mass_properties("did", "mid", "eid", wvm="m") == MASS_PROPERTIES
+        client.part_stl_pipeline(did="did", wvmid="mid", eid="eid", part_id="JHD",
+                                 filename=str(tmp_path / "replayed"), wvm="m")
+        with open(tmp_path / "replayed.stl", "rb") as fi:
+            assert fi.read() == b"solid mesh"
+        with pytest.raises(CassetteError):
+            client.get_document("other")
+    assert transport.description == {"did": "did"}
+    assert transport.num_requests == 4
+
+
+def test_replay_simulates_latency_and_throttling(tmp_path):
+    cassette = _record(tmp_path)
+
+    transport = ReplayTransport(cassette, latency=0.1)
+    with _replay_client(transport, coalesce_requests=False) as client, ThreadPoolExecutor(max_workers=8) as executor:
+        start = time.perf_counter()
+        documents = list(executor.map(lambda _: client.get_document("did"), range(8)))
+        elapsed = time.perf_counter() - start
+    assert documents == [{"name": "robot"}] * 8
+    # Requests wait concurrently: 8 in a row would take 0.8 s
+    assert 0.1 <= elapsed < 0.5
+
+    transport = ReplayTransport(cassette, rate_limit=50.0, burst=1.0)
+    with _replay_client(transport, coalesce_requests=False, retry_policy=RetryPolicy(max_retries=20)) as client:
+        for _ in range(5):
+            assert client.get_document("did") == {"name": "robot"}
+    assert transport.num_throttled > 0
+    assert transport.num_requests == 5 + transport.num_throttled
@@ -0,0 +1,96 @@
+"""Tests sharing identical requests between callers"""
+from concurrent.futures import ThreadPoolExecutor
+import json
+import threading
+import time
+
+import pytest
+
+from onshape_to_sim.onshape_api.coalescing import RequestCoalescer
+from stub_server import StubServer, stub_client
+
+MASS_PROPERTIES = {"bodies": {"JHD": {"mass": [1.0], "hasMass": True}}}
+
+
+def _slow_route(delay: float):
+    def route(method, path, query, headers):
+        time.sleep(delay)
+        return 200, {"Content-Type": "application/json"}, json.dumps(MASS_PROPERTIES).encode()
+    return route
+
+
+def test_concurrent_identical_requests_share_one_call(tmp_path):
+    routes = {
+        "/api/v6/partstudios/d/did/m/mid/e/eid/massproperties": _slow_route(0.2),
+        "/api/v6/partstudios/d/did/w/wid/e/eid/massproperties": _slow_route(0.2),
+    }
+    with StubServer(routes) as server:
+        client = stub_client(tmp_path, server)
+        for wvm, wvmid in (("m", "mid"), ("w", "wid")):
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                responses = list(executor.map(
+                    lambda _: client.part_studio_mass_properties("did", wvmid, "eid", wvm=wvm), range(8)
+                ))
+            assert all(response is responses[0] for response in responses)
+        assert len(server.requests) == 2
+        assert client.request_stats.misses == 2 and client.request_stats.coalesced == 14
+
+        # Microversions are answered from memory afterwards, workspaces are asked again
+        client.part_studio_mass_properties("did", "mid", "eid", wvm="m")
+        client.part_studio_mass_properties("did", "wid", "eid", wvm="w")
+        assert len(server.requests) == 3
+        assert client.request_stats.hits == 1
+
+        client.clear_responses()
+        client.part_studio_mass_properties("did", "mid", "eid", wvm="m")
+        assert len(server.requests) == 4
+
+
+def test_assembly_definitions_are_not_shared(tmp_path):
+    routes = {
+        "/api/v6/assemblies/d/did/m/mid/e/eid": _slow_route(0.0),
+        "/api/v6/partstudios/d/did/m/mid/e/eid/massproperties": _slow_route(0.0),
+    }
+    with StubServer(routes) as server:
+        client = stub_client(tmp_path, server)
+        first = client.assembly_definition("did", "mid", "eid", wvm="m")
+        first["bodies"] = {}
+        second = client.assembly_definition("did", "mid", "eid", wvm="m")
+
+        assert second == MASS_PROPERTIES
+        assert client.request_stats.requests == 0
+
+        disabled = stub_client(tmp_path, server, coalesce_requests=False)
+        for _ in range(2):
+            disabled.part_studio_mass_properties("did", "mid", "eid", wvm="m")
+        assert disabled.request_stats.requests == 0
+        assert len(server.requests) == 4
+
+
+def test_failures_reach_every_waiter_and_are_not_kept():
+    coalescer = RequestCoalescer()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def failing_fetch():
+        calls.append(1)
+        started.set()
+        release.wait()
+        raise ConnectionError("unreachable")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        first = executor.submit(coalescer.get, "key", failing_fetch)
+        started.wait()
+        second = executor.submit(coalescer.get, "key", failing_fetch)
+        while coalescer.stats.coalesced == 0:
+            time.sleep(0.001)
+        release.set()
+        for future in (first, second):
+            with pytest.raises(ConnectionError):
+                future.result()
+
+    assert len(calls) == 1
+    assert coalescer.get("key", lambda: "answer") == "answer"
+    assert coalescer.get("key", lambda: "other") == "answer"
+    assert (coalescer.stats.misses, coalescer.stats.coalesced, coalescer.stats.hits) == (2, 1, 1)
@@ -0,0 +1,129 @@
+"""Tests generating collision shapes for meshes"""
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pytest
+
+from onshape_to_sim.collision_geometry import (
+    CollisionGenerator,
+    ShapeKinds,
+    fit_primitive,
+    mesh_volume,
+)
+from onshape_to_sim.onshape_api import onshape_tree
+from onshape_to_sim.onshape_api.cache import ResponseCache
+from onshape_to_sim.onshape_api.mesh_conversion import read_obj, weld_vertices, write_obj
+from bench_mesh_conversion import sphere_triangles
+from synthetic_assembly import FakeApiClient, make_assembly
+from test_mesh_conversion import CUBE_CORNERS, CUBE_FACES
+
+
+def rotation(roll: float, pitch: float, yaw: float) -> np.ndarray:
+    cr, sr, cp, sp, cy, sy = np.cos(roll), np.sin(roll), np.cos(pitch), np.sin(pitch), np.cos(yaw), np.sin(yaw)
+    return (
+        np.array([[cy, -sy, 0], [sy, cy, 0], [0, 0, 1]])
+        @ np.array([[cp, 0, sp], [0, 1, 0], [-sp, 0, cp]])
+        @ np.array([[1, 0, 0], [0, cr, -sr], [0, sr, cr]])
+    )
+
+
+def cylinder_triangles(radius: float, length: float, num_sides: int = 64) -> np.ndarray:
+    angles = np.linspace(0, 2 * np.pi, num_sides, endpoint=False)
+    ring = np.stack([radius * np.cos(angles), radius * np.sin(angles), np.zeros(num_sides)], axis=1)
+    bottom, top = ring - [0, 0, length / 2], ring + [0, 0, length / 2]
+    following = np.roll(np.arange(num_sides), -1)
+    triangles = []
+    for i, j in zip(range(num_sides), following):
+        triangles += [[bottom[i], bottom[j], top[j]], [bottom[i], top[j], top[i]]]
+        triangles += [[[0, 0, -length / 2], bottom[j], bottom[i]], [[0, 0, length / 2], top[i], top[j]]]
+    return np.array(triangles)
+
+
+def test_primitives_are_fitted_to_their_meshes():
+    placement = rotation(0.3, -0.2, 1.1)
+    box = (CUBE_CORNERS[CUBE_FACES] - 0.5) * [4, 2, 1] @ placement.T + [1, 2, 3]
+    cylinder = cylinder_triangles(0.5, 3) @ placement.T
+    sphere = sphere_triangles(5000).astype(float) * 2
+
+    fitted_box = fit_primitive(box)
+    fitted_cylinder = fit_primitive(cylinder)
+    fitted_sphere = fit_primitive(sphere)
+
+    assert fitted_box.kind == ShapeKinds.box
+    np.testing.assert_allclose(sorted(fitted_box.size), [1, 2, 4], atol=1e-6)
+    np.testing.assert_allclose(fitted_box.pose[:3, 3], [1, 2, 3], atol=1e-6)
+    assert fitted_cylinder.kind == ShapeKinds.cylinder
+    np.testing.assert_allclose(fitted_cylinder.size, [0.5, 3], atol=1e-6)
+    # The axis of the cylinder is z in its pose
+    np.testing.assert_allclose(np.abs(fitted_cylinder.pose[:3, 2]), np.abs(placement[:, 2]), atol=1e-6)
+    assert fitted_sphere.kind == ShapeKinds.sphere
+    np.testing.assert_allclose(fitted_sphere.size, [2], atol=1e-3)
+    for shape, triangles in ((fitted_box, box), (fitted_cylinder, cylinder), (fitted_sphere, sphere)):
+        assert shape.contains(triangles.reshape(-1, 3) * (1 - 1e-6) + shape.pose[:3, 3] * 1e-6).all()
+        assert not shape.contains([shape.pose[:3, 3] + 10]).any()
+    assert mesh_volume(box) == pytest.approx(8)
+
+
+def test_shapes_are_cached_by_mesh_hash(tmp_path):
+    vertices, faces = weld_vertices((CUBE_CORNERS[CUBE_FACES] - 0.5).astype(np.float32))
+    write_obj(str(tmp_path / "part.obj"), vertices, faces)
+    np.testing.assert_array_equal(read_obj(str(tmp_path / "part.obj"))[0], vertices)
+    cache = ResponseCache(tmp_path / "cache")
+
+    generator = CollisionGenerator(cache=cache)
+    shapes = generator.shapes_for_mesh(str(tmp_path / "part.obj"))
+    assert generator.shapes_for_mesh(str(tmp_path / "part.obj")) is shapes
+    assert (generator.hits, generator.misses) == (1, 1)
+
+    # A new run finds the shapes on disk, until the mesh changes
+    generator = CollisionGenerator(cache=cache)
+    stored = generator.shapes_for_mesh(str(tmp_path / "part.obj"))
+    assert (generator.hits, generator.misses) == (1, 0)
+    assert stored[0].kind == ShapeKinds.box
+    np.testing.assert_allclose(stored[0].pose, shapes[0].pose)
+    write_obj(str(tmp_path / "part.obj"), vertices * 2, faces)
+    assert generator.shapes_for_mesh(str(tmp_path / "part.obj"))[0].volume == pytest.approx(8)
+    assert generator.misses == 1
+
+
+def test_concave_meshes_are_decomposed():
+    pytest.importorskip("scipy", exc_type=ImportError)
+    # An L of two boxes, which fills little of any primitive
+    long_bar = (CUBE_CORNERS[CUBE_FACES] - 0.5) * [4, 1, 1] + [2, 0.5, 0.5]
+    short_bar = (CUBE_CORNERS[CUBE_FACES] - 0.5) * [1, 3, 1] + [0.5, 2.5, 0.5]
+    triangles = np.concatenate([long_bar, short_bar])
+
+    shapes = CollisionGenerator(max_hulls=4).generate(triangles)
+
+    assert len(shapes) > 1 and all(shape.kind == ShapeKinds.convex for shape in shapes)
+    points = triangles.reshape(-1, 3) * (1 - 1e-6) + 1e-6
+    assert np.any([shape.contains(points) for shape in shapes], axis=0).all()
+    # The hulls leave out most of the corner the L misses
+    assert not np.any([shape.contains([[3.5, 3.5, 0.5]]) for shape in shapes])
+    assert sum(shape.volume for shape in shapes) < 1.5 * (4 + 3)
+
+
+def test_sdf_links_get_collisions_from_the_converted_meshes(tmp_path, monkeypatch):
+    for module in ("scipy", "open3d", "gz.math7", "sdformat13"):
+        pytest.importorskip(module, exc_type=ImportError)
+    from onshape_to_sim.sdf.sdf_description import RobotSDF
+    assembly = make_assembly(num_studios=1, parts_per_studio=3, num_subassemblies=0)
+    monkeypatch.setattr(onshape_tree, "onshape_client", FakeApiClient(assembly), raising=False)
+    root = onshape_tree.build_tree(assembly, robot_name="robot")
+    rigid_bodies = root.get_occurrence_id_to_rigid_body_node().values()
+    # As convert_stls_to_objs leaves them, away from where the visuals reference the meshes
+    obj_directory = tmp_path / "mesh"
+    obj_directory.mkdir()
+    for mesh_name in {rigid_body.mesh_name for rigid_body in rigid_bodies}:
+        write_obj(str(obj_directory / f"{mesh_name}.obj"), *weld_vertices(CUBE_CORNERS[CUBE_FACES].astype(np.float32)))
+
+    sdf = RobotSDF(root, mesh_directory=str(tmp_path / "sdf"), collision_generator=CollisionGenerator(),
+                   obj_directory=str(obj_directory))
+    sdf.write_sdf(str(tmp_path / "robot"))
+
+    links = ET.parse(tmp_path / "robot.sdf").getroot().findall("./model/link")
+    assert len(links) == len(rigid_bodies) == 3
+    for link in links:
+        collisions = link.findall("collision")
+        assert len(collisions) == 1
+        assert collisions[0].find("geometry/box") is not None
@@ -0,0 +1,96 @@
+"""Tests streaming mesh downloads to disk"""
+import hashlib
+import os
+
+import pytest
+
+from onshape_to_sim.onshape_api.download import ChecksumError, download_to_file, validator_path
+from stub_server import StubServer, stub_client
+
+MESH = bytes(range(256)) * 4096
+ETAG = '"mesh-v1"'
+STL_PATH = "/api/v6/parts/d/did/w/wid/e/eid/partid/JHD/stl"
+
+
+def _ranged_route(method, path, query, headers):
+    """Serves the mesh, honouring Range requests made for its current ETag"""
+    if "Range" in headers and headers.get("If-Range", ETAG) == ETAG:
+        start = int(headers["Range"].split("=")[1].rstrip("-"))
+        return 206, {"Content-Range": f"bytes {start}-{len(MESH) - 1}/{len(MESH)}", "ETag": ETAG}, MESH[start:]
+    return 200, {"ETag": ETAG}, MESH
+
+
+def _leave_partial(tmp_path, data: bytes, etag=None) -> None:
+    """Leaves a partial download behind, as an interrupted run would"""
+    with open(tmp_path / "part.stl.part", "wb") as fi:
+        fi.write(data)
+    if etag is not None:
+        with open(validator_path(str(tmp_path / "part.stl")), "w") as fi:
+            fi.write(etag)
+
+
+def test_stl_is_streamed_to_disk(tmp_path):
+    with StubServer({STL_PATH: _ranged_route}) as server:
+        client = stub_client(tmp_path, server)
+        client.part_stl_pipeline(did="did", wvmid="wid", eid="eid", part_id="JHD", filename=str(tmp_path / "part"),
+                                 checksum=hashlib.sha256(MESH).hexdigest())
+        with open(tmp_path / "part.stl", "rb") as fi:
+            assert fi.read() == MESH
+        assert not os.path.exists(tmp_path / "part.stl.part")
+        assert not os.path.exists(validator_path(str(tmp_path / "part.stl")))
+
+
+def test_partial_download_is_resumed(tmp_path):
+    _leave_partial(tmp_path, MESH[:1000], ETAG)
+    with StubServer({STL_PATH: _ranged_route}) as server:
+        client = stub_client(tmp_path, server)
+        client.part_stl_pipeline(did="did", wvmid="wid", eid="eid", part_id="JHD", filename=str(tmp_path / "part"))
+        assert server.requests[0][3]["Range"] == "bytes=1000-"
+        assert server.requests[0][3]["If-Range"] == ETAG
+    with open(tmp_path / "part.stl", "rb") as fi:
+        assert fi.read() == MESH
+    assert not os.path.exists(validator_path(str(tmp_path / "part.stl")))
+
+
+def test_partial_download_of_a_changed_mesh_restarts(tmp_path):
+    _leave_partial(tmp_path, b"old mesh", '"mesh-v0"')
+    with StubServer({STL_PATH: _ranged_route}) as server:
+        client = stub_client(tmp_path, server)
+        client.part_stl_pipeline(did="did", wvmid="wid", eid="eid", part_id="JHD", filename=str(tmp_path / "part"))
+        assert server.requests[0][3]["If-Range"] == '"mesh-v0"'
+    with open(tmp_path / "part.stl", "rb") as fi:
+        assert fi.read() == MESH
+
+
+def test_partial_download_without_etag_is_discarded(tmp_path):
+    _leave_partial(tmp_path, b"stale data")
+    with StubServer({STL_PATH: _ranged_route}) as server:
+        client = stub_client(tmp_path, server)
+        client.part_stl_pipeline(did="did", wvmid="wid", eid="eid", part_id="JHD", filename=str(tmp_path / "part"))
+        assert "Range" not in server.requests[0][3]
+    with open(tmp_path / "part.stl", "rb") as fi:
+        assert fi.read() == MESH
+
+
+def test_server_ignoring_range_restarts_download(tmp_path):
+    _leave_partial(tmp_path, b"stale data", ETAG)
+    with StubServer({STL_PATH: lambda *args: (200, {}, MESH)}) as server:
+        client = stub_client(tmp_path, server)
+        client.part_stl_pipeline(did="did", wvmid="wid", eid="eid", part_id="JHD", filename=str(tmp_path / "part"))
+    with open(tmp_path / "part.stl", "rb") as fi:
+        assert fi.read() == MESH
+
+
+def test_checksum_mismatch_discards_file(tmp_path):
+    with StubServer({STL_PATH: _ranged_route}) as server:
+        client = stub_client(tmp_path, server)
+        filename = str(tmp_path / "part.stl")
+        with pytest.raises(ChecksumError):
+            download_to_file(
+                lambda headers: client.part_export_stl(did="did", wvmid="wid", eid="eid", part_id="JHD",
+                                                       headers=headers),
+                filename,
+                checksum="0" * 64,
+            )
+        assert not os.path.exists(filename)
+        assert not os.path.exists(filename + ".part")
@@ -0,0 +1,133 @@
+"""Tests updating stored trees from a new definition of their assembly"""
+import copy
+
+import numpy as np
+
+from onshape_to_sim.onshape_api import onshape_tree
+from onshape_to_sim.onshape_api.assembly_diff import diff_assembly_definitions
+from onshape_to_sim.onshape_api.onshape_tree import build_tree, load_stored_data, update_tree
+from synthetic_assembly import FakeApiClient, _part_instance, _occurrence, instance_id, make_assembly
+
+NEW_MICROVERSION = "n" * 24
+
+
+def _stored_tree(monkeypatch, tmp_path, assembly: dict) -> dict:
+    monkeypatch.setattr(onshape_tree, "onshape_client", FakeApiClient(assembly), raising=False)
+    file_path = str(tmp_path / "tree")
+    build_tree(copy.deepcopy(assembly), robot_name="robot", store_data=True, file_path=file_path)
+    return load_stored_data(file_path)
+
+
+def _edit_studio(assembly: dict, element_id: str) -> dict:
+    """Moves the instances of a part studio to another microversion, as an edit of that studio would"""
+    edited = copy.deepcopy(assembly)
+    for instance in edited["rootAssembly"]["instances"]:
+        if instance["elementId"] == element_id:
+            instance["documentMicroversion"] = NEW_MICROVERSION
+    return edited
+
+
+def _assert_same_tree(root, expected) -> None:
+    nodes = {node.occurrence_id: node for node in root.tree.nodes}
+    expected_nodes = {node.occurrence_id: node for node in expected.tree.nodes}
+    assert nodes.keys() == expected_nodes.keys()
+    for occurrence_id, node in nodes.items():
+        expected_node = expected_nodes[occurrence_id]
+        assert node.is_rigid_body == expected_node.is_rigid_body
+        np.testing.assert_allclose(node.world_tform_element, expected_node.world_tform_element)
+        if node.is_rigid_body:
+            assert node.mass == expected_node.mass
+            np.testing.assert_allclose(node.com_wrt_world, expected_node.com_wrt_world)
+            np.testing.assert_allclose(node.inertia_wrt_world, expected_node.inertia_wrt_world)
+    assert root.joint_parents.keys() == expected.joint_parents.keys()
+    for name, joints in root.joint_parents.items():
+        expected_joints = expected.joint_parents[name]
+        assert [joint["name"] for joint, _ in joints] == [joint["name"] for joint, _ in expected_joints]
+        for (_, transform), (_, expected_transform) in zip(joints, expected_joints):
+            np.testing.assert_allclose(transform, expected_transform)
+
+
+def test_unchanged_definition_makes_no_calls(monkeypatch, tmp_path):
+    assembly = make_assembly(num_studios=3, parts_per_studio=4, num_subassemblies=2, parts_per_subassembly=3)
+    stored = _stored_tree(monkeypatch, tmp_path, assembly)
+    client = FakeApiClient(assembly)
+    monkeypatch.setattr(onshape_tree, "onshape_client", client, raising=False)
+
+    root, diff = update_tree(stored, copy.deepcopy(assembly))
+
+    assert not diff
+    assert root is stored["tree"]
+    assert client.calls == []
+
+
+def test_edited_studio_is_patched_in_place(monkeypatch, tmp_path):
+    assembly = make_assembly(
+        num_studios=3, parts_per_studio=4, num_subassemblies=2, parts_per_subassembly=3, mates=True
+    )
+    stored = _stored_tree(monkeypatch, tmp_path, assembly)
+    edited = _edit_studio(assembly, "studio1")
+    edited["rootAssembly"]["occurrences"][0]["transform"][7] = 0.5
+    edited["rootAssembly"]["features"][1]["featureData"]["matedEntities"][0]["matedCS"]["origin"] = [0.0, 0.1, 0.0]
+    client = FakeApiClient(edited)
+    monkeypatch.setattr(onshape_tree, "onshape_client", client, raising=False)
+
+    root, diff = update_tree(stored, copy.deepcopy(edited))
+
+    assert diff and not diff.structure_changed
+    assert len(diff.changed_instances) == 4
+    assert root is stored["tree"]
+    # Only the edited part studio is fetched again
+    assert client.count("all_part_metadata") == 1
+    assert client.count("part_studio_mass_properties") == 1
+    assert len(client.calls) == 2
+    monkeypatch.setattr(onshape_tree, "onshape_client", FakeApiClient(edited), raising=False)
+    _assert_same_tree(root, build_tree(copy.deepcopy(edited), robot_name="robot"))
+
+
+def test_renamed_instance_rebuilds_the_names(monkeypatch, tmp_path):
+    assembly = make_assembly(num_studios=2, parts_per_studio=3, num_subassemblies=0)
+    stored = _stored_tree(monkeypatch, tmp_path, assembly)
+    edited = copy.deepcopy(assembly)
+    edited["rootAssembly"]["instances"][0]["name"] = "Wheel 0-0 <1>"
+    client = FakeApiClient(edited)
+    monkeypatch.setattr(onshape_tree, "onshape_client", client, raising=False)
+
+    root, diff = update_tree(stored, copy.deepcopy(edited))
+
+    assert diff.renamed_instances == {("root", instance_id(0))} and diff.structure_changed
+    assert root is not stored["tree"]
+    assert client.calls == []
+    monkeypatch.setattr(onshape_tree, "onshape_client", FakeApiClient(edited), raising=False)
+    expected = build_tree(copy.deepcopy(edited), robot_name="robot")
+    _assert_same_tree(root, expected)
+    renamed = root.occurrence_id_to_rigid_body_node[instance_id(0)]
+    assert renamed.name.startswith("Wheel 0-0 <1>") and renamed.mesh_name == "wheel0-0"
+    expected_names = {node.occurrence_id: node.simplified_name for node in expected.tree.nodes}
+    assert {node.occurrence_id: node.simplified_name for node in root.tree.nodes} == expected_names
+    assert root.tree.node_index.by_name(renamed.name) is renamed
+    assert root.tree.node_index.by_link_name(renamed.simplified_name) is renamed
+
+
+def test_added_instance_rebuilds_with_stored_responses(monkeypatch, tmp_path):
+    assembly = make_assembly(num_studios=2, parts_per_studio=3, num_subassemblies=1, parts_per_subassembly=2)
+    stored = _stored_tree(monkeypatch, tmp_path, assembly)
+    edited = copy.deepcopy(assembly)
+    # Another copy of a part of a studio that didn't change
+    added = _part_instance(100, 0, 0)
+    edited["rootAssembly"]["instances"].append(added)
+    edited["rootAssembly"]["occurrences"].append(_occurrence([instance_id(100)], 100))
+    client = FakeApiClient(edited)
+    monkeypatch.setattr(onshape_tree, "onshape_client", client, raising=False)
+    file_path = str(tmp_path / "updated")
+
+    root, diff = update_tree(stored, copy.deepcopy(edited), store_data=True, file_path=file_path)
+
+    assert diff.structure_changed
+    assert root is not stored["tree"]
+    assert root.name == "robot"
+    assert len(root.occurrence_id_to_rigid_body_node) == 9
+    assert client.calls == []
+    monkeypatch.setattr(onshape_tree, "onshape_client", FakeApiClient(edited), raising=False)
+    _assert_same_tree(root, build_tree(copy.deepcopy(edited), robot_name="robot"))
+    # The stored update compares equal to the definition it was built from
+    assert not diff_assembly_definitions(load_stored_data(file_path)["assembly_definition"], edited)
@@ -0,0 +1,52 @@
+"""Tests the vectorized mass property computations"""
+import numpy as np
+
+from onshape_to_sim.utils import (
+    combine_inertial_properties,
+    combine_inertial_properties_by_group,
+    express_all_mass_properties_in_world_frame,
+    express_mass_properties_in_world_frame,
+)
+from bench_inertial import combine_one_at_a_time, random_bodies
+
+
+def test_two_point_masses():
+    mass, com, inertia = combine_inertial_properties(
+        np.array([1.0, 3.0]), np.array([[0.0, 0.0, 0.0], [4.0, 0.0, 0.0]]), np.zeros((2, 3, 3))
+    )
+    assert mass == 4.0
+    assert np.allclose(com, [3.0, 0.0, 0.0])
+    # Point masses 3 m and 1 m away from the combined center of mass, along x
+    assert np.allclose(inertia, np.diag([0.0, 1.0 * 9.0 + 3.0 * 1.0, 12.0]))
+
+
+def test_world_frame_batch_matches_single_bodies():
+    transforms, masses, coms, inertias = random_bodies(50)
+    _, batch_coms, batch_inertias = express_all_mass_properties_in_world_frame(transforms, masses, coms, inertias)
+    for i in range(50):
+        mass, com, inertia = express_mass_properties_in_world_frame(transforms[i], masses[i], coms[i], inertias[i])
+        assert mass == masses[i]
+        assert np.allclose(com, transforms[i][:3, :3] @ coms[i] + transforms[i][:3, 3])
+        assert np.allclose(com, batch_coms[i])
+        assert np.allclose(inertia, batch_inertias[i])
+    _, _, rotated = express_all_mass_properties_in_world_frame(transforms, masses, coms, inertias, rotate_inertias=True)
+    assert np.allclose(rotated[7], transforms[7][:3, :3] @ inertias[7] @ transforms[7][:3, :3].T)
+
+
+def test_groups_combine_like_separate_bodies():
+    transforms, masses, coms, inertias = random_bodies(200)
+    _, world_coms, world_inertias = express_all_mass_properties_in_world_frame(transforms, masses, coms, inertias)
+    links = np.array([f"link_{i % 7}" for i in range(200)])
+    groups, group_masses, group_coms, group_inertias = combine_inertial_properties_by_group(
+        links, masses, world_coms, world_inertias
+    )
+    expected = combine_one_at_a_time(links, masses, world_coms, world_inertias)
+    assert list(groups) == sorted(expected)
+    for i, group in enumerate(groups):
+        assert np.isclose(group_masses[i], expected[group][0])
+        assert np.allclose(group_coms[i], expected[group][1])
+        assert np.allclose(group_inertias[i], expected[group][2])
+    # A single group is the same as combining everything
+    mass, com, inertia = combine_inertial_properties(masses, world_coms, world_inertias)
+    assert np.isclose(mass, masses.sum())
+    assert np.allclose(com, (masses[:, np.newaxis] * world_coms).sum(axis=0) / masses.sum())
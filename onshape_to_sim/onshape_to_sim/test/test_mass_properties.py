@@ -0,0 +1,89 @@
+"""Tests the batched mass properties resolution"""
+import numpy as np
+import pytest
+
+from onshape_to_sim.onshape_api import onshape_tree
+from onshape_to_sim.onshape_api.batching import ElementResolver
+from onshape_to_sim.onshape_api.mass_properties import MassPropertiesResolver
+from onshape_to_sim.onshape_api.onshape_tree import _add_instances_mass_properties, build_tree
+from synthetic_assembly import FakeApiClient, make_assembly, mass_body
+
+
+def test_tree_fetches_mass_properties_once_per_element(monkeypatch):
+    assembly = make_assembly(num_studios=3, parts_per_studio=5, num_subassemblies=2, parts_per_subassembly=3)
+    client = FakeApiClient(assembly)
+    monkeypatch.setattr(onshape_tree, "onshape_client", client, raising=False)
+    root = build_tree(assembly, robot_name="robot")
+
+    rigid_bodies = root.occurrence_id_to_rigid_body_node
+    # 15 parts in the root and 3 parts in each copy of the subassembly
+    assert len(rigid_bodies) == 21
+    assert client.count("part_studio_mass_properties") == 3
+    assert client.count("part_mass_properties") == 0
+    for node in rigid_bodies.values():
+        expected = mass_body(node.element_dict["partId"])
+        assert np.isclose(node.mass, expected["mass"][0])
+        assert np.allclose(node.com_wrt_world, node.world_tform_element[:3, :3] @ expected["centroid"][:3]
+                           + node.world_tform_element[:3, 3])
+
+
+def test_missing_bodies_and_assemblies():
+    assembly = make_assembly(num_studios=2, parts_per_studio=4, num_subassemblies=2)
+    client = FakeApiClient(assembly, missing_bodies={"P1-2"})
+    resolver = MassPropertiesResolver(client)
+    mass_properties_map = {}
+    _add_instances_mass_properties(assembly["rootAssembly"]["instances"], mass_properties_map, resolver)
+
+    assert len(mass_properties_map) == 10
+    # One call per part studio and per assembly, plus one for the part left out of its studio's response
+    assert client.count("part_studio_mass_properties") == 2
+    assert client.count("assembly_mass_properties") == 1
+    assert client.count("part_mass_properties") == 1
+    assert resolver.num_requests == 4
+    for instance in assembly["rootAssembly"]["instances"]:
+        name = instance.get("partId", instance["elementId"])
+        assert np.isclose(mass_properties_map[instance["id"]]["mass"], mass_body(name)["mass"][0])
+
+
+def test_phases_of_tree_build(monkeypatch):
+    assembly = make_assembly(num_studios=4, parts_per_studio=5, num_subassemblies=2, parts_per_subassembly=3)
+    latency = 0.05
+    client = FakeApiClient(assembly, latency=latency)
+    monkeypatch.setattr(onshape_tree, "onshape_client", client, raising=False)
+    root = build_tree(assembly, robot_name="robot")
+
+    timings = root.tree.build_timings
+    # The metadata of the 4 studios and the subassembly and the mass properties of the 4 studios are all fetched
+    # during the first phase, concurrently rather than one after the other
+    assert len(client.calls) == 9
+    assert latency <= timings.fetch < 4 * latency
+    # Neither the topology nor, without rigid subassemblies, the mass properties wait on the API
+    assert timings.topology < latency
+    assert timings.mass_properties < latency
+    assert timings.total == timings.fetch + timings.topology + timings.mass_properties
+
+
+def test_resolvers_must_implement_every_request():
+    class PartialResolver(ElementResolver):
+        def _request_element(self, key: tuple, is_part_studio: bool) -> dict:
+            return {}
+
+    with pytest.raises(TypeError):
+        PartialResolver(FakeApiClient(make_assembly(num_studios=1, parts_per_studio=1)))
+
+
+def test_parts_inside_rigid_subassemblies_are_not_prefetched(monkeypatch):
+    assembly = make_assembly(num_studios=2, parts_per_studio=3, num_subassemblies=2, parts_per_subassembly=3)
+    # The parts of the subassembly come from a part studio of their own
+    for instance in assembly["subAssemblies"][0]["instances"]:
+        instance["elementId"] = "subassembly_studio"
+    root_studios = {"studio0", "studio1"}
+    for rigid_assemblies, studios in ((True, root_studios), (False, root_studios | {"subassembly_studio"})):
+        client = FakeApiClient(assembly, rigid_assemblies=rigid_assemblies)
+        monkeypatch.setattr(onshape_tree, "onshape_client", client, raising=False)
+
+        root = build_tree(assembly, robot_name="robot")
+
+        fetched = {call[1]["eid"] for call in client.calls if call[0] == "part_studio_mass_properties"}
+        assert fetched == studios
+        assert len(root.occurrence_id_to_rigid_body_node) == (8 if rigid_assemblies else 12)
@@ -0,0 +1,112 @@
+"""Tests converting STL meshes to OBJ meshes"""
+import numpy as np
+import pytest
+
+from onshape_to_sim.onshape_api.mesh_conversion import (
+    STL_TRIANGLE,
+    read_obj,
+    read_stl_triangles,
+    stl_to_obj,
+    write_obj,
+)
+from onshape_to_sim.onshape_api.utils import convert_stls_to_objs
+
+# The 12 triangles of a unit cube, whose 8 corners are each shared by several triangles
+CUBE_FACES = np.array([
+    [0, 2, 1], [0, 3, 2], [4, 5, 6], [4, 6, 7], [0, 1, 5], [0, 5, 4],
+    [1, 2, 6], [1, 6, 5], [2, 3, 7], [2, 7, 6], [3, 0, 4], [3, 4, 7],
+])
+CUBE_CORNERS = np.array([
+    [0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0], [0, 0, 1], [1, 0, 1], [1, 1, 1], [0, 1, 1],
+], dtype=np.float32)
+
+
+def write_binary_stl(file_path: str, triangles: np.ndarray) -> None:
+    data = np.zeros(len(triangles), dtype=STL_TRIANGLE)
+    data["vertices"] = triangles
+    with open(file_path, "wb") as fo:
+        # Headers of binary files may start with "solid" too
+        fo.write(b"solid binary".ljust(80, b" "))
+        fo.write(np.uint32(len(triangles)).tobytes())
+        fo.write(data.tobytes())
+
+
+def write_ascii_stl(file_path: str, triangles: np.ndarray) -> None:
+    with open(file_path, "w") as fo:
+        fo.write("solid cube\n")
+        for triangle in triangles:
+            fo.write("facet normal 0 0 0\nouter loop\n")
+            for vertex in triangle:
+                fo.write(f"vertex {vertex[0]} {vertex[1]} {vertex[2]}\n")
+            fo.write("endloop\nendfacet\n")
+        fo.write("endsolid cube\n")
+
+
+def test_vertices_are_welded(tmp_path):
+    triangles = CUBE_CORNERS[CUBE_FACES]
+    # A degenerate triangle, and a corner written as -0.0
+    triangles = np.concatenate([triangles, [[[1, 1, 1], [1, 1, 1], [0, 0, 0]]]]).astype(np.float32)
+    triangles[0, 0, 0] = -0.0
+    write_binary_stl(tmp_path / "cube.stl", triangles)
+
+    num_vertices, num_faces = stl_to_obj(str(tmp_path / "cube.stl"), str(tmp_path / "cube.obj"))
+    vertices, faces = read_obj(str(tmp_path / "cube.obj"))
+
+    assert (num_vertices, num_faces) == (8, 12)
+    assert vertices.shape == (8, 3) and faces.shape == (12, 3)
+    np.testing.assert_array_equal(vertices[faces], CUBE_CORNERS[CUBE_FACES])
+
+
+def test_obj_files_round_trip(tmp_path):
+    rng = np.random.default_rng(1)
+    vertices = rng.normal(size=(100, 3)).astype(np.float32) * 1e3
+    faces = rng.integers(0, len(vertices), size=(300, 3))
+
+    write_obj(str(tmp_path / "mesh.obj"), vertices, faces)
+    read_vertices, read_faces = read_obj(str(tmp_path / "mesh.obj"))
+
+    assert read_vertices.dtype == np.float32
+    np.testing.assert_array_equal(read_vertices, vertices)
+    np.testing.assert_array_equal(read_faces, faces)
+
+
+def test_obj_polygons_are_split_into_triangles(tmp_path):
+    with open(tmp_path / "quad.obj", "w") as fo:
+        fo.write("# A square, and a triangle indexed from the end with texture and normal indices\n")
+        fo.write("v 0 0 0\nv 1 0 0\nv 1 1 0\nv 0 1 0\nvn 0 0 1\n")
+        fo.write("f 1 2 3 4\nf -4/1/1 -3/1/1 -1/1/1\n")
+
+    vertices, faces = read_obj(str(tmp_path / "quad.obj"))
+
+    assert vertices.shape == (4, 3)
+    np.testing.assert_array_equal(faces, [[0, 1, 2], [0, 2, 3], [0, 1, 3]])
+
+
+def test_files_are_converted_on_a_pool(tmp_path):
+    stl_dir = tmp_path / "stl"
+    stl_dir.mkdir()
+    rng = np.random.default_rng(0)
+    triangles = {}
+    for i in range(3):
+        triangles[f"part{i}.stl"] = rng.random((50, 3, 3)).astype(np.float32)
+        write_binary_stl(stl_dir / f"part{i}.stl", triangles[f"part{i}.stl"])
+    triangles["ascii.stl"] = CUBE_CORNERS[CUBE_FACES]
+    write_ascii_stl(stl_dir / "ascii.stl", triangles["ascii.stl"])
+    np.testing.assert_array_equal(read_stl_triangles(str(stl_dir / "ascii.stl")), triangles["ascii.stl"])
+
+    obj_paths = convert_stls_to_objs(list(triangles), stl_dir=str(stl_dir), save_dir=str(tmp_path / "obj"),
+                                     max_workers=2)
+
+    assert obj_paths == [str(tmp_path / "obj" / f"{name[:-4]}.obj") for name in triangles]
+    for obj_path, expected in zip(obj_paths, triangles.values()):
+        vertices, faces = read_obj(obj_path)
+        np.testing.assert_array_equal(vertices[faces], expected)
+
+
+def test_path_to_onshape_api_is_deprecated(tmp_path):
+    write_binary_stl(tmp_path / "part.stl", CUBE_CORNERS[CUBE_FACES])
+
+    with pytest.warns(DeprecationWarning, match="path_to_onshape_api"):
+        convert_stls_to_objs(["part.stl"], str(tmp_path), str(tmp_path), "/unused/onshape_api")
+
+    assert (tmp_path / "part.obj").exists()
@@ -0,0 +1,82 @@
+"""Tests the concurrent rigid body mesh download"""
+from types import SimpleNamespace
+import threading
+import time
+
+import pytest
+
+from onshape_to_sim.onshape_api.onshape_tree import download_all_rigid_bodies_meshes
+
+
+class _FakeClient():
+    """Records the pipelines called and how many ran at once"""
+
+    def __init__(self, delay: float = 0.05, fail_on: str = ""):
+        self.delay = delay
+        self.fail_on = fail_on
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _run(self, name: str, filename: str) -> None:
+        with self._lock:
+            self.calls.append((name, filename))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        if self.fail_on and filename.endswith(self.fail_on):
+            raise RuntimeError(f"{filename} failed")
+
+    def part_stl_pipeline(self, did, wvm, wvmid, eid, part_id, filename):
+        self._run("part", filename)
+
+    def assembly_stl_pipeline(self, did, wvm, wvmid, eid, meshname, filename):
+        self._run("assembly", filename)
+
+
+def _rigid_body(name: str, eid: str, part_id: str = "") -> SimpleNamespace:
+    element_dict = {"documentId": "did", "elementId": eid, "documentVersion": "vid"}
+    if part_id:
+        element_dict["partId"] = part_id
+    return SimpleNamespace(name=name, element_dict=element_dict)
+
+
+def _rigid_bodies() -> list:
+    rigid_bodies = [_rigid_body(f"Part {i} <1> 0", eid="e1", part_id=f"P{i}") for i in range(12)]
+    rigid_bodies += [_rigid_body(f"Arm {i} <1> 0", eid=f"a{i}") for i in range(4)]
+    # Duplicated instances of the same part and assembly
+    rigid_bodies.insert(3, _rigid_body("Part 0 <2> 1", eid="e1", part_id="P0"))
+    rigid_bodies.append(_rigid_body("Arm 0 <2> 1", eid="a0"))
+    return rigid_bodies
+
+
+def test_meshes_download_concurrently_in_order(tmp_path):
+    client = _FakeClient()
+    progress = []
+    start = time.perf_counter()
+    mesh_names = download_all_rigid_bodies_meshes(
+        _rigid_bodies(),
+        data_directory=str(tmp_path),
+        api_client=client,
+        max_workers=8,
+        progress_callback=lambda done, total, name: progress.append((done, total)),
+    )
+    elapsed = time.perf_counter() - start
+
+    assert mesh_names == [f"part{i}.stl" for i in range(12)] + [f"arm{i}.stl" for i in range(4)]
+    assert len(client.calls) == 16
+    assert sorted(name for name, _ in client.calls).count("assembly") == 4
+    assert client.max_in_flight == 8
+    # 16 downloads at 50 ms each take 0.8 s one at a time
+    assert elapsed < 0.5
+    assert progress == [(i, 16) for i in range(1, 17)]
+
+
+def test_failed_download_is_reported_after_the_others_finish(tmp_path):
+    client = _FakeClient(fail_on="part3.stl")
+    with pytest.raises(RuntimeError, match="part3.stl"):
+        download_all_rigid_bodies_meshes(_rigid_bodies(), data_directory=str(tmp_path), api_client=client)
+    assert len(client.calls) == 16
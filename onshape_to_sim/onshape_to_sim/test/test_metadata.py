@@ -0,0 +1,36 @@
+"""Tests the batched metadata resolution"""
+from onshape_to_sim.onshape_api import onshape_tree
+from onshape_to_sim.onshape_api.metadata import MetadataResolver
+from onshape_to_sim.onshape_api.onshape_tree import _build_metadata_map, build_tree
+from synthetic_assembly import FakeApiClient, make_assembly
+
+
+def test_metadata_is_fetched_once_per_element():
+    assembly = make_assembly(num_studios=4, parts_per_studio=6, num_subassemblies=3, parts_per_subassembly=4)
+    client = FakeApiClient(assembly, rigid_assemblies=True)
+    resolver = MetadataResolver(client)
+    metadata_map = _build_metadata_map(
+        assembly["rootAssembly"]["instances"], assembly["subAssemblies"], resolver
+    )
+
+    # 24 parts and 3 subassembly instances in the root, 4 parts in the subassembly
+    assert len(metadata_map) == 31
+    assert all(metadata == {"Rigid Body": True} for metadata in metadata_map.values())
+    assert client.count("all_part_metadata") == 4
+    assert client.count("element_metadata") == 1
+    assert client.count("part_metadata") == 0
+    assert resolver.num_requests == 5
+    # The memo answers later lookups without calling the API again
+    _build_metadata_map(assembly["rootAssembly"]["instances"], assembly["subAssemblies"], resolver)
+    assert resolver.num_requests == 5
+
+
+def test_tree_build_scales_with_elements(monkeypatch):
+    assembly = make_assembly(num_studios=2, parts_per_studio=20, num_subassemblies=5, parts_per_subassembly=10)
+    client = FakeApiClient(assembly)
+    monkeypatch.setattr(onshape_tree, "onshape_client", client, raising=False)
+    root = build_tree(assembly, robot_name="robot")
+
+    assert len(root.occurrence_id_to_rigid_body_node) == 90
+    assert client.count("all_part_metadata") + client.count("element_metadata") == 3
+    assert client.count("part_metadata") == 0
@@ -0,0 +1,95 @@
+"""Tests looking nodes up through the index of their tree"""
+import pickle
+
+import pytest
+
+from onshape_to_sim.onshape_api.node_index import descendants
+from onshape_to_sim.onshape_api.onshape_tree import OnshapeTreeNode
+from onshape_to_sim.onshape_api.tree_format import open_tree, save_tree
+from onshape_to_sim.onshape_api.utils import CommonAttributes
+
+
+# The index doesn't depend on the mates
+pytestmark = pytest.mark.parametrize("synthetic_root", [{"mates": False}], indirect=True)
+
+
+def _element_id(node) -> str:
+    return node.element_dict[CommonAttributes.elementId]
+
+
+def _assert_index_matches_nodes(index, nodes) -> None:
+    for node in nodes:
+        assert index.by_occurrence_id(node.occurrence_id) is node
+        assert index.by_path(node.path) is node
+        assert index.by_name(node.name) is node
+        assert index.by_link_name(node.simplified_name) is node
+        assert index.by_node_id(node.node_id) == [other for other in nodes if other.node_id == node.node_id]
+        assert index.by_element_id(_element_id(node)) == [
+            other for other in nodes if _element_id(other) == _element_id(node)
+        ]
+
+
+def test_lookups_match_the_nodes(synthetic_root):
+    nodes = synthetic_root.tree.nodes
+    index = synthetic_root.tree.node_index
+
+    assert len(index) == len(nodes)
+    _assert_index_matches_nodes(index, nodes)
+    assert index.by_occurrence_id("missing") is None
+    assert index.by_node_id("missing") == []
+    # Instances of subassemblies are repeated in every copy of it
+    assert any(len(index.by_node_id(node.node_id)) > 1 for node in nodes[1:])
+
+
+def test_prefix_and_rigid_body_queries(synthetic_root):
+    index = synthetic_root.tree.node_index
+    subassembly = next(node for node in synthetic_root.children if not node.is_rigid_body)
+    part = subassembly.children[0]
+
+    assert index.with_prefix(subassembly.path) == [subassembly] + list(descendants(subassembly))
+    assert index.closest_rigid_body(part.path) is part
+    assert index.closest_rigid_body(part.path[:1]) is None
+    assert synthetic_root.search_by_occurrence_id(part.occurrence_id) is part
+    assert subassembly.search_by_occurrence_id(part.occurrence_id) is part
+    # Only nodes below the node searched from are found
+    assert part.search_by_occurrence_id(subassembly.occurrence_id) is None
+    other_part = next(node for node in synthetic_root.children if node.is_rigid_body)
+    assert subassembly.search_by_occurrence_id(other_part.occurrence_id) is None
+
+
+def test_index_follows_changes(synthetic_root):
+    tree = synthetic_root.tree
+    index = tree.node_index
+    part = next(node for node in synthetic_root.children if node.is_rigid_body)
+    old_element_id = _element_id(part)
+
+    part.element_dict = dict(part.element_dict, elementId="replaced")
+    added = OnshapeTreeNode(
+        name="Added <1> 0",
+        depth=1,
+        element_dict={CommonAttributes.elementId: "added"},
+        node_id="a" * 17,
+        occurrence_id="a" * 17,
+        parent_node=synthetic_root,
+    )
+    synthetic_root.add_child(added)
+
+    assert part not in index.by_element_id(old_element_id)
+    assert index.by_element_id("replaced") == [part]
+    assert index.by_occurrence_id(added.occurrence_id) is added
+    _assert_index_matches_nodes(index, tree.nodes)
+
+
+def test_stored_and_pickled_trees_are_indexed(synthetic_root, tmp_path):
+    directory = str(tmp_path / "tree")
+    save_tree(synthetic_root, directory)
+    synthetic_root.tree.node_index
+    loaded = pickle.loads(pickle.dumps(synthetic_root))
+    stored = open_tree(directory)
+
+    assert loaded.tree._node_index is None
+    for node in synthetic_root.tree.nodes:
+        assert loaded.tree.node_index.by_occurrence_id(node.occurrence_id).index == node.index
+        assert stored.node_index.by_occurrence_id(node.occurrence_id).index == node.index
+    part = next(iter(synthetic_root.occurrence_id_to_rigid_body_node.values()))
+    assert stored.node_index.closest_rigid_body(part.path).index == part.index
@@ -0,0 +1,56 @@
+"""Tests matching mates and joints to occurrences through the path indices"""
+import copy
+
+from onshape_to_sim.onshape_api.onshape_tree import (
+    _build_features_map,
+    _build_occurrences_map,
+    _build_subassemblies_map,
+    find_related_joints,
+)
+from onshape_to_sim.onshape_api.path_index import PathSuffixIndex, build_joint_start_index
+from bench_features_map import assembly_from_tree, scan_features_map
+from synthetic_assembly import instance_id, make_assembly
+
+
+def _check_matches_scan(assembly: dict) -> None:
+    root = assembly["rootAssembly"]
+    subassemblies = _build_subassemblies_map(assembly["subAssemblies"])
+    occurrences = _build_occurrences_map(root["occurrences"])
+    expected = scan_features_map(root["features"], subassemblies, occurrences)
+    features_map = _build_features_map(copy.copy(root["features"]), [], subassemblies, occurrences)
+    assert list(features_map.keys()) == list(expected.keys())
+    for key, mates in features_map.items():
+        assert [mate["children"] for mate in mates] == expected[key]
+
+
+def test_features_map_matches_scan():
+    _check_matches_scan(make_assembly(num_subassemblies=4, parts_per_subassembly=6, mates=True))
+    _check_matches_scan(assembly_from_tree("throwy_tree.pickle"))
+    _check_matches_scan(assembly_from_tree("throwy_hand_tree.pickle"))
+
+
+def test_suffix_index():
+    index = PathSuffixIndex()
+    index.add("abc", ["a", "b", "c"])
+    index.add("bc", ["b", "c"])
+    index.add("xc", ["x", "c"])
+    assert index.ending_with("c") == ["abc", "bc", "xc"]
+    assert index.ending_with("bc") == ["abc", "bc"]
+    assert index.ending_with("abc") == ["abc"]
+    assert index.ending_with("b") == []
+    assert len(index) == 3
+
+
+def test_find_related_joints():
+    first, second, third = instance_id(1), instance_id(2), instance_id(3)
+    joint_map = {
+        "world": ["to world"],
+        first + second: ["first"],
+        second: ["second"],
+        second + third: ["second third"],
+    }
+    joint_start_index = build_joint_start_index(joint_map)
+    for occurrence_id in (first, third + second, first + third, "world"):
+        expected = [joint for key, joints in joint_map.items() if occurrence_id.endswith(key[:17]) for joint in joints]
+        assert find_related_joints(joint_map, occurrence_id, joint_start_index) == expected
+        assert find_related_joints(joint_map, occurrence_id) == expected
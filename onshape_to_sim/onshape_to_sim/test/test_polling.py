@@ -0,0 +1,78 @@
+"""Tests the adaptive translation poller"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from onshape_to_sim.onshape_api.polling import PollSchedule, TranslationPoller
+
+FAST = PollSchedule(initial_interval=0.01, backoff=2.0, max_interval=0.05, deadline=2.0)
+
+
+class _FakeTranslations():
+    """Translations finishing after a number of polls, recording which thread polled them"""
+
+    def __init__(self, polls_needed: dict, final_state: str = "DONE"):
+        self.polls_needed = dict(polls_needed)
+        self.final_state = final_state
+        self.polls = {tid: 0 for tid in polls_needed}
+        self.threads = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, tid: str, configuration: str) -> dict:
+        with self._lock:
+            self.polls[tid] += 1
+            self.threads.add(threading.current_thread().name)
+            if self.polls[tid] < self.polls_needed[tid]:
+                return {"id": tid, "requestState": "ACTIVE"}
+        return {"id": tid, "requestState": self.final_state, "resultExternalDataIds": [f"{tid}-file"]}
+
+
+def test_translations_are_multiplexed_in_one_loop():
+    translations = _FakeTranslations({f"t{i}": i % 4 + 1 for i in range(30)})
+    poller = TranslationPoller(translations, FAST)
+    results = [None] * 30
+
+    def wait(i):
+        results[i] = poller.submit(f"t{i}").result()
+
+    threads = [threading.Thread(target=wait, args=(i,)) for i in range(30)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    poller.close()
+
+    assert [result["id"] for result in results] == [f"t{i}" for i in range(30)]
+    assert translations.threads == {"translation-poller"}
+    assert all(translations.polls[f"t{i}"] == i % 4 + 1 for i in range(30))
+    # Four polls take 0.01 + 0.02 + 0.04 + 0.05 s, far from one fixed 30 s interval
+    assert elapsed < 1.0
+
+
+def test_failed_and_late_translations():
+    poller = TranslationPoller(_FakeTranslations({"failed": 2}, final_state="FAILED"), FAST)
+    with pytest.raises(AttributeError):
+        poller.submit("failed").result()
+    late = PollSchedule(initial_interval=0.01, backoff=1.0, max_interval=0.01, deadline=0.1)
+    with pytest.raises(TimeoutError):
+        TranslationPoller(_FakeTranslations({"slow": 10 ** 6}), late).submit("slow").result()
+    poller.close()
+    with pytest.raises(RuntimeError):
+        poller.submit("after close")
+
+
+def test_translations_can_be_awaited_together():
+    translations = _FakeTranslations({f"t{i}": 3 for i in range(50)})
+    poller = TranslationPoller(translations, FAST)
+
+    async def wait_all():
+        return await asyncio.gather(*(asyncio.wrap_future(poller.submit(f"t{i}")) for i in range(50)))
+
+    results = asyncio.run(wait_all())
+    poller.close()
+    assert [result["resultExternalDataIds"][0] for result in results] == [f"t{i}-file" for i in range(50)]
+    assert sum(translations.polls.values()) == 150
@@ -0,0 +1,137 @@
+"""Tests retrying and rate limiting of the Onshape REST layer against a server injecting failures"""
+import asyncio
+import email.utils
+import json
+import threading
+import time
+
+import pytest
+
+from onshape_to_sim.onshape_api.onshape import Onshape
+from onshape_to_sim.onshape_api.retry import (
+    OnshapeAPIError,
+    RetryPolicy,
+    TokenBucket,
+    parse_retry_after,
+)
+from stub_server import StubServer, json_route, write_creds
+
+FAST_RETRIES = RetryPolicy(max_retries=4, backoff_base=0.01, backoff_max=0.05)
+
+
+class _FlakyRoute():
+    """Answers with the given failure statuses in order, then succeeds"""
+
+    def __init__(self, failures: list, retry_after: str = "0"):
+        self.failures = list(failures)
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+
+    def __call__(self, method, path, query, headers):
+        with self._lock:
+            status = self.failures.pop(0) if self.failures else 200
+        if status == 429:
+            return 429, {"Retry-After": self.retry_after}, b"Too many requests"
+        if status != 200:
+            return status, {}, b"Server error"
+        return 200, {"Content-Type": "application/json"}, json.dumps({"ok": True}).encode()
+
+
+def test_retries_throttling_and_server_errors(tmp_path):
+    route = _FlakyRoute([429, 503, 500])
+    with StubServer({"/api/v6/documents": route}) as server:
+        api = Onshape(stack=server.url, creds=write_creds(tmp_path, server.url), logging=False,
+                      retry_policy=FAST_RETRIES)
+        assert api.request("get", "documents").json() == {"ok": True}
+        assert len(server.requests) == 4
+        # Each attempt is signed again
+        assert len({headers["On-Nonce"] for _, _, _, headers in server.requests}) == 4
+        api.close()
+
+
+def test_gives_up_after_max_retries(tmp_path):
+    route = _FlakyRoute([503] * 10)
+    with StubServer({"/api/v6/documents": route}) as server:
+        api = Onshape(stack=server.url, creds=write_creds(tmp_path, server.url), logging=False,
+                      retry_policy=FAST_RETRIES)
+        with pytest.raises(OnshapeAPIError) as error:
+            api.request("get", "documents")
+        assert error.value.response.status_code == 503
+        assert len(server.requests) == FAST_RETRIES.max_retries + 1
+        api.close()
+
+
+def test_client_errors_are_not_retried(tmp_path):
+    with StubServer({"/api/v6/documents": json_route({"message": "forbidden"}, status=403)}) as server:
+        api = Onshape(stack=server.url, creds=write_creds(tmp_path, server.url), logging=False,
+                      retry_policy=FAST_RETRIES)
+        with pytest.raises(OnshapeAPIError):
+            api.request("get", "documents")
+        assert len(server.requests) == 1
+        api.close()
+
+
+def test_only_idempotent_requests_are_retried_after_server_errors(tmp_path):
+    route = _FlakyRoute([503, 429, 503])
+    with StubServer({"/api/v6/translations": route}) as server:
+        api = Onshape(stack=server.url, creds=write_creds(tmp_path, server.url), logging=False,
+                      retry_policy=FAST_RETRIES)
+        # The server may have started the translation before failing
+        with pytest.raises(OnshapeAPIError) as error:
+            api.request("post", "translations")
+        assert error.value.response.status_code == 503
+        assert len(server.requests) == 1
+        # Throttled requests were never carried out, and callers can opt in to the rest
+        assert api.request("post", "translations", idempotent=True).json() == {"ok": True}
+        assert len(server.requests) == 4
+        api.close()
+
+
+def test_retry_after_pauses_the_shared_limiter(tmp_path):
+    route = _FlakyRoute([429], retry_after="0.3")
+    limiter = TokenBucket(rate=1000)
+    with StubServer({"/api/v6/documents": route}) as server:
+        api = Onshape(stack=server.url, creds=write_creds(tmp_path, server.url), logging=False,
+                      retry_policy=RetryPolicy(backoff_max=1.0), rate_limiter=limiter)
+        start = time.perf_counter()
+        assert api.request("get", "documents").json() == {"ok": True}
+        assert time.perf_counter() - start >= 0.3
+        assert limiter.rate < limiter.max_rate
+        api.close()
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("2") == 2.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    in_ten_seconds = email.utils.formatdate(time.time() + 10, usegmt=True)
+    assert 8 < parse_retry_after(in_ten_seconds) <= 10
+    assert RetryPolicy(backoff_max=5).delay(0, None) <= 0.5
+
+
+def test_token_bucket_limits_threads_and_tasks():
+    limiter = TokenBucket(rate=200, capacity=1)
+    start = time.perf_counter()
+    threads = [threading.Thread(target=lambda: [limiter.acquire() for _ in range(10)]) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+
+    async def tasks():
+        await asyncio.gather(*(limiter.async_acquire() for _ in range(30)))
+
+    asyncio.run(tasks())
+    for thread in threads:
+        thread.join()
+    # 60 tokens at 200 per second, less the one in the bucket to begin with
+    assert time.perf_counter() - start >= 59 / 200 * 0.9
+
+
+def test_token_bucket_recovers_after_throttling():
+    limiter = TokenBucket(rate=100, increase_step=10)
+    limiter.throttle()
+    assert limiter.rate == 50
+    for _ in range(10):
+        limiter.succeed()
+    assert limiter.rate == 100
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
@@ -0,0 +1,45 @@
+"""Tests the pooled HTTP sessions used by the Onshape REST layer"""
+import pytest
+
+from onshape_to_sim.onshape_api.onshape import Onshape
+from onshape_to_sim.onshape_api.session import SessionPool
+from stub_server import StubServer, json_route, write_creds
+
+
+def test_connections_are_reused(tmp_path):
+    with StubServer({"/api/v6/documents": json_route({"items": []})}) as server:
+        with Onshape(stack=server.url, creds=write_creds(tmp_path, server.url), logging=False) as api:
+            for _ in range(20):
+                assert api.request("get", "documents").json() == {"items": []}
+        assert len(server.requests) == 20
+        assert server.connections == 1
+
+
+def test_redirect_gets_its_own_session(tmp_path):
+    with StubServer({"/export/file": json_route({"done": True})}) as export_server:
+        def redirect(method, path, query, headers):
+            return 307, {"Location": f"{export_server.url}/export/file?id=1"}, b""
+
+        with StubServer({"/api/v6/translations/1": redirect}) as server:
+            api = Onshape(stack=server.url, creds=write_creds(tmp_path, server.url), logging=False)
+            for _ in range(5):
+                assert api.request("get", "translations/1").json() == {"done": True}
+            assert sorted(api._sessions.hosts) == sorted([server.url, export_server.url])
+            api.close()
+            assert api._sessions.hosts == []
+        assert server.connections == 1
+        assert export_server.connections == 1
+        assert export_server.requests[0][2] == "id=1"
+
+
+def test_closed_pool_refuses_new_sessions():
+    pool = SessionPool(pool_size=2)
+    session = pool.session_for("http://localhost:1234/a/b")
+    assert pool.session_for("http://localhost:1234/c") is session
+    pool.close("http://localhost:1234")
+    assert pool.hosts == []
+    pool.close()
+    with pytest.raises(RuntimeError):
+        pool.session_for("http://localhost:1234")
+    with pytest.raises(ValueError):
+        SessionPool(pool_size=0)
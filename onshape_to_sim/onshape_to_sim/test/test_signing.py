@@ -0,0 +1,38 @@
+"""Tests signing requests"""
+import base64
+import hashlib
+import hmac
+
+from onshape_to_sim.onshape_api import utils
+from onshape_to_sim.onshape_api.onshape import Onshape
+from stub_server import write_creds
+
+
+def test_signature_matches_the_onshape_scheme(tmp_path):
+    api = Onshape(stack="http://localhost", creds=write_creds(tmp_path, "http://localhost"), logging=False)
+    path = "/api/v6/parts/d/did/m/mid/e/eid/partid/JHD/massproperties"
+
+    headers = [api._make_headers("GET", path, {"configuration": "default"}) for _ in range(100)]
+
+    for header in headers:
+        message = (
+            f"GET\n{header['On-Nonce']}\n{header['Date']}\napplication/json\n{path}\nconfiguration=default\n"
+        ).lower().encode("utf-8")
+        signature = base64.b64encode(hmac.new(b"stub_secret_key", message, hashlib.sha256).digest()).decode()
+        assert header["Authorization"] == f"On stub_access_key:HmacSHA256:{signature}"
+        assert len(header["On-Nonce"]) == 25 and header["On-Nonce"].isalnum()
+        assert header["Date"].endswith(" GMT")
+    assert len({header["On-Nonce"] for header in headers}) == 100
+    # Query strings already encoded are signed the same
+    assert api._make_auth("GET", "date", "nonce", path, {"a": "b c"}) == api._make_auth("GET", "date", "nonce", path, "a=b+c")
+
+
+def test_logging_is_configured_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(utils, "_logging_configured", False)
+    monkeypatch.setattr(utils, "dictConfig", calls.append)
+
+    for _ in range(3):
+        utils.log("message")
+
+    assert calls == [utils._LOG_CONFIG]
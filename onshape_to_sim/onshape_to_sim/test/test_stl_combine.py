@@ -0,0 +1,100 @@
+"""Tests reading STL meshes mapped into memory"""
+import numpy as np
+import pytest
+from stl import mesh
+
+from onshape_to_sim import stl_combine
+from test_mesh_conversion import CUBE_CORNERS, CUBE_FACES, write_ascii_stl, write_binary_stl
+
+
+def test_mapped_stl_views_the_file(tmp_path):
+    rng = np.random.default_rng(0)
+    triangles = rng.random((1000, 3, 3)).astype(np.float32)
+    write_binary_stl(tmp_path / "part.stl", triangles)
+    original = (tmp_path / "part.stl").read_bytes()
+
+    mapped = stl_combine.MappedSTL(str(tmp_path / "part.stl"))
+
+    assert mapped.num_triangles == 1000 and mapped._data is None
+    assert isinstance(mapped.data, np.memmap)
+    np.testing.assert_array_equal(mapped.triangles, triangles)
+    assert np.shares_memory(mapped.triangles, mapped.data) and np.shares_memory(mapped.normals, mapped.data)
+    np.testing.assert_array_equal(mapped.bounds[0], triangles.reshape(-1, 3).min(axis=0))
+    np.testing.assert_array_equal(mapped.bounds[1], triangles.reshape(-1, 3).max(axis=0))
+    # numpy-stl recomputes the normals when reading, left zero in the file
+    np.testing.assert_array_equal(mapped.to_mesh().vectors, mesh.Mesh.from_file(str(tmp_path / "part.stl")).vectors)
+
+    # Transforming a loaded mesh leaves the file as it was
+    loaded = stl_combine.load_mesh(str(tmp_path / "part.stl"))
+    matrix = np.array([[0, -1, 0, 1], [1, 0, 0, 2], [0, 0, 1, 3], [0, 0, 0, 1]], dtype=float)
+    stl_combine.apply_matrix(loaded, matrix)
+    expected = triangles @ matrix[:3, :3].T + [1, 2, 3]
+    np.testing.assert_allclose(loaded.vectors, expected, rtol=1e-6)
+    assert (tmp_path / "part.stl").read_bytes() == original
+
+
+def test_ascii_stls_are_parsed(tmp_path):
+    write_ascii_stl(tmp_path / "cube.stl", CUBE_CORNERS[CUBE_FACES])
+
+    mapped = stl_combine.MappedSTL(str(tmp_path / "cube.stl"))
+
+    assert stl_combine.probe_stl(str(tmp_path / "cube.stl")) is None and not mapped.is_binary
+    np.testing.assert_array_equal(mapped.triangles, CUBE_CORNERS[CUBE_FACES])
+    assert mapped.num_triangles == 12
+
+
+def test_accumulated_meshes_match_merging_one_by_one(tmp_path):
+    rng = np.random.default_rng(1)
+    stl_files, matrices = [], []
+    for i in range(5):
+        stl_files.append(str(tmp_path / f"part{i}.stl"))
+        write_binary_stl(stl_files[-1], rng.random((10 + i, 3, 3)).astype(np.float32))
+        matrix = np.eye(4)
+        matrix[:3, :3] = np.linalg.qr(rng.random((3, 3)))[0]
+        matrix[:3, 3] = rng.random(3)
+        matrices.append(matrix)
+    write_ascii_stl(tmp_path / "cube.stl", CUBE_CORNERS[CUBE_FACES])
+    stl_files.append(str(tmp_path / "cube.stl"))
+    matrices.append(np.eye(4))
+
+    accumulator = stl_combine.MeshAccumulator()
+    merged = None
+    for stl_file, matrix in zip(stl_files, matrices):
+        accumulator.add(stl_file, matrix)
+        part = stl_combine.load_mesh(stl_file)
+        stl_combine.apply_matrix(part, matrix)
+        merged = part if merged is None else stl_combine.combine_meshes(merged, part)
+
+    assert len(accumulator) == 6 and accumulator.num_triangles == len(merged.data) == 72
+    # combine_meshes recomputes the normals, as saving does
+    np.testing.assert_array_equal(accumulator.to_mesh().vectors, merged.vectors)
+
+
+def test_written_stls_are_identical_across_runs(tmp_path):
+    triangles = CUBE_CORNERS[CUBE_FACES]
+
+    stl_combine.write_stl(str(tmp_path / "a.stl"), triangles)
+    stl_combine.write_stl(str(tmp_path / "b.stl"), triangles)
+
+    assert (tmp_path / "a.stl").read_bytes() == (tmp_path / "b.stl").read_bytes()
+    read = mesh.Mesh.from_file(str(tmp_path / "a.stl"))
+    np.testing.assert_array_equal(read.vectors, triangles)
+    unit_normals = read.normals / np.linalg.norm(read.normals, axis=1, keepdims=True)
+    np.testing.assert_allclose(stl_combine.MappedSTL(str(tmp_path / "a.stl")).normals, unit_normals, atol=1e-6)
+    # Files within the budget are left alone
+    stl_combine.simplify_stls([str(tmp_path / "a.stl")], max_size=1)
+    assert (tmp_path / "a.stl").read_bytes() == (tmp_path / "b.stl").read_bytes()
+
+
+def test_simplified_stls_fit_their_budget_and_are_deterministic(tmp_path):
+    pytest.importorskip("open3d", exc_type=ImportError)
+    from bench_mesh_conversion import sphere_triangles
+    triangles = sphere_triangles(50000)
+    stl_files = [str(tmp_path / f"link{i}.stl") for i in range(2)]
+    for stl_file in stl_files:
+        write_binary_stl(stl_file, triangles)
+
+    stl_combine.simplify_stls(stl_files, max_size=0.5, max_workers=2)
+
+    assert stl_combine.probe_stl(stl_files[0]) <= stl_combine.max_stl_triangles(0.5)
+    assert (tmp_path / "link0.stl").read_bytes() == (tmp_path / "link1.stl").read_bytes()
@@ -0,0 +1,131 @@
+"""Tests storing trees as arrays with a JSON sidecar"""
+import json
+import os
+
+import numpy as np
+import pytest
+
+from onshape_to_sim.onshape_api.onshape_tree import load_tree
+from onshape_to_sim.onshape_api.tree_format import (
+    FORMAT_VERSION,
+    TreeFormatError,
+    is_stored_tree,
+    open_tree,
+    save_tree,
+)
+
+
+def _assert_same_node(node, expected) -> None:
+    for attribute in (
+        "node_id", "name", "mesh_name", "simplified_name", "occurrence_id", "depth", "is_rigid_body", "hidden",
+        "has_mass", "volume", "mass", "relative_path", "element_dict",
+    ):
+        assert getattr(node, attribute) == getattr(expected, attribute), attribute
+    for attribute in ("world_tform_element", "com_wrt_world", "inertia_wrt_world"):
+        np.testing.assert_array_equal(getattr(node, attribute), getattr(expected, attribute))
+    assert [child.index for child in node.children] == [child.index for child in expected.children]
+
+
+def _assert_same_joints(joint_parents: dict, expected: dict) -> None:
+    assert list(joint_parents) == list(expected)
+    # Compares nested dicts, lists and tuples, with arrays element-wise
+    np.testing.assert_equal(joint_parents, expected)
+    for name, joints in joint_parents.items():
+        assert [type(joint) for joint in joints] == [type(joint) for joint in expected[name]]
+
+
+def test_round_trip(synthetic_root, tmp_path):
+    directory = str(tmp_path / "tree")
+    save_tree(synthetic_root, directory)
+    assert is_stored_tree(directory)
+
+    root = load_tree(directory)
+
+    assert len(root.tree) == len(synthetic_root.tree)
+    for node, expected in zip(root.tree.nodes, synthetic_root.tree.nodes):
+        _assert_same_node(node, expected)
+    assert list(root.occurrence_id_to_rigid_body_node) == list(synthetic_root.occurrence_id_to_rigid_body_node)
+    assert all(
+        node is root.tree.nodes[expected.index]
+        for node, expected in zip(
+            root.occurrence_id_to_rigid_body_node.values(), synthetic_root.occurrence_id_to_rigid_body_node.values()
+        )
+    )
+    assert root.internal_naming == synthetic_root.internal_naming
+    _assert_same_joints(root.joint_parents, synthetic_root.joint_parents)
+    # Subassembly nodes still share the data of their subassembly
+    subassembly_nodes = [node for node in root.tree.nodes if node.element_dict is not None and "instances" in node.element_dict]
+    assert len(subassembly_nodes) == 3
+    assert subassembly_nodes[1].element_dict is subassembly_nodes[2].element_dict
+
+
+def test_legacy_tree_round_trip(tmp_path):
+    expected = load_tree("throwy_tree.pickle")
+    directory = str(tmp_path / "throwy")
+    save_tree(expected, directory)
+
+    root = load_tree(directory)
+
+    for node, expected_node in zip(root.tree.nodes, expected.tree.nodes):
+        _assert_same_node(node, expected_node)
+    _assert_same_joints(root.joint_parents, expected.joint_parents)
+
+
+def test_open_reads_on_demand(synthetic_root, tmp_path):
+    directory = str(tmp_path / "tree")
+    save_tree(synthetic_root, directory, extras={"definition": "stored"})
+
+    stored = open_tree(directory)
+    rigid_bodies = stored.get_occurrence_id_to_rigid_body_node()
+    occurrence_id = list(synthetic_root.occurrence_id_to_rigid_body_node)[5]
+    node = rigid_bodies[occurrence_id]
+    expected = synthetic_root.occurrence_id_to_rigid_body_node[occurrence_id]
+
+    assert stored.name == "robot"
+    assert len(rigid_bodies) == len(synthetic_root.occurrence_id_to_rigid_body_node)
+    assert node.simplified_name == expected.simplified_name
+    assert node.mass == expected.mass
+    np.testing.assert_array_equal(node.com_wrt_world, expected.com_wrt_world)
+    # Neither the API data nor the extras are read until asked for
+    assert stored._elements is None and stored._extras is None
+    assert node.element_dict == expected.element_dict
+    assert node.parent_node.occurrence_id == expected.parent_node.occurrence_id
+    assert node.relative_path == expected.relative_path
+    assert stored.extras == {"definition": "stored"}
+    _assert_same_joints(stored.get_joint_parents(), synthetic_root.joint_parents)
+
+
+def test_newer_versions_are_refused(synthetic_root, tmp_path):
+    directory = str(tmp_path / "tree")
+    save_tree(synthetic_root, directory)
+    sidecar_path = os.path.join(directory, "tree.json")
+    with open(sidecar_path) as fi:
+        sidecar = json.load(fi)
+    sidecar["version"] = FORMAT_VERSION + 1
+    with open(sidecar_path, "w") as fi:
+        json.dump(sidecar, fi)
+
+    with pytest.raises(TreeFormatError):
+        open_tree(directory)
+    with pytest.raises(TreeFormatError):
+        open_tree(str(tmp_path))
+
+
+def test_trees_storing_relative_paths_still_load(synthetic_root, tmp_path):
+    directory = str(tmp_path / "tree")
+    save_tree(synthetic_root, directory)
+    # As version 1 stored them: the path of the parent of each node, indexing paths listed in the sidecar
+    sidecar_path = os.path.join(directory, "tree.json")
+    with open(sidecar_path) as fi:
+        sidecar = json.load(fi)
+    sidecar["version"] = 1
+    sidecar["relative_paths"] = [[]]
+    with open(sidecar_path, "w") as fi:
+        json.dump(sidecar, fi)
+    np.save(os.path.join(directory, "relative_path.npy"), np.zeros(len(synthetic_root.tree.nodes), dtype=np.int32))
+
+    root = load_tree(directory)
+    for node, expected in zip(root.tree.nodes, synthetic_root.tree.nodes):
+        assert node.relative_path == expected.relative_path == expected.path[:-1]
+    save_tree(root, directory)
+    assert not os.path.exists(os.path.join(directory, "relative_path.npy"))
@@ -0,0 +1,82 @@
+"""Tests the compact tree layout and loading trees stored with dict-based nodes"""
+import pickle
+
+import numpy as np
+
+from onshape_to_sim.onshape_api import onshape_tree
+from onshape_to_sim.onshape_api.onshape_tree import (
+    OnshapeTree,
+    OnshapeTreeNode,
+    _LegacyUnpickler,
+    build_tree,
+    load_tree,
+)
+from synthetic_assembly import FakeApiClient, make_assembly
+
+
+def test_node_data_lives_in_tree_arrays():
+    tree = OnshapeTree(capacity=2)
+    root = OnshapeTreeNode(name="robot", tree=tree)
+    nodes = [OnshapeTreeNode(name=f"Part {i} <1> 0", parent_node=root) for i in range(10)]
+    for i, node in enumerate(nodes):
+        node.world_tform_element = np.diag([1.0, 1.0, 1.0, 1.0]) + i
+        node.com_wrt_world = [i, 0.0, 0.0]
+        node.mass = float(i)
+    tree.trim()
+
+    assert not hasattr(root, "__dict__")
+    assert root.tree is tree and all(node.tree is tree for node in nodes)
+    assert tree.world_tform_element.shape == (11, 4, 4)
+    assert tree.inertia_wrt_world.shape == (11, 3, 3)
+    assert np.array_equal(tree.mass, np.arange(-1, 10).clip(0))
+    assert np.array_equal(nodes[3].world_tform_element, np.diag([1.0, 1.0, 1.0, 1.0]) + 3)
+    assert np.array_equal(root.world_tform_element, np.eye(4))
+    root.joint_parents["link"] = []
+    assert tree.joint_parents == {"link": []}
+
+
+def test_built_tree_round_trips_through_pickle(monkeypatch):
+    assembly = make_assembly()
+    monkeypatch.setattr(onshape_tree, "onshape_client", FakeApiClient(assembly), raising=False)
+    root = build_tree(assembly, robot_name="robot")
+    loaded = pickle.loads(pickle.dumps(root))
+
+    assert len(loaded.tree) == len(root.tree)
+    assert np.array_equal(loaded.tree.com_wrt_world, root.tree.com_wrt_world)
+    assert sorted(loaded.get_occurrence_id_to_rigid_body_node()) == sorted(root.occurrence_id_to_rigid_body_node)
+    node = next(iter(loaded.occurrence_id_to_rigid_body_node.values()))
+    assert node.tree is loaded.tree and node.parent_node.tree is loaded.tree
+
+
+def test_legacy_trees_are_converted():
+    with open("throwy_tree.pickle", "rb") as fi:
+        legacy_root = _LegacyUnpickler(fi).load()
+    root = load_tree("throwy_tree.pickle")
+
+    legacy_nodes = [legacy_root]
+    nodes = [root]
+    while len(legacy_nodes) > 0:
+        legacy_node, node = legacy_nodes.pop(), nodes.pop()
+        assert node.name == legacy_node.name and node.occurrence_id == legacy_node.occurrence_id
+        assert np.array_equal(node.world_tform_element, legacy_node.world_tform_element)
+        assert np.array_equal(node.com_wrt_world, legacy_node.com_wrt_world)
+        assert node.mass == legacy_node.mass
+        assert len(node.children) == len(legacy_node.children)
+        legacy_nodes.extend(legacy_node.children)
+        nodes.extend(node.children)
+    assert root.joint_parents.keys() == legacy_root.joint_parents.keys()
+
+
+def test_paths_are_computed_from_the_parents(monkeypatch):
+    assembly = make_assembly(num_studios=2, parts_per_studio=2, num_subassemblies=2, parts_per_subassembly=3)
+    monkeypatch.setattr(onshape_tree, "onshape_client", FakeApiClient(assembly), raising=False)
+    root = build_tree(assembly, robot_name="robot")
+    occurrence_paths = {"".join(occurrence["path"]): tuple(occurrence["path"]) for occurrence in
+                        assembly["rootAssembly"]["occurrences"]}
+
+    assert root.path == ()
+    for node in root.tree.nodes[1:]:
+        assert node.path == occurrence_paths[node.occurrence_id]
+        assert node.relative_path == node.path[:-1]
+    # Paths are computed from the parents rather than stored in each node
+    assert "relative_path" not in OnshapeTreeNode.__slots__
@@ -57,18 +57,58 @@ def express_mass_properties_in_world_frame(
     com_in_element_frame: npt.ArrayLike,
     inertia_in_element_frame: npt.ArrayLike
     ) -> tuple: 
-    world_r_element = world_tform_element[:3, :3]
-
-    # Expressing COM in the link frame
-    com_in_element_vector = np.array([com_in_element_frame[0], com_in_element_frame[1], com_in_element_frame[2], 1])
-    com_in_world_frame = (world_tform_element @ com_in_element_vector)[:3]
-
     # Expressing inertia in the link frame
     # I = world_r_element @ inertia_in_element_frame @ world_r_element.T
     # is only good if the inertial pose is not set. Since we set the inertial pose
     # we need to keep the relative frame
-    
-    return mass, com_in_world_frame, inertia_in_element_frame
+    _, coms, inertias = express_all_mass_properties_in_world_frame(
+        np.asarray(world_tform_element)[np.newaxis],
+        np.array([mass]),
+        np.asarray(com_in_element_frame)[np.newaxis, :3],
+        np.asarray(inertia_in_element_frame)[np.newaxis],
+    )
+    return mass, coms[0], inertias[0]
+
+
+def express_all_mass_properties_in_world_frame(
+    world_tform_elements: npt.ArrayLike,
+    masses: npt.ArrayLike,
+    coms_in_element_frame: npt.ArrayLike,
+    inertias_in_element_frame: npt.ArrayLike,
+    rotate_inertias: bool = False,
+    ) -> tuple:
+    """Expresses the mass properties of many bodies in the world frame at once.
+
+    Args:
+        world_tform_elements: a (num_bodies, 4, 4) array of the transforms of each body's frame in the world
+        masses: a (num_bodies,) array of masses
+        coms_in_element_frame: a (num_bodies, 3) array of centers of mass, each in its body's frame
+        inertias_in_element_frame: a (num_bodies, 3, 3) array of inertias about each center of mass, in its body's
+            frame
+        rotate_inertias: also rotate the inertias into the world axes. By default they are kept in the body's axes,
+            like express_mass_properties_in_world_frame does, since the inertial pose carries the rotation
+
+    Returns:
+        The masses, the (num_bodies, 3) centers of mass in the world frame, and the (num_bodies, 3, 3) inertias
+    """
+    world_tform_elements = np.asarray(world_tform_elements, dtype=float)
+    world_r_elements = world_tform_elements[:, :3, :3]
+    coms_in_world_frame = (
+        np.einsum("nij,nj->ni", world_r_elements, np.asarray(coms_in_element_frame, dtype=float))
+        + world_tform_elements[:, :3, 3]
+    )
+    inertias = np.asarray(inertias_in_element_frame, dtype=float)
+    if rotate_inertias:
+        inertias = np.einsum("nij,njk,nlk->nil", world_r_elements, inertias, world_r_elements)
+    return np.asarray(masses, dtype=float), coms_in_world_frame, inertias
+
+
+def _parallel_axis_terms(masses: npt.NDArray, offsets: npt.NDArray) -> npt.NDArray:
+    """The (num_bodies, 3, 3) inertias of point masses at the offsets: m (|r|^2 I - r r^T)"""
+    squared_norms = np.einsum("ni,ni->n", offsets, offsets)
+    terms = -np.einsum("ni,nj->nij", offsets, offsets)
+    terms[:, [0, 1, 2], [0, 1, 2]] += squared_norms[:, np.newaxis]
+    return masses[:, np.newaxis, np.newaxis] * terms
 
 
 def combine_inertial_properties(
@@ -79,31 +119,64 @@ def combine_inertial_properties(
     """Combines a set of bodies with inertial properties expressed in the same frame into a single rigid body
     
     Args:
-        masses: a (num_bodies, 1) array of mass values in kg(?)
-        coms: a (num_bodies, 3) array of center of masses in meters (?)
-        inertias: a (num_bodies, 3, 3) array of inertial masses in whatever units this uses
+        masses: a (num_bodies,) array of mass values in kg
+        coms: a (num_bodies, 3) array of center of masses in meters
+        inertias: a (num_bodies, 3, 3) array of inertias about each body's center of mass, in kg m^2
 
     Returns:
-        A mass, com, and inertia equivalent of the listed bodies as a single rigid body (SRB)
+        A mass, com, and inertia (about the combined com) equivalent of the listed bodies as a single rigid body (SRB)
     """
-    mass_srb = 0
-    com_srb = np.zeros((3,))
-    inertia_srb = np.zeros((3, 3))
-    I = np.eye(3)
-    num_bodies = masses.shape[0]
-
-    for i in range(num_bodies):
-        mass_body = masses[i]
-        com_body = coms[i, :]
-        inertia_body = inertias[i, :, :]
+    masses = np.asarray(masses, dtype=float).reshape(-1)
+    _, mass_srb, com_srb, inertia_srb = combine_inertial_properties_by_group(
+        np.zeros(masses.shape[0], dtype=int), masses, coms, inertias
+    )
+    if mass_srb.shape[0] == 0:
+        return (0.0, np.zeros((3,)), np.zeros((3, 3)))
+    return (mass_srb[0], com_srb[0], inertia_srb[0])
 
-        mass_srb += mass_body
-        com_srb += com_body
-        inertia_srb += inertia_body + (np.dot(r, r) * I - np.outer(r, r)) * mass_body
 
-    if mass_srb > 0:
-        com_srb /= mass_srb
+def combine_inertial_properties_by_group(
+    groups: npt.ArrayLike,
+    masses: npt.ArrayLike,
+    coms: npt.ArrayLike,
+    inertias: npt.ArrayLike,
+) -> tuple:
+    """Combines the bodies of each group into a single rigid body, for all groups in one vectorized pass.
 
-    return (mass_srb, com_srb, inertia_srb)
+    Typically the groups are the links the bodies are assigned to. All properties must be expressed in the same frame.
 
+    Args:
+        groups: a (num_bodies,) array of the group of each body, e.g. link names or indices
+        masses: a (num_bodies,) array of mass values in kg
+        coms: a (num_bodies, 3) array of center of masses in meters
+        inertias: a (num_bodies, 3, 3) array of inertias about each body's center of mass, in kg m^2
 
+    Returns:
+        The sorted unique groups, and for each of them the combined mass, com and inertia about the combined com
+    """
+    masses = np.asarray(masses, dtype=float).reshape(-1)
+    coms = np.asarray(coms, dtype=float).reshape(-1, 3)
+    inertias = np.asarray(inertias, dtype=float).reshape(-1, 3, 3)
+    unique_groups, group_of_body = np.unique(np.asarray(groups), return_inverse=True)
+    group_of_body = group_of_body.reshape(-1)
+    num_groups = unique_groups.shape[0]
+    # Sort the bodies by group so each group's sum is a contiguous reduction
+    order = np.argsort(group_of_body, kind="stable")
+    starts = np.searchsorted(group_of_body[order], np.arange(num_groups))
+
+    def group_sums(values: npt.NDArray) -> npt.NDArray:
+        if num_groups == 0:
+            return np.zeros((0,) + values.shape[1:])
+        return np.add.reduceat(values[order], starts, axis=0)
+
+    group_masses = group_sums(masses)
+    weighted_coms = group_sums(masses[:, np.newaxis] * coms)
+    group_coms = np.divide(
+        weighted_coms,
+        group_masses[:, np.newaxis],
+        out=np.zeros_like(weighted_coms),
+        where=group_masses[:, np.newaxis] > 0,
+    )
+    offsets = coms - group_coms[group_of_body]
+    group_inertias = group_sums(inertias + _parallel_axis_terms(masses, offsets))
+    return unique_groups, group_masses, group_coms, group_inertias
@@ -6,13 +6,16 @@ import sys
 
 import numpy as np
 
+from onshape_to_sim.onshape_api.cache import ResponseCache
 from onshape_to_sim.onshape_api.client import Client
+from onshape_to_sim.collision_geometry import CollisionGenerator
 from onshape_to_sim.onshape_api.onshape_tree import (
     build_tree,
     create_onshape_tree,
     download_all_rigid_bodies_meshes,
     _add_instances_mass_properties,
 )
+from onshape_to_sim.onshape_api.tree_format import open_tree
 from onshape_to_sim.onshape_api.utils import (
     API,
     convert_stls_to_objs,
@@ -29,10 +32,14 @@ def main():
     obj_dir = "example_dir/mesh" # Directory to download the objs to
     sdf_path = "example_dir/sdf" # Directory to download SDF to 
     sdf_name = "testy" # name of the SDF to test
-    store_data = True # Whether or not to store the data in a pickle file
-    load_from_file = False # Whether or not to load data from a pickle file
-    file_path = f"example_dir/{sdf_name}.pickle" # Filepath of the pickle file
+    store_data = True # Whether or not to store the tree
+    load_from_file = False # Whether or not to load the stored tree
+    file_path = f"example_dir/{sdf_name}_tree" # Directory the tree is stored in
+    # Responses for versions ("v") and microversions ("m") are cached on disk, so re-running on the same version makes
+    # no network calls. Run onshape_to_sim/clear_cache.py to empty the cache.
     onshape_client = Client(creds="example_config.json", logging=False) # Onshape client
+    # Collision shapes of the links, fitted to their meshes and cached by mesh hash. None leaves links without collisions
+    collision_generator = CollisionGenerator(cache=ResponseCache("example_dir/collision_cache"))
     ####################################################
     # Creates an Onshape Tree
     if not load_from_file:
@@ -48,32 +55,38 @@ def main():
             robot_name = sdf_name,
             api_client = onshape_client
         )
-        if store_data:
-            with open(file_path, "wb") as fi:
-                pickle.dump(tree, fi)
+        print(f"Built tree: {tree.tree.build_timings}")
+        print(f"API requests: {onshape_client.request_stats}")
     else:
-        with open(file_path, "rb") as fi:
-            tree = pickle.load(fi)["tree"]
-    # Creates the SDF
-    print("Creating SDF...")
-    test_sdf = RobotSDF(tree, mesh_directory=sdf_path, sdf_name=sdf_name)
-    test_sdf.write_sdf(f"{sdf_path}/{sdf_name}")
-    # Downloads the rigid body meshes
+        # Only reads what the SDF and the mesh downloads need
+        tree = open_tree(file_path)
+    # Downloads the rigid body meshes, which the collision shapes are generated from
     print("Downloading meshes...")
     try:
         mesh_files = download_all_rigid_bodies_meshes(
             tree.get_occurrence_id_to_rigid_body_node().values(),
             data_directory = stl_dir,
-            file_type = API.stl
+            file_type = API.stl,
+            api_client = onshape_client,
+            progress_callback = lambda done, total, name: print(f"[{done}/{total}] {name}"),
         )
         convert_stls_to_objs(
             mesh_files,
             stl_dir,
             obj_dir,
-            "/home/bhung/private-onshape-fork/onshape_to_sim/onshape_to_sim/onshape_api"
         )
     except Exception as e:
         pdb.post_mortem()
+    # Creates the SDF
+    print("Creating SDF...")
+    test_sdf = RobotSDF(
+        tree,
+        mesh_directory=sdf_path,
+        sdf_name=sdf_name,
+        collision_generator=collision_generator,
+        obj_directory=obj_dir,
+    )
+    test_sdf.write_sdf(f"{sdf_path}/{sdf_name}")
 
 
 if __name__ == "__main__":